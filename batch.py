@@ -0,0 +1,292 @@
+"""보관된 상담 기록 일괄 재분석 (오프라인 배치).
+
+JSONL 코퍼스를 스트리밍으로 읽어 줄마다 극단성 탐지(detect_extreme_categories)를
+돌리고, --emotion 이면 GPT 감정 분류까지 붙여 JSONL 로 내보낸다. 정규식 단계는
+프로세스 풀에서 청크 단위로, LLM 단계는 동시성·초당 요청 수가 제한된 스레드
+풀에서 돈다. 동시에 처리 중인 청크 수가 묶여 있어 입력 크기와 관계없이 메모리는
+일정하다. 출력은 입력 순서대로 청크마다 쓰고, 그때마다 체크포인트를 남기므로
+중단된 작업은 같은 명령으로 이어서 돌릴 수 있다.
+
+    python batch.py corpus.jsonl -o scored.jsonl [--emotion] [--workers 4] [--chunk 2000]
+                    [--llm-concurrency 16] [--rate 20] [--patterns extreme_patterns.json] [--restart]
+
+입력 한 줄은 다음 중 하나다.
+    {"id": ..., "text": "..."}                              발화 하나
+    {"id": ..., "messages": [{"role": "user", "content": "..."}, ...]}   세션 (사용자 턴마다 분석)
+    "..."                                                   JSON 문자열 발화
+형식이 맞지 않는 줄은 전체 작업을 멈추지 않고 {"line": n, "error": "..."} 레코드로 남긴다.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import main
+
+Chunk = Tuple[int, int, List[bytes]]     # (첫 줄 번호, 청크 끝 바이트 오프셋, 줄들)
+
+
+# ───────────────────────────────
+# 정규식 단계 (프로세스 풀 워커)
+# ───────────────────────────────
+def _init_worker(patterns: Optional[str]) -> None:
+    if patterns is not None:
+        main._detector = main.ExtremeDetector(main.DETECT_CATEGORIES + (("seed", main.load_extra_patterns(patterns)),))
+
+
+def _analyze(text: str) -> Dict[str, Any]:
+    cats = main.detect_extreme_categories(text)
+    result = main._build_emotion_result(cats, main.NEUTRAL_EMOTION)
+    del result["emotion_class"], result["emotion_score"]    # 감정은 LLM 단계에서만 채운다
+    result["categories"] = {k: v for k, v in cats.items() if v}
+    result["_text"] = text
+    return result
+
+
+def _invalid(item: Any) -> Optional[str]:
+    """입력 레코드 형식 검사. 문제가 있으면 오류 메시지."""
+    if not isinstance(item, dict) or not ("text" in item or "messages" in item):
+        return "expected text or messages"
+    if "messages" in item:
+        messages = item["messages"]
+        if not isinstance(messages, list):
+            return "messages must be a list"
+        if not all(isinstance(m, dict) and isinstance(m.get("content"), str) for m in messages):
+            return "each message must be an object with string content"
+    elif not isinstance(item["text"], str):
+        return "text must be a string"
+    return None
+
+
+def detect_chunk(first_line: int, lines: List[bytes]) -> List[Dict[str, Any]]:
+    """청크의 줄마다 출력 레코드를 만든다. LLM 단계가 쓸 원문은 _text 에 남겨 둔다."""
+    out: List[Dict[str, Any]] = []
+    for n, raw in enumerate(lines, start=first_line):
+        if not raw.strip():
+            continue
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            out.append({"line": n, "error": "invalid json"})
+            continue
+        if isinstance(item, str):
+            item = {"text": item}
+        error = _invalid(item)
+        if error is not None:
+            out.append({"line": n, "error": error})
+            continue
+        record: Dict[str, Any] = {"line": n, "id": item.get("id", n)}
+        if "messages" in item:
+            turns = [dict(_analyze(m["content"]), index=i)
+                     for i, m in enumerate(item["messages"]) if m.get("role") == "user"]
+            record["turns"] = turns
+            record["extreme_turns"] = sum(1 for t in turns if t["extreme"])
+        else:
+            record.update(_analyze(item["text"]))
+        out.append(record)
+    return out
+
+
+# ───────────────────────────────
+# LLM 단계 (제한된 스레드 풀)
+# ───────────────────────────────
+def _add_emotion(target: Dict[str, Any]) -> None:
+    with main.LATENCY.time("batch.emotion"):
+        full = main._build_emotion_result(target["categories"], main._request_emotion(target["_text"]))
+    target["emotion_class"] = full["emotion_class"]
+    target["emotion_score"] = full["emotion_score"]
+
+
+def _targets(records: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """분석된 발화 단위 (발화 레코드 또는 세션의 사용자 턴)"""
+    for record in records:
+        if "extreme" in record:
+            yield record
+        yield from record.get("turns", ())
+
+
+def encode_chunk(records: List[Dict[str, Any]]) -> Tuple[bytes, Dict[str, int]]:
+    """출력 바이트와 집계. 워커에서 부르면 메인 프로세스는 쓰기만 한다."""
+    counts = {"records": len(records), "texts": 0, "extreme": 0, "errors": sum(1 for r in records if "error" in r)}
+    for target in _targets(records):
+        target.pop("_text", None)
+        counts["texts"] += 1
+        counts["extreme"] += bool(target["extreme"])
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8"), counts
+
+
+def detect_and_encode(first_line: int, lines: List[bytes]) -> Tuple[bytes, Dict[str, int]]:
+    return encode_chunk(detect_chunk(first_line, lines))
+
+
+class BatchRunner:
+    """입력 청크 → 정규식(프로세스 풀) → 감정(LLM 풀) → 순서대로 출력 + 체크포인트"""
+
+    def __init__(self, workers: int = 0, emotion: bool = False, llm_concurrency: int = 16,
+                 chunk: int = 2000, max_inflight: Optional[int] = None, patterns: Optional[str] = None):
+        self.chunk = chunk
+        self.emotion = emotion
+        self.max_inflight = max_inflight or max(2, workers * 2)
+        self.procs = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(patterns,)) if workers else None
+        self.llm = ThreadPoolExecutor(llm_concurrency, thread_name_prefix="batch-llm") if emotion else None
+        if patterns is not None and not workers:
+            _init_worker(patterns)
+        self.counts = {"records": 0, "texts": 0, "extreme": 0, "errors": 0}
+
+    def _chunks(self, path: str, offset: int, first_line: int) -> Iterator[Chunk]:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            n = first_line
+            lines: List[bytes] = []
+            for raw in f:
+                offset += len(raw)
+                lines.append(raw)
+                if len(lines) >= self.chunk:
+                    yield n, offset, lines
+                    n += len(lines)
+                    lines = []
+            if lines:
+                yield n, offset, lines
+
+    def _submit(self, first_line: int, lines: List[bytes]) -> Future:
+        """청크 하나의 (출력 바이트, 집계) 로 끝나는 Future"""
+        stage = detect_chunk if self.llm is not None else detect_and_encode
+        if self.procs is not None:
+            detected = self.procs.submit(stage, first_line, lines)
+        else:
+            detected = Future()
+            detected.set_result(stage(first_line, lines))
+        if self.llm is None:
+            return detected
+        done: Future = Future()
+
+        def with_emotion(f: Future) -> None:
+            if f.exception() is not None:
+                done.set_exception(f.exception())
+                return
+            records = f.result()
+            targets = list(_targets(records))
+            if not targets:
+                done.set_result(encode_chunk(records))
+                return
+            remaining = [len(targets)]
+            lock = threading.Lock()
+
+            def one_done(_: Future) -> None:
+                with lock:      # 콜백은 여러 LLM 스레드에서 동시에 불린다
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    done.set_result(encode_chunk(records))
+            for target in targets:
+                self.llm.submit(_add_emotion, target).add_done_callback(one_done)
+        detected.add_done_callback(with_emotion)
+        return done
+
+    def run(self, src: str, out: str, restart: bool = False, progress: float = 10.0) -> Dict[str, Any]:
+        ckpt_path = out + ".ckpt"
+        ckpt = {"input": os.path.abspath(src), "emotion": self.emotion, "offset": 0, "lines": 0, "bytes": 0}
+        if not restart and os.path.exists(ckpt_path) and os.path.exists(out):
+            with open(ckpt_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("input") == ckpt["input"] and saved.get("emotion") == self.emotion:
+                ckpt = saved
+        mode = "r+b" if ckpt["bytes"] else "wb"
+        t0 = last_report = time.perf_counter()
+        pending: deque = deque()
+        with open(out, mode) as sink:
+            sink.truncate(ckpt["bytes"])        # 마지막 체크포인트 뒤에 쓰다 만 부분은 버린다
+            sink.seek(ckpt["bytes"])
+
+            def flush_one() -> None:
+                nonlocal last_report
+                end_offset, n_lines, fut = pending.popleft()
+                data, counts = fut.result()
+                sink.write(data)
+                sink.flush()
+                for key, n in counts.items():
+                    self.counts[key] += n
+                ckpt.update(offset=end_offset, lines=ckpt["lines"] + n_lines, bytes=sink.tell())
+                main._atomic_write(ckpt_path, lambda tmp: _dump_json(tmp, ckpt))
+                now = time.perf_counter()
+                if progress and now - last_report >= progress:
+                    last_report = now
+                    print(f"[batch] {ckpt['lines']} lines  {self.counts['records'] / (now - t0):.0f} records/s",
+                          file=sys.stderr, flush=True)
+
+            try:
+                for first_line, end_offset, lines in self._chunks(src, ckpt["offset"], ckpt["lines"]):
+                    pending.append((end_offset, len(lines), self._submit(first_line, lines)))
+                    while len(pending) >= self.max_inflight:
+                        flush_one()
+                while pending:
+                    flush_one()
+            finally:
+                for _, _, fut in pending:
+                    fut.cancel()
+                self.close()
+        return self.report(time.perf_counter() - t0, ckpt)
+
+    def report(self, elapsed: float, ckpt: Dict[str, Any]) -> Dict[str, Any]:
+        rate = lambda n: round(n / elapsed, 1) if elapsed > 0 else None
+        out: Dict[str, Any] = dict(self.counts, elapsed_s=round(elapsed, 3), records_per_s=rate(self.counts["records"]),
+                                   texts_per_s=rate(self.counts["texts"]), total_lines=ckpt["lines"])
+        if self.emotion:
+            backend = main.get_backend()
+            out["latency"] = main.LATENCY.summary().get("batch.emotion")
+            if isinstance(backend, main.ResilientBackend):
+                out["llm"] = backend.stats()
+        return out
+
+    def close(self) -> None:
+        if self.procs is not None:
+            self.procs.shutdown(wait=True, cancel_futures=True)
+        if self.llm is not None:
+            self.llm.shutdown(wait=True, cancel_futures=True)
+
+
+def _dump_json(path: str, obj: Any) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+
+
+def configure_backend(llm_concurrency: int, rate: Optional[float], fake_latency: Optional[float] = None) -> None:
+    """LLM 동시 호출 수와 초당 요청 수를 묶은 백엔드를 전역으로 설정한다."""
+    main.load_env()
+    if fake_latency is not None:
+        inner: main.LLMBackend = main.FakeBackend(latency=fake_latency, jitter=fake_latency / 4)
+    else:
+        inner = main.OpenAIBackend(max_connections=llm_concurrency)
+    main.set_backend(main.ResilientBackend(inner, max_concurrency=llm_concurrency, rate_limit=rate))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("input")
+    ap.add_argument("-o", "--output", required=True)
+    ap.add_argument("--emotion", action="store_true", help="GPT 감정 분류까지 수행")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="정규식 프로세스 수 (0 이면 현재 프로세스)")
+    ap.add_argument("--chunk", type=int, default=2000)
+    ap.add_argument("--llm-concurrency", type=int, default=16)
+    ap.add_argument("--rate", type=float, default=None, help="LLM 초당 요청 수 상한")
+    ap.add_argument("--patterns", default=None, help="추가 패턴 JSON (기본 extreme_patterns.json)")
+    ap.add_argument("--no-cache", action="store_true", help="감정 분류 응답 캐시를 쓰지 않음")
+    ap.add_argument("--fake-latency", type=float, default=None, help="설정 시 FakeBackend 사용 (오프라인)")
+    ap.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터")
+    ap.add_argument("--progress", type=float, default=10.0, help="진행 상황 출력 간격(초), 0 이면 끔")
+    args = ap.parse_args()
+
+    if args.emotion:
+        configure_backend(args.llm_concurrency, args.rate, args.fake_latency)
+        if args.no_cache:
+            main.CACHE_POLICY["emotion"] = False
+    runner = BatchRunner(workers=args.workers, emotion=args.emotion, llm_concurrency=args.llm_concurrency,
+                         chunk=args.chunk, patterns=args.patterns)
+    summary = runner.run(args.input, args.output, restart=args.restart, progress=args.progress)
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
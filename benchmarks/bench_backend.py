@@ -0,0 +1,66 @@
+"""오프라인 LLM 백엔드 부하 테스트.
+
+ResilientBackend(FakeBackend) 위에서 여러 스레드가 감정 분석과 assistant 응답을
+동시에 호출한다. 지연·실패율을 주입해 재시도, 동시성 제한, 서킷 브레이커와
+중립 기본값 대체가 어떻게 동작하는지 확인한다.
+
+    python benchmarks/bench_backend.py [--workers 16] [--calls 400] [--latency 0.05] [--failure-rate 0.1]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+UTTERANCES = ["괜찮아요", "모르겠어요", "회사 일이 너무 많아서 지쳐요", "친구랑 다퉜어요", "면접이 걱정돼요", "잠이 안 와요"]
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--calls", type=int, default=400)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.02)
+    ap.add_argument("--failure-rate", type=float, default=0.1)
+    ap.add_argument("--max-concurrency", type=int, default=8)
+    ap.add_argument("--timeout", type=float, default=1.0)
+    args = ap.parse_args()
+
+    fake = main.FakeBackend(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=7)
+    backend = main.ResilientBackend(fake, timeout=args.timeout, retries=2, backoff=0.02, max_concurrency=args.max_concurrency)
+    main.set_backend(backend)
+    main.CACHE_POLICY["emotion"] = False
+    assistant = main.AssistantAgent()
+
+    def one(i: int) -> float:
+        text = f"{UTTERANCES[i % len(UTTERANCES)]} #{i}"
+        t0 = time.perf_counter()
+        if i % 2:
+            main.gpt_emotion_analysis(text)
+        else:
+            try:
+                assistant.reply(text)
+            except main.LLMUnavailable:
+                pass
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        lat: List[float] = sorted(pool.map(one, range(args.calls)))
+    wall = time.perf_counter() - t0
+
+    pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    print(f"calls={args.calls} workers={args.workers} wall={wall:.2f}s throughput={args.calls / wall:.1f}/s")
+    print(f"latency p50={pick(0.5):.1f}ms p99={pick(0.99):.1f}ms max={lat[-1] * 1000:.1f}ms")
+    print(f"fake backend calls={fake.calls}  resilient stats={backend.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
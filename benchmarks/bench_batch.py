@@ -0,0 +1,120 @@
+"""배치 재분석 벤치마크 (오프라인).
+
+합성 JSONL 코퍼스(발화·세션 혼합)를 만들어 batch.py 를 돌리고 다음을 확인한다.
+  - 정규식 단계 처리량: 현재 프로세스 vs 프로세스 풀
+  - 메모리: 코퍼스를 4배로 키워도 최대 RSS 가 거의 그대로인지
+  - 중단·재개: 도중에 프로세스를 죽이고 다시 돌린 출력이 한 번에 돌린 출력과 같은지
+  - LLM 단계: FakeBackend 위에서 --rate 상한을 지키는지
+
+    python benchmarks/bench_batch.py [--lines 200000] [--workers 4]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BATCH = os.path.join(ROOT, "batch.py")
+
+LINES = [
+    "회사 일이 너무 많아서 요즘 계속 지쳐요",
+    "친구랑 다퉜는데 먼저 연락하기가 어려워요",
+    "자살하고 싶다는 생각이 자꾸 들어요",
+    "너는 정말 쓰레기야",
+    "나는 아무 쓸모없는 사람이에요",
+    "오늘은 조금 나아진 것 같아요",
+]
+
+
+def make_corpus(path: str, n: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            if i % 10 == 0:
+                item: Any = {"id": f"s{i}", "messages": [
+                    {"role": "user", "content": LINES[i % len(LINES)]},
+                    {"role": "assistant", "content": "그렇군요."},
+                    {"role": "user", "content": f"{LINES[(i + 1) % len(LINES)]} ({i})"},
+                ]}
+            else:
+                item = {"id": i, "text": f"{LINES[i % len(LINES)]} ({i})"}
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+def run_batch(args: List[str], kill_after: float = 0.0) -> Dict[str, Any]:
+    """batch.py 를 돌리고 요약(+ 메인 프로세스 최대 RSS)을 돌려준다. kill_after 초 뒤에 죽일 수도 있다."""
+    proc = subprocess.Popen([sys.executable, BATCH, *args, "--progress", "0"], cwd=ROOT,
+                            stderr=subprocess.PIPE, text=True)
+    if kill_after:
+        time.sleep(kill_after)
+        proc.kill()
+        proc.wait()
+        return {}
+    err = proc.stderr.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = status
+    if status:
+        raise RuntimeError(err)
+    summary = json.loads(err.strip().splitlines()[-1])
+    summary["maxrss_mb"] = usage.ru_maxrss / 1024
+    return summary
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=200000)
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    ap.add_argument("--rate", type=float, default=400.0)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="batch_bench_")
+    ok = True
+    try:
+        small, large = os.path.join(tmp, "small.jsonl"), os.path.join(tmp, "large.jsonl")
+        make_corpus(small, args.lines)
+        make_corpus(large, args.lines * 4)
+
+        print(f"{'run':<34}{'lines':>9}{'records/s':>12}{'max RSS':>11}")
+        rss: List[float] = []
+        for label, corpus, workers in (("regex, in-process", small, 0), (f"regex, {args.workers} workers", small, args.workers),
+                                       (f"regex, {args.workers} workers, 4x corpus", large, args.workers)):
+            s = run_batch([corpus, "-o", os.path.join(tmp, "out.jsonl"), "--workers", str(workers), "--restart"])
+            rss.append(s["maxrss_mb"])
+            print(f"{label:<34}{s['total_lines']:>9}{s['records_per_s']:>12.0f}{s['maxrss_mb']:>8.1f} MB")
+        ok &= rss[2] < rss[1] * 1.5     # 입력이 4배여도 메모리는 거의 그대로
+
+        # 중단 후 재개 == 한 번에 실행
+        full, resumed = os.path.join(tmp, "full.jsonl"), os.path.join(tmp, "resumed.jsonl")
+        run_batch([small, "-o", full, "--workers", "0", "--restart"])
+        run_batch([small, "-o", resumed, "--workers", "0", "--chunk", "500", "--restart"], kill_after=1.0)
+        partial = os.path.getsize(resumed) if os.path.exists(resumed) else 0
+        run_batch([small, "-o", resumed, "--workers", "0", "--chunk", "500"])
+        with open(full, "rb") as a, open(resumed, "rb") as b:
+            same = a.read() == b.read()
+        ok &= same
+        print(f"\nkill + resume: {partial / 1e6:.1f} MB written before kill, output {'identical' if same else 'DIFFERENT'}")
+
+        # LLM 단계: 초당 요청 수 상한
+        n = int(args.rate * 3)
+        llm_corpus = os.path.join(tmp, "llm.jsonl")
+        with open(llm_corpus, "w", encoding="utf-8") as f:
+            for i in range(n):
+                f.write(json.dumps({"id": i, "text": f"{LINES[i % len(LINES)]} #{i}"}, ensure_ascii=False) + "\n")
+        s = run_batch([llm_corpus, "-o", os.path.join(tmp, "llm_out.jsonl"), "--workers", "0", "--emotion", "--no-cache",
+                       "--fake-latency", "0.02", "--llm-concurrency", "32", "--rate", str(args.rate), "--restart"])
+        achieved = s["llm"]["attempts"] / s["elapsed_s"]
+        ok &= achieved <= args.rate * 1.05
+        print(f"emotion: {s['texts']} texts in {s['elapsed_s']:.2f}s, {achieved:.0f} req/s (limit {args.rate:.0f}), "
+              f"p50={s['latency']['p50_ms']:.1f}ms")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,141 @@
+"""극단성 탐지기 마이크로 벤치마크.
+
+기존 detect_extreme_categories (호출마다 re.compile + 패턴별 스캔 + 리스트 dedupe)를
+그대로 옮겨 둔 참조 구현과 현재 구현을 한국어 코퍼스에서 비교한다.
+결과가 하나라도 다르거나 현재 구현이 더 느리면 종료 코드 1.
+
+리터럴 프리필터의 누락 여부도 함께 검사한다 (차등 검사): 코퍼스와 그 변형
+문장 전체에서 프리필터를 켠 탐지기와 끈 탐지기의 결과가 같아야 하고,
+규칙이 매치되는 모든 문장에는 그 규칙의 앵커가 들어 있어야 한다.
+extreme_patterns.json 이 있으면 그 패턴도 검사 대상에 포함된다.
+
+    python benchmarks/bench_detector.py [--repeat 2000]
+"""
+from __future__ import annotations
+import argparse
+import os
+import re
+import sys
+import timeit
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+CORPUS: List[str] = [
+    "오늘 점심 뭐 먹을지 고민이에요",
+    "회사에서 발표가 있어서 좀 긴장돼요",
+    "친구랑 싸웠는데 어떻게 화해해야 할지 모르겠어요",
+    "요즘 잠을 잘 못 자요. 피곤해요",
+    "괜찮아요",
+    "모르겠어요",
+    "주말에 가족이랑 여행 다녀왔어요. 즐거웠어요!",
+    "면접 연습 좀 같이 해줄 수 있어요?",
+    "그냥 다 귀찮고 아무것도 하기 싫어요",
+    "시험을 망쳐서 너무 속상해요",
+    "죽고 싶다",
+    "정말 죽고싶어요 아무도 날 이해 못해",
+    "차라리 죽는 게 좋겠다는 생각이 들어요",
+    "사라지고 싶어. 사라졌으면 좋겠어요",
+    "다 끝내고 싶다 진짜",
+    "자살 생각이 자꾸 나요. 자살 충동이 심해요",
+    "자살하고 싶다",
+    "목숨을 끊고 싶다는 생각을 했어요",
+    "옥상에서 뛰어내리면 어떨까 생각했어",
+    "사는 게 의미가 없어",
+    "희망이 없어요. 가망이 없다",
+    "내가 없어지는 게 낫겠어",
+    "살아가기 싫어",
+    "나는 쓸모없어. 난 병신이야",
+    "난 가치 없다",
+    "나 같은 건 없어져야 해",
+    "그 사람은 쓰레기야. 너는 멍청이",
+    "팀장님은 형편없어요 정말",
+    "어제 자해했어요. 손목 긋고 피 흘리고",
+    "자살예방센터에 전화해봤어요",
+    "Jasal 이라는 단어는 영어로 쓰면 어떻게 돼요?",
+    "죽어야 편해질 것 같다",
+]
+
+
+def reference_detect(text: str) -> Dict[str, List[str]]:
+    """기존 구현 (변경 전 main.detect_extreme_categories) 그대로."""
+    out: Dict[str, List[str]] = {"suicide": [], "self_denigrate": [], "other_denigrate": [], "direct": [], "indirect": [], "seed": []}
+    def collect(patterns: List[str], key: str) -> None:
+        for p in patterns:
+            rx = re.compile(p, re.IGNORECASE)
+            for m in rx.finditer(text):
+                snippet = main._normalize_snippet(m.group(0))
+                if snippet not in out[key]:
+                    out[key].append(snippet)
+    collect(main.SEED_PATTERNS, "seed")
+    collect(main.CURATED_DIRECT, "direct")
+    collect(main.CURATED_INDIRECT, "indirect")
+    collect(main.CURATED_SUICIDE, "suicide")
+    collect(main.CURATED_SELF_DENIGRATE, "self_denigrate")
+    collect(main.OTHER_DENIGRATE_PATTERNS, "other_denigrate")
+    return {k: v for k, v in out.items() if v}
+
+
+def variants(corpus: List[str]) -> List[str]:
+    """띄어쓰기·이어붙이기 변형으로 차등 검사용 문장을 늘린다."""
+    out = list(corpus)
+    for text in corpus:
+        out.append(text.replace(" ", ""))
+        out.append(" ".join(text))
+        out.append(text + "ㅠㅠ")
+    out.extend(a + " " + b for a, b in zip(corpus, corpus[1:]))
+    return out
+
+
+def differential_check(texts: List[str]) -> int:
+    """프리필터 on/off 결과 비교 + 규칙별 앵커 포함 검사. 실패 건수를 돌려준다."""
+    fast = main.extreme_detector()
+    full = main.ExtremeDetector(main.DETECT_CATEGORIES + (("seed", main.load_extra_patterns()),), prefilter=False)
+    failures = 0
+    for text in texts:
+        if fast.detect(text) != full.detect(text):
+            failures += 1
+            print(f"[prefilter mismatch] {text!r}")
+        for i, (key, rx) in enumerate(fast.rules):
+            anchors = main.pattern_anchors(rx)
+            if anchors and rx.search(text) and not any(a in text for a in anchors):
+                failures += 1
+                print(f"[missing anchor] rule {i} ({key}) {rx.pattern!r} on {text!r}")
+    return failures
+
+
+def run_corpus(fn, corpus: List[str]) -> None:
+    for text in corpus:
+        fn(text)
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    mismatches = 0
+    for text in CORPUS:
+        want, got = reference_detect(text), main.detect_extreme_categories(text)
+        if want != got or list(want) != list(got):
+            mismatches += 1
+            print(f"[mismatch] {text!r}\n  reference={want}\n  current  ={got}")
+    texts = variants(CORPUS)
+    prefilter_failures = differential_check(texts)
+
+    # 세션 내 연속 호출 환경과 비슷하게, 정규식 캐시가 데워진 상태에서 잰다.
+    ref = timeit.timeit(lambda: run_corpus(reference_detect, CORPUS), number=args.repeat)
+    cur = timeit.timeit(lambda: run_corpus(main.detect_extreme_categories, CORPUS), number=args.repeat)
+    calls = args.repeat * len(CORPUS)
+    print(f"corpus={len(CORPUS)} texts, calls={calls}")
+    print(f"reference: {ref / calls * 1e6:8.2f} us/call")
+    print(f"current  : {cur / calls * 1e6:8.2f} us/call  (x{ref / cur:.1f})")
+    print(f"identical: {mismatches == 0}")
+    print(f"prefilter: {len(texts)} texts, {prefilter_failures} failures")
+    return 0 if mismatches == 0 and prefilter_failures == 0 and cur < ref else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
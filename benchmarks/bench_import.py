@@ -0,0 +1,66 @@
+"""main import 비용 회귀 검사 (python -X importtime).
+
+API 키 없이 새 인터프리터에서 `import main` 을 실행해 모듈별 누적 import 시간을
+보고하고, 무거운 의존성이 import 시점에 끌려오거나 전체 시간이 예산을 넘으면
+종료 코드 1. 탐지 함수 첫 호출(탐지기 컴파일 포함) 시간도 함께 잰다.
+
+    python benchmarks/bench_import.py [--budget-ms 150] [--top 10]
+"""
+from __future__ import annotations
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# import main 만으로는 절대 로드되면 안 되는 모듈
+HEAVY = ("openai", "matplotlib", "dotenv", "httpx", "numpy", "asyncio", "sqlite3")
+
+PROBE = (
+    "import time; t0 = time.perf_counter(); import main; t1 = time.perf_counter(); "
+    "main.detect_extreme_categories('죽고 싶어'); main.should_trigger_roleplay('면접 연습', {}, {}); "
+    "print(f'{(t1 - t0) * 1000:.2f} {(time.perf_counter() - t1) * 1000:.2f}')"
+)
+
+
+def importtime(repeat: int) -> Tuple[Dict[str, int], float, float]:
+    """가장 빠른 실행의 (모듈 → 누적 us, import ms, 첫 호출 ms)"""
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    best: Tuple[Dict[str, int], float, float] | None = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=ROOT, env=env,
+                              capture_output=True, text=True, check=True)
+        modules: Dict[str, int] = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = int(cumulative)
+        import_ms, first_call_ms = (float(x) for x in proc.stdout.split())
+        if best is None or import_ms < best[1]:
+            best = (modules, import_ms, first_call_ms)
+    assert best is not None
+    return best
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-ms", type=float, default=150.0)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    modules, import_ms, first_call_ms = importtime(args.repeat)
+    ranked: List[Tuple[str, int]] = sorted(modules.items(), key=lambda kv: kv[1], reverse=True)
+    print(f"{'cumulative (ms)':>16}  module")
+    for name, us in ranked[: args.top]:
+        print(f"{us / 1000:>16.2f}  {name}")
+    heavy = sorted({name.split(".")[0] for name in modules} & set(HEAVY))
+    print(f"import main: {import_ms:.2f} ms (budget {args.budget_ms:.0f} ms), first detect/route call: {first_call_ms:.2f} ms")
+    print(f"heavy modules at import: {heavy or 'none'}")
+    return 0 if not heavy and import_ms <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,109 @@
+"""세션 저널 벤치마크 (오프라인).
+
+FakeBackend 위에서 세션을 N 턴 진행시키며 턴마다 저널 checkpoint 를 남긴다.
+매 레코드 fsync 와 배치 fsync 의 턴당 기록 비용, 저널에서 state 를 되살리는
+시간을 비교하고, 마지막 줄이 잘린(비정상 종료) 저널로 만든 보고서가 원래
+세션의 보고서와 같은지 확인한다.
+
+    python benchmarks/bench_journal.py [--turns 500 5000]
+"""
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+LINES = [
+    "회사 일이 너무 많아서 요즘 계속 지쳐요",
+    "친구랑 다퉜는데 먼저 연락하기가 어려워요",
+    "면접이 다음 주라서 잠이 잘 안 와요",
+    "가끔은 그냥 다 그만두고 싶다는 생각이 들어요",
+    "상사한테 어떻게 말해야 할지 연습해 보고 싶어요",
+    "오늘은 조금 나아진 것 같아요",
+]
+
+
+def drive(state: Dict[str, Any], turns: int) -> float:
+    """턴을 진행하고 저널 checkpoint 에 쓴 총 시간을 돌려준다."""
+    mindfulness, roleplay, assistant = main.MindfulnessAgent(), main.RoleplayAgent(), main.AssistantAgent()
+    spent = 0.0
+    for i in range(turns):
+        text = f"{LINES[i % len(LINES)]} ({i}번째 이야기)"
+        state["messages"].append({"role": "user", "content": text})
+        state, _ = main.analyze_and_update_state(state)
+        t0 = time.perf_counter()
+        main.journal_checkpoint(state)
+        spent += time.perf_counter() - t0
+        route = main.emotion_branch(state)
+        if route == "mindfulness":
+            state = mindfulness.run(state)
+        elif route == "roleplay":
+            state = roleplay.run(state)
+        else:
+            state["messages"].append({"role": "assistant", "content": assistant.reply(text)})
+        t0 = time.perf_counter()
+        main.journal_checkpoint(state)
+        spent += time.perf_counter() - t0
+    main.wait_pending_analyses(state)
+    return spent
+
+
+def comparable(report: Dict[str, Any]) -> Dict[str, Any]:
+    report = dict(report, session_overview=dict(report["session_overview"], datetime=None),
+                  emotion_summary=dict(report["emotion_summary"], graph_path=None))
+    if "roleplay_details" in report:
+        report["roleplay_details"] = [dict(r, at=None) for r in report["roleplay_details"]]
+    return report
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, nargs="+", default=[500, 5000])
+    args = ap.parse_args()
+
+    main.set_backend(main.FakeBackend())
+    for site in main.CACHE_POLICY:
+        main.CACHE_POLICY[site] = False
+    root = tempfile.mkdtemp(prefix="journal_bench_")
+    memory = main.MemoryAgent(graph=main.GraphRenderer(out_dir=root))
+    ok = True
+    try:
+        print(f"{'turns':>6} {'fsync each':>14} {'batched':>14} {'resume':>10} {'journal':>10}  report")
+        for turns in args.turns:
+            per_turn: List[float] = []
+            for fsync_every in (1, 64):
+                jdir = os.path.join(root, f"{turns}_{fsync_every}")
+                os.makedirs(jdir)
+                state = main.new_session_state("bench", window=200, log_dir=root, journal_dir=jdir)
+                state["journal"].fsync_every = fsync_every
+                per_turn.append(drive(state, turns) / turns)
+            path = state["journal"].path
+
+            # 비정상 종료 흉내: end 없이 마지막 줄이 반쯤 쓰인 저널
+            with open(path, "ab") as f:
+                f.write(b'{"t": "msg", "i": 99999, "m": {"role": "us')
+            t0 = time.perf_counter()
+            resumed = main.resume_session(path, window=200, log_dir=root)
+            resume_s = time.perf_counter() - t0
+
+            expected = comparable(memory.run(state)["report"])
+            got = comparable(memory.run_from_journal(path, window=200)["report"])
+            same = expected == got and len(resumed["messages"]) == len(state["messages"])
+            ok &= same and main.journal_ended(path)
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"{turns:>6} {per_turn[0] * 1e6:>11.1f}µs {per_turn[1] * 1e6:>11.1f}µs "
+                  f"{resume_s * 1000:>8.1f}ms {size_mb:>8.2f}MB  {'identical' if same else 'MISMATCH'}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,161 @@
+"""계측 오버헤드 벤치마크 (오프라인).
+
+같은 턴 시퀀스(분석 → 라우팅 → 에이전트)를 지연 없는 FakeBackend 위에서
+계측 끔(NullRecorder) / 기본 계측 / 계측 + JSONL 트레이스로 돌려 턴당 CPU 시간
+차이(변형을 번갈아 돌린 최솟값끼리)를 --budget-us 와 비교한다. 참고로 턴당 계측
+호출 수 × 호출당 비용(기록·카운터만) 추정치도 낸다. 실제 LLM 호출은 수백 ms 이므로
+여기서 보는 µs 단위 차이가 상한이다. 마지막에 Prometheus 출력과 트레이스 줄 수를 확인한다.
+
+    python benchmarks/bench_metrics.py [--turns 2000] [--repeat 5] [--budget-us 100]
+"""
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+LINES = [
+    "회사 일이 너무 많아서 요즘 계속 지쳐요",
+    "친구랑 다퉜는데 먼저 연락하기가 어려워요",
+    "면접이 다음 주라서 잠이 잘 안 와요",
+    "가끔은 그냥 다 그만두고 싶다는 생각이 들어요",
+    "상사한테 어떻게 말해야 할지 연습해 보고 싶어요",
+    "오늘은 조금 나아진 것 같아요",
+]
+
+
+class NullRecorder(main.LatencyRecorder):
+    """계측 끔 기준선"""
+
+    def record(self, name: str, seconds: float, **attrs: Any) -> None:
+        pass
+
+    def count(self, name: str, n: float = 1, **labels: str) -> None:
+        pass
+
+    def llm_usage(self, site: str, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        return 0.0
+
+
+class CallCounter(main.LatencyRecorder):
+    """턴당 계측 호출 수를 센다"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Dict[str, int] = {"record": 0, "count": 0}
+
+    def record(self, name: str, seconds: float, **attrs: Any) -> None:
+        self.calls["record"] += 1
+        super().record(name, seconds, **attrs)
+
+    def count(self, name: str, n: float = 1, **labels: str) -> None:
+        self.calls["count"] += 1
+        super().count(name, n, **labels)
+
+    def llm_usage(self, site: str, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        self.calls["count"] += 1
+        return super().llm_usage(site, model, prompt_tokens, completion_tokens)
+
+
+def per_call_ns(fn, n: int = 100000) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def drive(turns: int) -> float:
+    """턴당 CPU 시간(초)"""
+    state: Dict[str, Any] = main.new_session_state("bench", window=200, journal_dir="")
+    mindfulness, roleplay, assistant = main.MindfulnessAgent(), main.RoleplayAgent(), main.AssistantAgent()
+    t0 = time.process_time()
+    for i in range(turns):
+        text = f"{LINES[i % len(LINES)]} ({i}번째 이야기)"
+        state["messages"].append({"role": "user", "content": text})
+        state, _ = main.analyze_and_update_state(state, fast_path=False)
+        route = main.emotion_branch(state)
+        if route == "mindfulness":
+            state = mindfulness.run(state)
+        elif route == "roleplay":
+            state = roleplay.run(state)
+        else:
+            state["messages"].append({"role": "assistant", "content": assistant.reply(text)})
+    spent = time.process_time() - t0
+    state.close(discard=True)
+    return spent / turns
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--budget-us", type=float, default=100.0, help="턴당 허용 오버헤드 (트레이스 포함)")
+    args = ap.parse_args()
+
+    main.set_backend(main.FakeBackend())
+    for site in main.CACHE_POLICY:
+        main.CACHE_POLICY[site] = False
+    tmp = tempfile.mkdtemp(prefix="metrics_bench_")
+    trace = os.path.join(tmp, "trace.jsonl")
+    try:
+        main.LATENCY = NullRecorder()
+        drive(200)      # 정규식 컴파일 등 1회성 비용을 측정 밖으로
+
+        # 변형을 번갈아 돌려 (시스템 잡음이 한쪽에만 몰리지 않게) 변형별 최솟값을 쓴다
+        variants = (("metrics off", NullRecorder, False), ("metrics on", main.LatencyRecorder, False),
+                    ("metrics + trace", main.LatencyRecorder, True))
+        best: Dict[str, float] = {}
+        for _ in range(args.repeat):
+            for label, make, with_trace in variants:
+                main.LATENCY = make()
+                if with_trace:
+                    if os.path.exists(trace):
+                        os.remove(trace)
+                    main.LATENCY.open_trace(trace)
+                    traced_recorder = main.LATENCY
+                t = drive(args.turns)
+                main.LATENCY.close_trace()
+                best[label] = min(best.get(label, t), t)
+        off = best["metrics off"]
+
+        # 턴당 호출 수 × 호출당 비용
+        counter = main.LATENCY = CallCounter()
+        drive(500)
+        records, counts = counter.calls["record"] / 500, counter.calls["count"] / 500
+        plain, traced_rec = main.LatencyRecorder(), main.LatencyRecorder()
+        traced_rec.open_trace(os.path.join(tmp, "micro.jsonl"))
+        record_ns = per_call_ns(lambda: plain.record("x", 0.001))
+        record_trace_ns = per_call_ns(lambda: traced_rec.record("x", 0.001))
+        count_ns = per_call_ns(lambda: plain.count("y", site="s"))
+        traced_rec.close_trace()
+        estimate = {"metrics on": (records * record_ns + counts * count_ns) / 1000,
+                    "metrics + trace": (records * record_trace_ns + counts * count_ns) / 1000}
+
+        print(f"{'variant':<24}{'CPU/turn':>12}{'measured Δ':>13}{'estimated':>12}")
+        for label, t in best.items():
+            print(f"{label:<24}{t * 1e6:>9.1f}µs{(t - off) * 1e6:>10.1f}µs{estimate.get(label, 0.0):>9.1f}µs")
+        print(f"\nper turn: {records:.1f} record() + {counts:.1f} count(); "
+              f"record {record_ns:.0f}ns (trace {record_trace_ns:.0f}ns), count {count_ns:.0f}ns")
+
+        # 마지막 트레이스 실행: 트레이스 줄 수 == 히스토그램에 쌓인 기록 수
+        text = traced_recorder.prometheus()
+        spans = sum(int(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith("counsel_stage_seconds_count"))
+        with open(trace, "r", encoding="utf-8") as f:
+            lines = sum(1 for _ in f)
+        ok = lines == spans and 'counsel_stage_seconds_count{stage="detect.regex"}' in text and "counsel_llm_tokens_total" in text
+        print(f"trace lines {lines} / spans {spans}, prometheus {len(text.splitlines())} lines {'ok' if ok else 'MISMATCH'}")
+        ok &= (best["metrics + trace"] - off) * 1e6 <= args.budget_us
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,316 @@
+"""합성 한국어 세션 재생 벤치마크 + 회귀 게이트 (오프라인).
+
+시나리오(일상 / 위기 / 롤플 키워드 / 긴 세션)별로 시드 고정 합성 세션을 만들어
+analyze_and_update_state → emotion_branch → 에이전트(마인드풀니스·롤플·assistant)
+→ 종료 시 MemoryAgent 보고서까지 결정적 FakeBackend 위에서 재생하고 시나리오별로
+  - 턴당 CPU 시간 (process_time, --repeat 중 최솟값)
+  - 턴 지연 p50/p95/p99 (턴별로 반복 중 최솟값을 모은 뒤의 백분위, 보고서는 따로)
+  - 할당: 세션 state 가 턴당 붙잡는 바이트와 재생 중 최대 메모리 (tracemalloc, 별도 실행)
+  - 라우팅 지문: 턴별 경로의 해시 (탐지·라우팅 동작이 바뀌면 달라진다)
+를 낸다. --save-baseline 으로 benchmarks/replay_baseline.json 을 남기고, 이후 실행은
+기준선보다 --threshold(기본 35%) 넘게 나빠진 지표가 있거나 지문이 다르면 1 로 끝난다.
+시간 지표는 고정된 보정 작업의 실행 시간으로 나눠 비교하므로 같은 기계의 속도
+흔들림(클럭 변화·다른 작업)은 상쇄되지만, 기준선은 만든 기계·파이썬에서만 의미가
+있다 (다르면 경고를 낸다).
+
+    python benchmarks/bench_replay.py                        # 기준선과 비교
+    python benchmarks/bench_replay.py --save-baseline        # 기준선 갱신
+    python benchmarks/bench_replay.py --dump sessions.jsonl  # 합성 세션을 JSONL 로
+    python benchmarks/bench_replay.py --sessions sessions.jsonl --no-gate
+
+세션 JSONL 은 줄마다 {"id": "...", "scenario": "...", "turns": ["사용자 발화", ...]} 이다.
+"""
+from __future__ import annotations
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_baseline.json")
+
+# ───────────────────────────────
+# 합성 세션
+# ───────────────────────────────
+WHEN = ["요즘", "어제", "오늘 아침에", "주말에", "퇴근하고 나서", "밤마다", "지난주에"]
+SITUATION = [
+    "회사에서 발표가 있었는데", "친구랑 밥을 먹었는데", "시험 공부를 하다가", "부모님이랑 통화했는데",
+    "팀 프로젝트 때문에", "상사한테 또 지적을 받아서", "동생이랑 말다툼을 해서", "혼자 산책을 했는데",
+    "이직 준비를 하면서", "연락이 끊긴 친구 생각이 나서",
+]
+FEELING = [
+    "좀 지쳤어요", "마음이 편했어요", "괜히 불안했어요", "화가 났어요", "그냥 그랬어요", "기분이 좋았어요",
+    "아무것도 하기 싫어요", "눈물이 났어요", "걱정이 돼요", "잠이 잘 안 와요", "뿌듯했어요", "서운했어요",
+]
+CRISIS = [
+    "죽고 싶어요", "자살하고 싶다는 생각이 자꾸 들어요", "살아가기 싫어요", "희망이 없어요",
+    "나는 쓸모없어", "차라리 죽는 게 좋겠어요", "목숨을 끊고 싶어요", "사는 게 의미가 없어요",
+]
+NEAR_MISS = ["배고파 죽겠어요", "웃겨 죽는 줄 알았어요", "더워서 사라지고 싶을 정도예요", "그 영화 결말이 너무 허무했어요"]
+ROLEPLAY = [
+    "다음 주 면접 연습 하고 싶어요", "상사랑 이야기하는 상황극 해 볼래요", "친구랑 다퉜는데 대화연습 시켜 주세요",
+    "발표 시뮬레이션 해 보고 싶어요", "역할극으로 거절하는 연습 해 볼까요", "롤플로 연습해 보고 싶어요",
+]
+
+
+def _everyday(rng: random.Random) -> str:
+    return f"{rng.choice(WHEN)} {rng.choice(SITUATION)} {rng.choice(FEELING)}"
+
+
+def synthetic_sessions(seed: int = 7) -> List[Dict[str, Any]]:
+    """시나리오별 합성 세션 (seed 가 같으면 항상 같다)"""
+    rng = random.Random(seed)
+    sessions: List[Dict[str, Any]] = []
+
+    def add(scenario: str, n: int, turns: int, extra: Optional[List[str]] = None, rate: float = 0.0) -> None:
+        for k in range(n):
+            texts = [_everyday(rng) for _ in range(turns)]
+            if extra:
+                for i in range(turns):
+                    if i and rng.random() < rate:
+                        texts[i] = rng.choice(extra)
+                texts[rng.randrange(1, turns)] = rng.choice(extra)     # 세션마다 최소 한 번
+            sessions.append({"id": f"{scenario}-{k:03d}", "scenario": scenario, "turns": texts})
+
+    add("everyday", 20, 12)
+    add("crisis", 20, 10, CRISIS + NEAR_MISS, rate=0.25)
+    add("roleplay", 20, 10, ROLEPLAY, rate=0.2)
+    add("long", 2, 300, CRISIS + ROLEPLAY + NEAR_MISS, rate=0.05)
+    return sessions
+
+
+def load_sessions(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+# ───────────────────────────────
+# 재생
+# ───────────────────────────────
+class Replayer:
+    def __init__(self, work_dir: str):
+        self.work_dir = work_dir
+        self.assistant = main.AssistantAgent()
+        self.mindfulness = main.MindfulnessAgent()
+        self.roleplay = main.RoleplayAgent()
+        self.memory = main.MemoryAgent(graph=main.GraphRenderer(out_dir=work_dir, mode="sync"))
+
+    def session(self, session: Dict[str, Any], turn_s: Optional[List[float]] = None,
+                probe: Optional[List[int]] = None) -> str:
+        """세션 하나를 재생하고 턴별 경로 문자열(a/m/r)을 돌려준다.
+
+        turn_s 가 있으면 턴별 지연(초)을, probe 가 있으면 보고서 직전 state 가
+        붙잡고 있는 traced 바이트를 덧붙인다.
+        """
+        state = main.new_session_state(session["id"], session_id=session["id"], window=200,
+                                       log_dir=self.work_dir, journal_dir="")
+        before = tracemalloc.get_traced_memory()[0] if probe is not None else 0
+        routes: List[str] = []
+        for text in session["turns"]:
+            t0 = time.perf_counter()
+            state["messages"].append({"role": "user", "content": text})
+            state, _ = main.analyze_and_update_state(state)
+            route = main.emotion_branch(state)
+            if route == "mindfulness":
+                state = self.mindfulness.run(state)
+            elif route == "roleplay":
+                state = self.roleplay.run(state)
+            else:
+                state["messages"].append({"role": "assistant", "content": self.assistant.reply(text)})
+            if turn_s is not None:
+                turn_s.append(time.perf_counter() - t0)
+            routes.append(route[0])
+        main.wait_pending_analyses(state)
+        if probe is not None:
+            gc.collect()
+            probe.append(tracemalloc.get_traced_memory()[0] - before)
+        t0 = time.perf_counter()
+        state["session_end"] = True
+        self.memory.run(state)
+        if turn_s is not None:
+            self.report_s.append(time.perf_counter() - t0)
+        state.close(discard=True)
+        return "".join(routes)
+
+    def scenario(self, sessions: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+        """repeat 번 재생한다. 시간 지표는 반복마다 앞뒤 보정 작업 시간으로 나눈 값(normalized)도
+        구해 반복 중 최솟값을 쓴다 (기계 속도가 흔들려도 비교가 가능하도록)."""
+        turns = sum(len(s["turns"]) for s in sessions)
+        pct = lambda xs, q: sorted(xs)[min(len(xs) - 1, int(q * len(xs)))] * 1000
+        raw: Dict[str, float] = {}
+        norm: Dict[str, float] = {}
+        routes = ""
+        for _ in range(repeat):
+            turn_s: List[float] = []
+            self.report_s: List[float] = []
+            gc.collect()
+            before = calibrate(3)
+            t0 = time.process_time()
+            routes = "\n".join(self.session(s, turn_s) for s in sessions)
+            cpu = time.process_time() - t0
+            unit = (before + calibrate(3)) / 2
+            values = {"cpu_us_per_turn": cpu / turns * 1e6, "p50_ms": pct(turn_s, 0.50), "p95_ms": pct(turn_s, 0.95),
+                      "p99_ms": pct(turn_s, 0.99), "report_p50_ms": pct(self.report_s, 0.50)}
+            for k, v in values.items():
+                raw[k] = min(raw.get(k, v), v)
+                norm[k] = min(norm.get(k, v / unit), v / unit)
+
+        # 할당: tracemalloc 은 느리므로 따로 한 번
+        probe: List[int] = []
+        gc.collect()
+        tracemalloc.start()
+        for s in sessions:
+            self.session(s, probe=probe)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        counts = {name: routes.count(name[0]) for name in ("assistant", "mindfulness", "roleplay")}
+        result: Dict[str, Any] = {"sessions": len(sessions), "turns": turns}
+        result.update({k: round(v, 1 if k == "cpu_us_per_turn" else 3) for k, v in raw.items()})
+        result.update({
+            "state_bytes_per_turn": round(sum(probe) / turns),
+            "peak_kb": round(peak / 1024, 1),
+            "routes": counts,
+            "fingerprint": hashlib.sha1(routes.encode("utf-8")).hexdigest()[:16],
+            "normalized": {k: round(v, 2) for k, v in norm.items()},
+        })
+        return result
+
+# ───────────────────────────────
+# 기준선 비교
+# ───────────────────────────────
+# 지표 → 잡음으로 보고 넘길 절대 차이 (아주 작은 값의 퍼센트 변화는 무시). p99 는 보고만 한다.
+GATED = {"cpu_us_per_turn": 20.0, "p50_ms": 0.02, "p95_ms": 0.05, "report_p50_ms": 1.0,
+         "state_bytes_per_turn": 64, "peak_kb": 64.0}
+TIMED = ("cpu_us_per_turn", "p50_ms", "p95_ms", "report_p50_ms")
+
+
+def calibrate(rounds: int = 5) -> float:
+    """기계 속도 기준: 파이썬 코드 경로(정규식·dict·json)가 비슷한 고정 작업의 최소 실행 시간(초)"""
+    words = [f"{w}{i}" for i, w in enumerate(FEELING * 160)]
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.process_time()
+        counts: Dict[str, int] = {}
+        for w in words:
+            for token in main._PUNCT.sub("", w).split():
+                counts[token] = counts.get(token, 0) + 1
+        for _ in range(20):
+            json.loads(json.dumps(counts, ensure_ascii=False))
+        best = min(best, time.process_time() - t0)
+    return best
+
+
+def environment() -> Dict[str, Any]:
+    return {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "emotion_calibration": "default" if main.lexicon_scorer().calibration is main.DEFAULT_EMOTION_CALIBRATION
+            else "file"}
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """시간 지표는 보정값으로 나눈 normalized 끼리, 나머지는 그대로 비교한다."""
+    failures: List[str] = []
+    for scenario, got in results.items():
+        base = baseline["scenarios"].get(scenario)
+        if base is None:
+            continue
+        if got["fingerprint"] != base["fingerprint"]:
+            failures.append(f"{scenario}: routing changed {base['routes']} -> {got['routes']}")
+        for metric, floor in GATED.items():
+            old, new = base[metric], got[metric]
+            if metric in TIMED:
+                # 같은 비율의 악화를 원래 단위로 환산해 floor 와 비교한다
+                ratio = got["normalized"][metric] / base["normalized"][metric]
+                new = round(old * ratio, 3)
+            if new > old * (1 + threshold) and new - old > floor:
+                failures.append(f"{scenario}: {metric} {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return failures
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", default=None, help="세션 JSONL (없으면 합성 세션)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--scenarios", nargs="+", default=None)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--fake-latency", type=float, default=0.0, help="가짜 LLM 지연(초). 기준선과 같아야 비교한다")
+    ap.add_argument("--threshold", type=float, default=0.35,
+                    help="허용 악화 비율 (공유·단일 코어 기계의 반복 간 흔들림이 20~30%% 라 기본값은 넉넉하다)")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--no-gate", action="store_true", help="비교하지 않고 결과만 출력")
+    ap.add_argument("--dump", default=None, help="합성 세션을 JSONL 로 쓰고 끝낸다")
+    args = ap.parse_args()
+
+    sessions = load_sessions(args.sessions) if args.sessions else synthetic_sessions(args.seed)
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(s, ensure_ascii=False) + "\n" for s in sessions)
+        print(f"wrote {len(sessions)} sessions to {args.dump}")
+        return 0
+    by_scenario: Dict[str, List[Dict[str, Any]]] = {}
+    for s in sessions:
+        by_scenario.setdefault(s.get("scenario", "default"), []).append(s)
+    if args.scenarios:
+        by_scenario = {k: v for k, v in by_scenario.items() if k in args.scenarios}
+
+    main.set_backend(main.FakeBackend(latency=args.fake_latency))
+    for site in main.CACHE_POLICY:
+        main.CACHE_POLICY[site] = False
+    main.LATENCY = main.LatencyRecorder(maxlen=64)
+    work_dir = tempfile.mkdtemp(prefix="replay_bench_")
+    try:
+        replayer = Replayer(work_dir)
+        replayer.session(synthetic_sessions(args.seed + 1)[0])     # 정규식 컴파일·지연 import 를 측정 밖으로
+        results = {name: replayer.scenario(items, args.repeat) for name, items in by_scenario.items()}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'scenario':<10}{'turns':>7}{'CPU/turn':>11}{'p50':>9}{'p95':>9}{'p99':>9}{'report':>9}"
+          f"{'B/turn':>9}{'peak':>10}  routes a/m/r")
+    for name, r in results.items():
+        print(f"{name:<10}{r['turns']:>7}{r['cpu_us_per_turn']:>9.1f}µs{r['p50_ms']:>7.2f}ms{r['p95_ms']:>7.2f}ms"
+              f"{r['p99_ms']:>7.2f}ms{r['report_p50_ms']:>7.2f}ms{r['state_bytes_per_turn']:>9}{r['peak_kb']:>8.0f}KB"
+              f"  {r['routes']['assistant']}/{r['routes']['mindfulness']}/{r['routes']['roleplay']}")
+
+    params = {"seed": args.seed, "repeat": args.repeat, "fake_latency": args.fake_latency,
+              "sessions": args.sessions and os.path.basename(args.sessions)}
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "params": params, "scenarios": results}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+    if args.no_gate:
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline} (run with --save-baseline)")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["params"] != params:
+        print(f"\nbaseline params {baseline['params']} differ from this run {params}; not comparing")
+        return 1
+    if baseline["environment"] != environment():
+        print(f"\nwarning: baseline recorded on {baseline['environment']}, this run on {environment()}")
+    failures = compare(results, baseline, args.threshold)
+    for line in failures:
+        print(f"REGRESSION {line}")
+    print(f"\n{'FAIL' if failures else 'OK'}: {len(results)} scenarios vs baseline "
+          f"(threshold {args.threshold:.0%}, timings normalized by the calibration loop)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
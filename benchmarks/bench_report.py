@@ -0,0 +1,61 @@
+"""세션 길이별 보고서 요약 시간: 전체 전사 1회 요약 vs 누적(롤링) 요약.
+
+프롬프트 길이에 비례해 느려지는 FakeBackend(per_char) 를 쓰고, 같은 세션을
+MemoryAgent() 와 MemoryAgent(incremental_every=N) 으로 각각 보고서까지 돌려
+종료 시점 요약 호출(report.summary) 시간을 비교한다.
+
+    python benchmarks/bench_report.py [--lengths 10 50 200] [--every 6]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import tempfile
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+LINES = ["요즘 회사에서 일이 너무 많아서 지쳐요", "상사랑 이야기하면 늘 긴장돼요", "주말에도 쉬는 느낌이 안 들어요",
+         "친구한테 털어놓기도 어려워요", "잠들기 전에 계속 생각이 나요"]
+
+
+def build_session(turns: int, memory: main.MemoryAgent) -> Dict[str, Any]:
+    state: Dict[str, Any] = {"messages": [], "interventions": []}
+    for i in range(turns):
+        state["messages"].append({"role": "user", "content": LINES[i % len(LINES)],
+                                  "emotion": {"class": "불안", "score": 0.5, "extreme": False}})
+        state["messages"].append({"role": "assistant", "content": "그렇군요. 그때 어떤 생각이 드셨나요?"})
+        memory.observe(state)
+        pending = state.get("summary_pending")
+        if pending is not None:     # 사용자 입력 사이에 백그라운드 갱신이 끝난다고 본다
+            pending.result()
+    return state
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lengths", type=int, nargs="+", default=[10, 50, 200])
+    ap.add_argument("--every", type=int, default=6)
+    ap.add_argument("--per-char", type=float, default=2e-5)
+    args = ap.parse_args()
+
+    main.set_backend(main.FakeBackend(latency=0.05, per_char=args.per_char))
+    main.CACHE_POLICY.update(report=False, summary=False)
+    os.chdir(tempfile.mkdtemp())    # 그래프 파일은 임시 디렉터리에
+    print(f"{'turns':>6} {'full (ms)':>10} {'rolling (ms)':>13}")
+    for turns in args.lengths:
+        row = []
+        for memory in (main.MemoryAgent(), main.MemoryAgent(incremental_every=args.every)):
+            state = build_session(turns, memory)
+            main.LATENCY.reset()
+            memory.run(state)
+            assert set(state["report"]["counseling_summary"]) >= {"topic_summary", "session_end_reason"}
+            row.append(main.LATENCY.summary()["report.summary"]["max_ms"])
+        print(f"{turns:>6} {row[0]:>10.1f} {row[1]:>13.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
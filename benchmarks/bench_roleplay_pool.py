@@ -0,0 +1,98 @@
+"""롤플 스크립트 풀 벤치마크 (오프라인).
+
+FakeBackend(--latency 초) 위에서 롤플 턴의 응답 시간을 비교한다.
+  - 즉석 생성: 풀 없이 매번 LLM 호출 (기존 동작)
+  - 풀 적중: 시작 시 미리 채운 풀에서 바로 꺼냄
+  - 연속 롤플: 풀 크기보다 많이 연달아 꺼낼 때 백그라운드 채우기가 따라오는지
+또한 풀을 디스크에 저장했다가 다시 불러오면 LLM 호출 없이 바로 쓸 수 있는지 확인한다.
+
+    python benchmarks/bench_roleplay_pool.py [--latency 1.5] [--size 4]
+"""
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+LINES = [
+    "면접이 다음 주라서 잠이 잘 안 와요",
+    "친구랑 다퉜는데 먼저 연락하기가 어려워요",
+    "사람들 앞에 서면 너무 떨려요",
+]
+
+
+def roleplay_turn(agent: main.RoleplayAgent, text: str) -> float:
+    state: Dict[str, Any] = {"messages": [{"role": "user", "content": text}], "roleplay_logs": None}
+    t0 = time.perf_counter()
+    agent.run(state)
+    return time.perf_counter() - t0
+
+
+def fmt(samples: List[float]) -> str:
+    return f"p50={statistics.median(samples) * 1000:8.1f}ms  max={max(samples) * 1000:8.1f}ms"
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=1.5, help="가짜 LLM 응답 지연(초)")
+    ap.add_argument("--size", type=int, default=4)
+    ap.add_argument("--turns", type=int, default=6)
+    args = ap.parse_args()
+
+    main.set_backend(main.FakeBackend(latency=args.latency, jitter=args.latency / 4))
+    tmp = tempfile.mkdtemp(prefix="roleplay_pool_")
+    path = os.path.join(tmp, "pool.json")
+    ok = True
+    try:
+        on_demand = [roleplay_turn(main.RoleplayAgent(), LINES[i % len(LINES)]) for i in range(len(LINES))]
+        print(f"{'on-demand (no pool)':<28}{fmt(on_demand)}")
+
+        pool = main.ScriptPool(size=args.size, path=path)
+        t0 = time.perf_counter()
+        for f in pool.start():
+            f.result()
+        warm_s = time.perf_counter() - t0
+        agent = main.RoleplayAgent(pool=pool)
+        hits = [roleplay_turn(agent, LINES[i % len(LINES)]) for i in range(len(LINES))]
+        print(f"{'pool hit':<28}{fmt(hits)}   (warm-up {warm_s:.1f}s in background)")
+        ok &= max(hits) < min(on_demand) / 10
+
+        # 사용자가 롤플을 연달아 요청: 턴 사이(사용자가 읽고 답하는 시간)에 풀이 다시 찬다
+        burst: List[float] = []
+        for i in range(args.turns):
+            burst.append(roleplay_turn(agent, LINES[0]))
+            time.sleep(args.latency * 1.5)
+        print(f"{f'{args.turns} back-to-back (1 topic)':<28}{fmt(burst)}")
+
+        personalized = main.RoleplayAgent(pool=pool, personalize=True)
+        pers = [roleplay_turn(personalized, LINES[0])]
+        print(f"{'personalized (on-demand)':<28}{fmt(pers)}")
+
+        # 저장된 풀로 재시작: LLM 호출 없이 바로 적중
+        for _ in range(50):
+            if not pool._refilling:
+                break
+            time.sleep(args.latency / 4)
+        reloaded = main.ScriptPool(size=args.size, path=path)
+        restart = [roleplay_turn(main.RoleplayAgent(pool=reloaded), LINES[i % len(LINES)]) for i in range(len(LINES))]
+        loaded_hits = reloaded.stats().get("hits", 0)
+        ok &= loaded_hits == len(LINES) and max(restart) < min(on_demand) / 10
+        print(f"{'after restart (from disk)':<28}{fmt(restart)}   hits={loaded_hits}/{len(LINES)}")
+        print(f"\npool stats: {pool.stats()}")
+        reloaded.close()
+        pool.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,53 @@
+"""위기 발화 라우팅 지연: 안전 빠른 경로 vs GPT 대기 경로.
+
+LLM 백엔드를 지정한 지연의 FakeBackend 로 바꿔 끼운 뒤,
+위기 발화를 fast_path=True/False 로 각각 analyze_and_update_state 에 통과시키고
+경로별 지연 요약(main.LATENCY)을 출력한다.
+
+    python benchmarks/bench_safety_fast_path.py [--turns 20] [--latency 0.4]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+CRISIS = ["죽고 싶어", "자살 생각이 자꾸 나요", "차라리 죽는 게 좋겠다", "목숨을 끊고 싶다"]
+
+
+def new_state() -> Dict[str, Any]:
+    return {"messages": [], "interventions": [], "emotion_score": 0.0, "extreme_keywords": [], "next_node": "assistant"}
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.4)
+    args = ap.parse_args()
+
+    main.set_backend(main.FakeBackend(latency=args.latency))
+    main.CACHE_POLICY["emotion"] = False  # 같은 발화를 반복하므로 캐시를 끄고 잰다
+    main.LATENCY.reset()
+    for fast in (True, False):
+        state = new_state()
+        for i in range(args.turns):
+            state["messages"].append({"role": "user", "content": CRISIS[i % len(CRISIS)]})
+            state, _ = main.analyze_and_update_state(state, fast_path=fast)
+            assert main.emotion_branch(state) == "mindfulness"
+        main.wait_pending_analyses(state)
+        assert all(not m["emotion"].get("pending") for m in state["messages"])
+
+    summary = main.LATENCY.summary()
+    for name, stats in sorted(summary.items()):
+        print(f"{name:28s} " + "  ".join(f"{k}={v}" for k, v in stats.items()))
+    fast, slow = summary["analysis.fast_path"], summary["analysis.crisis_llm_path"]
+    print(f"crisis routing p50: {fast['p50_ms']} ms (fast) vs {slow['p50_ms']} ms (wait for GPT)")
+    return 0 if fast["p50_ms"] < slow["p50_ms"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,114 @@
+"""세션 state 메모리 벤치마크 (오프라인).
+
+같은 턴 시퀀스(사용자 발화 → 감정 분석 → 마인드풀니스/롤플/assistant 응답)를
+기존 dict state 와 SessionState(슬롯 레코드 + 메모리 창) 로 각각 돌리고,
+tracemalloc 으로 잰 턴당 바이트를 비교한다. 창을 쓰면 세션이 길어져도 턴당
+바이트가 줄어들어야 한다 (메모리에는 최근 window 개만 남는다).
+
+    python benchmarks/bench_state_memory.py [--turns 200 2000] [--window 200]
+"""
+from __future__ import annotations
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+import zlib
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+LINES = [
+    "회사 일이 너무 많아서 요즘 계속 지쳐요",
+    "친구랑 다퉜는데 먼저 연락하기가 어려워요",
+    "면접이 다음 주라서 잠이 잘 안 와요",
+    "가끔은 그냥 다 그만두고 싶다는 생각이 들어요",
+    "상사한테 어떻게 말해야 할지 연습해 보고 싶어요",
+    "오늘은 조금 나아진 것 같아요",
+]
+
+
+class CannedBackend(main.FakeBackend):
+    """호출 기록을 남기지 않는 가짜 백엔드 (백엔드 쪽 할당이 측정에 섞이지 않게)"""
+
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Any = None) -> str:
+        return self._canned(messages, zlib.crc32(messages[-1]["content"].encode("utf-8")))
+
+
+def legacy_state() -> Dict[str, Any]:
+    """SessionState 도입 전의 dict state"""
+    return {
+        "user_id": "bench", "messages": [], "emotion_score": 0.0, "extreme_keywords": [], "trigger_roleplay": False,
+        "roleplay_topic": "", "auto_roleplay": False, "session_end": False, "interventions": [], "report": {},
+        "mindfulness_count": 0, "roleplay_count": 0, "roleplay_logs": None, "next_node": "assistant",
+    }
+
+
+def drive(state: Dict[str, Any], turns: int) -> None:
+    mindfulness = main.MindfulnessAgent()
+    roleplay = main.RoleplayAgent()
+    assistant = main.AssistantAgent()
+    for i in range(turns):
+        text = f"{LINES[i % len(LINES)]} ({i}번째 이야기)"
+        state["messages"].append({"role": "user", "content": text})
+        state, _ = main.analyze_and_update_state(state, fast_path=False)
+        route = main.emotion_branch(state)
+        if route == "mindfulness":
+            state = mindfulness.run(state)
+        elif route == "roleplay":
+            state = roleplay.run(state)
+        else:
+            state["messages"].append({"role": "assistant", "content": assistant.reply(text)})
+
+
+def measure(make: Callable[[], Dict[str, Any]], turns: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    state = make()
+    drive(state, turns)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del state
+    return used / turns
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, nargs="+", default=[200, 2000])
+    ap.add_argument("--window", type=int, default=200)
+    args = ap.parse_args()
+
+    main.set_backend(CannedBackend())
+    for site in main.CACHE_POLICY:
+        main.CACHE_POLICY[site] = False
+    main.LATENCY = main.LatencyRecorder(maxlen=16)
+    log_dir = tempfile.mkdtemp(prefix="state_memory_")
+
+    variants = {
+        "dict state": legacy_state,
+        "SessionState (no window)": lambda: main.new_session_state("bench", window=0, log_dir=log_dir),
+        f"SessionState (window={args.window})": lambda: main.new_session_state("bench", window=args.window, log_dir=log_dir),
+    }
+    drive(legacy_state(), 20)   # 지연 import·정규식 컴파일 등 1회성 할당을 측정 밖으로
+    main.extreme_detector()
+
+    print(f"{'variant':<32}" + "".join(f"{f'{n} turns':>16}" for n in args.turns))
+    results: Dict[str, List[float]] = {}
+    for name, make in variants.items():
+        results[name] = [measure(make, n) for n in args.turns]
+        print(f"{name:<32}" + "".join(f"{b:>12.0f} B/t" for b in results[name]))
+    shutil.rmtree(log_dir, ignore_errors=True)
+
+    base = results["dict state"][-1]
+    windowed = results[f"SessionState (window={args.window})"][-1]
+    print(f"\n{args.turns[-1]} turns: {base / windowed:.1f}x fewer bytes per turn with the window")
+    return 0 if windowed < base else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
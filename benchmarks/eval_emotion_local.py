@@ -0,0 +1,154 @@
+"""로컬 어휘 사전 감정 점수 평가.
+
+라벨이 붙은 발화 집합에서 LexiconScorer 가 GPT 라벨과 얼마나 일치하는지,
+확신도 임계값별로 GPT 호출을 얼마나 건너뛰는지 보고한다. 임계값 이상인
+발화만 로컬 라벨을 쓰고 나머지는 GPT 라벨을 그대로 쓴다고 보고, 전체 파이프라인이
+GPT 단독과 일치하는 비율도 함께 낸다.
+
+    python benchmarks/eval_emotion_local.py                         # 내장 참조 라벨
+    python benchmarks/eval_emotion_local.py --labels gpt_labels.jsonl
+    python benchmarks/eval_emotion_local.py --labels texts.jsonl --label-with-llm --save gpt_labels.jsonl
+    python benchmarks/eval_emotion_local.py --labels gpt_labels.jsonl --save-calibration emotion_calibration.json
+
+라벨 파일은 줄마다 {"text": "...", "emotion_class": "...", "emotion_score": 0.0(선택)} 이다.
+batch.py --emotion 출력(EMOTION_LOCAL_THRESHOLD=2 로 GPT 만 쓴 것)도 그대로 쓸 수 있다.
+
+--save-calibration 은 로컬 클래스가 GPT 라벨과 맞은 발화의 GPT 점수로 근거량 구간별
+점수표를 만든다. 이 표(EMOTION_CALIBRATION)가 없으면 내장 기본표
+(main.DEFAULT_EMOTION_CALIBRATION)로 점수를 내고 GPT 를 건너뛴다.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+# 사람이 붙인 참조 라벨 (오프라인 기본값). 짧고 분명한 발화와 부정·혼합·긴 발화를 섞었다.
+REFERENCE: List[Dict[str, Any]] = [
+    {"text": "오늘 합격 소식 듣고 너무 기뻐요", "emotion_class": "기쁨"},
+    {"text": "친구들이랑 놀아서 정말 즐거웠어요", "emotion_class": "기쁨"},
+    {"text": "드디어 프로젝트 끝나서 홀가분하고 뿌듯해요", "emotion_class": "기쁨"},
+    {"text": "요즘 행복해요", "emotion_class": "기쁨"},
+    {"text": "상담 받고 나서 조금 나아졌어요, 감사해요", "emotion_class": "기쁨"},
+    {"text": "내일 여행 가서 설레요", "emotion_class": "기쁨"},
+    {"text": "칭찬을 들었는데 솔직히 좀 어색했어요", "emotion_class": "중립"},
+    {"text": "너무 우울하고 눈물이 나요", "emotion_class": "슬픔"},
+    {"text": "할머니가 세상을 떠나셔서 슬퍼요", "emotion_class": "슬픔"},
+    {"text": "혼자 있으니까 외로워요", "emotion_class": "슬픔"},
+    {"text": "헤어졌는데 자꾸 생각나서 울었어요", "emotion_class": "슬픔"},
+    {"text": "친구가 내 생일을 잊어서 서운했어요", "emotion_class": "슬픔"},
+    {"text": "하나도 안 슬퍼요 그냥 담담해요", "emotion_class": "중립"},
+    {"text": "엄마한테 혼나서 속상해요", "emotion_class": "슬픔"},
+    {"text": "팀장이 내 탓만 해서 진짜 화가 나요", "emotion_class": "분노"},
+    {"text": "동생 때문에 짜증나 죽겠어요", "emotion_class": "분노"},
+    {"text": "억울해서 잠이 안 와요", "emotion_class": "분노"},
+    {"text": "회의에서 무시당해서 열받았어요", "emotion_class": "분노"},
+    {"text": "어이없는 일을 당해서 너무 화났어요", "emotion_class": "분노"},
+    {"text": "화가 나는데 한편으론 서운하기도 해요", "emotion_class": "분노"},
+    {"text": "다음 주 면접이 걱정돼요", "emotion_class": "불안"},
+    {"text": "시험 결과가 나올 때까지 너무 초조해요", "emotion_class": "불안"},
+    {"text": "밤에 혼자 있으면 무서워요", "emotion_class": "불안"},
+    {"text": "발표 생각만 하면 긴장돼서 손이 떨려요", "emotion_class": "불안"},
+    {"text": "앞으로 어떡하지 막막해요", "emotion_class": "불안"},
+    {"text": "회사에서 잘릴까 봐 불안해요", "emotion_class": "불안"},
+    {"text": "걱정은 안 돼요, 준비 다 했거든요", "emotion_class": "중립"},
+    {"text": "요즘 회사 일 때문에 지쳐요", "emotion_class": "무기력"},
+    {"text": "아무것도 하기 싫고 누워만 있어요", "emotion_class": "무기력"},
+    {"text": "의욕이 하나도 없어요", "emotion_class": "무기력"},
+    {"text": "번아웃 온 것 같아요", "emotion_class": "무기력"},
+    {"text": "기운이 없어서 일이 손에 안 잡혀요", "emotion_class": "무기력"},
+    {"text": "매일 피곤하고 귀찮아요", "emotion_class": "무기력"},
+    {"text": "그냥 그래요", "emotion_class": "중립"},
+    {"text": "별일 없이 평범한 하루였어요", "emotion_class": "중립"},
+    {"text": "안녕하세요", "emotion_class": "중립"},
+    {"text": "점심은 김밥 먹었어요", "emotion_class": "중립"},
+    {"text": "그럭저럭 지내요", "emotion_class": "중립"},
+    {"text": "잘 모르겠어요", "emotion_class": "중립"},
+    {"text": "주말에 본가에 다녀왔어요", "emotion_class": "중립"},
+    {"text": "요즘 일도 많고 사람들 관계도 복잡해서 뭐가 뭔지 모르겠는데 그래도 버티고는 있어요", "emotion_class": "무기력"},
+    {"text": "승진해서 좋긴 한데 책임이 커져서 걱정도 돼요", "emotion_class": "불안"},
+    {"text": "힘들어요", "emotion_class": "무기력"},
+    {"text": "왜 나만 이런 일을 겪어야 하는지 모르겠어요", "emotion_class": "슬픔"},
+    {"text": "친구가 연락을 안 받아요", "emotion_class": "불안"},
+    {"text": "오늘 날씨가 좋아서 산책했어요", "emotion_class": "기쁨"},
+]
+
+
+def label_with_llm(items: List[Dict[str, Any]]) -> None:
+    for item in items:
+        if "emotion_class" not in item:
+            data = main._request_emotion_llm(item["text"])
+            item["emotion_class"] = data.get("emotion_class", "중립")
+            item["emotion_score"] = data.get("emotion_score")
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labels", default=None, help="라벨 JSONL (없으면 내장 참조 라벨)")
+    ap.add_argument("--label-with-llm", action="store_true", help="라벨이 없는 줄은 GPT 로 라벨링")
+    ap.add_argument("--save", default=None, help="라벨링 결과 저장 경로")
+    ap.add_argument("--thresholds", type=float, nargs="+", default=[0.4, 0.5, 0.6, 0.7, 0.8, 0.9])
+    ap.add_argument("--save-calibration", default=None, help="GPT 점수로 맞춘 로컬 점수 보정표 저장 경로")
+    args = ap.parse_args()
+
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            items = [json.loads(line) for line in f if line.strip()]
+    else:
+        items = [dict(x) for x in REFERENCE]
+    if args.label_with_llm:
+        main.load_env()
+        label_with_llm(items)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(x, ensure_ascii=False) + "\n" for x in items)
+    items = [x for x in items if x.get("emotion_class")]
+
+    scorer = main.lexicon_scorer()
+    t0 = time.perf_counter()
+    local = scorer.score_many([x["text"] for x in items])
+    per_item_us = (time.perf_counter() - t0) / max(len(items), 1) * 1e6
+
+    calibration = "default" if scorer.calibration is main.DEFAULT_EMOTION_CALIBRATION else "file"
+    print(f"labeled={len(items)}  calibration={calibration}  "
+          f"local scorer {per_item_us:.1f}µs/utterance")
+    print(f"{'threshold':>9} {'local class':>12} {'LLM avoided':>12} {'agree(local)':>13} {'agree(pipeline)':>16} {'score MAE':>10}")
+    for th in args.thresholds:
+        covered = [(x, r) for x, r in zip(items, local) if r["confidence"] >= th]
+        avoided = sum(1 for _, r in covered if r["emotion_score"] is not None)   # 보정표 구간이 있어 점수까지 로컬
+        agree = sum(1 for x, r in covered if r["emotion_class"] == x["emotion_class"])
+        scored = [(x, r) for x, r in covered if x.get("emotion_score") is not None and r["emotion_score"] is not None]
+        mae = sum(abs(r["emotion_score"] - float(x["emotion_score"])) for x, r in scored) / len(scored) if scored else None
+        print(f"{th:>9.2f} {len(covered) / len(items):>11.0%} {avoided / len(items):>11.0%} "
+              f"{(agree / len(covered) if covered else 1.0):>12.0%} "
+              f"{(len(items) - len(covered) + agree) / len(items):>15.0%} "
+              f"{(f'{mae:.3f}' if mae is not None else '-'):>10}")
+
+    th = main.local_emotion_threshold()
+    confusion = Counter((x["emotion_class"], r["emotion_class"]) for x, r in zip(items, local) if r["confidence"] >= th)
+    wrong = {k: v for k, v in confusion.items() if k[0] != k[1]}
+    print(f"\ndefault threshold {th}: disagreements (label → local) {wrong or 'none'}")
+
+    if args.save_calibration:
+        pairs = [(r, float(x["emotion_score"])) for x, r in zip(items, local)
+                 if x.get("emotion_score") is not None and r["emotion_class"] == x["emotion_class"] and r["confidence"] > 0]
+        if not pairs:
+            print("no GPT scores in labels: calibration not saved (use --label-with-llm)")
+            return 1
+        table = main.fit_emotion_calibration([r for r, _ in pairs], [s for _, s in pairs])
+        with open(args.save_calibration, "w", encoding="utf-8") as f:
+            json.dump(table, f, ensure_ascii=False, indent=2)
+        print(f"calibration from {len(pairs)} utterances → {args.save_calibration}: "
+              f"emotional={table['emotional']} neutral={table['neutral']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,127 @@
+"""다중 세션 서버 부하 테스트 (오프라인).
+
+server.py 를 같은 프로세스에서 임의 포트로 띄우고, FakeBackend 위에서 여러 세션을
+동시에 진행시킨다. 세션마다 keep-alive 커넥션 하나로 생성 → 턴 N 회 → 종료를
+보내고, 처리량(sessions/sec)과 턴 지연 p50/p99 를 출력한다.
+
+    python benchmarks/loadtest_server.py [--sessions 200] [--concurrency 100] [--turns 4] [--latency 0.05]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+import server  # noqa: E402
+
+UTTERANCES = [
+    "회사 일이 너무 많아서 지쳐요",
+    "친구랑 다퉜는데 어떻게 말을 꺼내야 할지 모르겠어요",
+    "면접이 걱정돼서 잠이 안 와요",
+    "요즘 다 그만두고 싶다는 생각이 들어요",
+    "상사한테 할 말을 연습해 보고 싶어요",
+    "괜찮아요, 그냥 좀 피곤해요",
+]
+
+
+class Client:
+    """keep-alive HTTP/1.1 JSON 클라이언트"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> "Client":
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def call(self, method: str, path: str, payload: Any = None) -> Tuple[int, Any]:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def one_session(host: str, port: int, i: int, turns: int, turn_lat: List[float]) -> bool:
+    client = await Client.connect(host, port)
+    try:
+        status, body = await client.call("POST", "/sessions", {"user_id": f"bench-{i}"})
+        if status != 200:
+            return False
+        sid = body["session_id"]
+        for t in range(turns):
+            t0 = time.perf_counter()
+            status, _ = await client.call("POST", f"/sessions/{sid}/turns", {"text": UTTERANCES[(i + t) % len(UTTERANCES)]})
+            turn_lat.append(time.perf_counter() - t0)
+            if status != 200:
+                return False
+        status, report = await client.call("POST", f"/sessions/{sid}/end")
+        return status == 200 and "emotion_summary" in report
+    finally:
+        await client.close()
+
+
+async def drive(args: argparse.Namespace) -> int:
+    server.configure_backend(args.llm_concurrency, args.latency)
+    main.CACHE_POLICY["emotion"] = False
+    manager = server.SessionManager(llm_concurrency=args.llm_concurrency, graph_dir=tempfile.mkdtemp(prefix="loadtest_"))
+    app = server.HttpApp(manager)
+    srv = await asyncio.start_server(app.handle, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+
+    gate = asyncio.Semaphore(args.concurrency)
+    turn_lat: List[float] = []
+
+    async def bounded(i: int) -> bool:
+        async with gate:
+            return await one_session("127.0.0.1", port, i, args.turns, turn_lat)
+
+    t0 = time.perf_counter()
+    ok = await asyncio.gather(*(bounded(i) for i in range(args.sessions)))
+    wall = time.perf_counter() - t0
+    srv.close()
+    await srv.wait_closed()
+    manager.executor.shutdown(wait=True)
+
+    lat = sorted(turn_lat)
+    pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    print(f"sessions={args.sessions} concurrency={args.concurrency} turns/session={args.turns} "
+          f"llm_concurrency={args.llm_concurrency} fake_latency={args.latency * 1000:.0f}ms")
+    print(f"wall={wall:.2f}s sessions/sec={args.sessions / wall:.1f} turns/sec={len(lat) / wall:.1f}")
+    print(f"turn latency p50={pick(0.5):.1f}ms p99={pick(0.99):.1f}ms max={lat[-1] * 1000:.1f}ms")
+    print(f"failed sessions={ok.count(False)} health={json.dumps(manager.health())}")
+    return 0 if all(ok) and not manager.sessions else 1
+
+
+def run() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=100)
+    ap.add_argument("--turns", type=int, default=4)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--llm-concurrency", type=int, default=32)
+    return asyncio.run(drive(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(run())
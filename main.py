@@ -1,23 +1,54 @@
 from __future__ import annotations
-from typing import Dict, List, Any, Tuple
-from openai import OpenAI
+from typing import Dict, List, Any, Tuple, Callable, Optional, Iterator, TYPE_CHECKING
 import os
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from collections import Counter
+from collections import Counter, OrderedDict, deque
+from collections.abc import MutableMapping
+from abc import ABC, abstractmethod
 from datetime import datetime
 import re, json
-from dotenv import load_dotenv
+import math
+import sys
+from itertools import islice
+import hashlib
+import copy
+import bisect
+from array import array
+import random
+import uuid
+import threading
+import time
+from contextlib import contextmanager
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse as _sre_parse
+if TYPE_CHECKING:
+    # asyncio / concurrent.futures / sqlite3 은 쓰는 곳에서 import (가벼운 import 유지)
+    import sqlite3
+    from concurrent.futures import Executor, Future, ThreadPoolExecutor
 
 # ───────────────────────────────
 # Env & OpenAI
 # ───────────────────────────────
-load_dotenv(override=True)
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise RuntimeError("OPENAI_API_KEY 가 설정되어 있지 않습니다.")
-client = OpenAI(api_key=api_key)
+# openai / matplotlib / dotenv 와 클라이언트는 처음 쓸 때 불러온다.
+# 탐지·라우팅 함수만 쓰는 워커는 API 키 없이 가볍게 import 할 수 있다.
+DEFAULT_MODEL = "gpt-4o-mini"
+_env_loaded = False
+
+def load_env() -> None:
+    """.env 를 한 번만 읽는다 (LLM 을 처음 쓸 때, 또는 실행부에서)"""
+    global _env_loaded
+    if not _env_loaded:
+        _env_loaded = True
+        try:
+            from dotenv import load_dotenv
+        except ImportError:     # .env 없이 환경 변수만 쓰는 배포
+            return
+        load_dotenv(override=True)
+
+def llm_model() -> str:
+    load_env()
+    return os.getenv("LLM_MODEL", DEFAULT_MODEL)
 
 # ───────────────────────────────
 # 유틸
@@ -43,6 +74,873 @@ def _extract_json_block(text: str) -> dict:
 def _normalize_snippet(s: str) -> str:
     return re.sub(r"\s+", " ", s).strip()
 
+# 지연 히스토그램 경계(초). Prometheus histogram 의 le 값이 된다.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class LatencyRecorder:
+    """단계별 계측 (스레드 안전).
+
+    - 지연: 이름별 최근 maxlen 개 표본(summary 의 백분위)과 프로세스 시작 이후 누적 히스토그램
+    - 카운터: count(name, **labels) — 캐시 적중, 폴백, 라우팅, 예외(errors) 등
+    - LLM 사용량: llm_usage() 로 호출 지점·모델별 토큰과 추정 비용
+    prometheus() 는 누적 값을 텍스트 노출 형식으로 내고, open_trace(path) 를 부르면
+    지연 기록마다 JSONL 한 줄({"ts", "span", "ms", ...속성})을 남긴다.
+    """
+    def __init__(self, maxlen: int = 10000, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self._samples: Dict[str, deque] = {}
+        self._hist: Dict[str, List[float]] = {}     # 이름 → [버킷별 개수..., +Inf 개수, 합계(초)]
+        self._counters: Counter = Counter()         # (이름, 정렬된 라벨 튜플) → 값
+        self._lock = threading.Lock()
+        self._maxlen = maxlen
+        self.buckets = tuple(buckets)
+        self._trace: Optional[Any] = None
+        self._trace_lock = threading.Lock()
+        self._trace_flushed = 0.0
+        self._trace_names: Dict[str, str] = {}      # 이름 → JSON 문자열 (기록마다 인코딩하지 않게)
+        self._trace_encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+
+    def record(self, name: str, seconds: float, **attrs: Any) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self._maxlen)).append(seconds)
+            h = self._hist.get(name)
+            if h is None:
+                h = self._hist[name] = [0] * (len(self.buckets) + 1) + [0.0]
+            h[i] += 1
+            h[-1] += seconds
+        if self._trace is not None:
+            self._write_trace(name, seconds, attrs)
+
+    @contextmanager
+    def time(self, name: str, **attrs: Any):
+        """구간 지연을 기록한다. 예외는 errors{stage, error} 로 세고 그대로 던진다.
+
+        yield 하는 dict 에 넣은 값은 트레이스 속성으로 함께 남는다.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs["error"] = type(e).__name__
+            self.count("errors", stage=name, error=attrs["error"])
+            raise
+        finally:
+            self.record(name, time.perf_counter() - t0, **attrs)
+
+    def count(self, name: str, n: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += n
+
+    def llm_usage(self, site: str, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """LLM 호출 한 번의 토큰 수를 누적하고 추정 비용(USD)을 돌려준다."""
+        cost = llm_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            self._counters[("llm_tokens", (("kind", "prompt"), ("model", model), ("site", site)))] += prompt_tokens
+            self._counters[("llm_tokens", (("kind", "completion"), ("model", model), ("site", site)))] += completion_tokens
+            self._counters[("llm_cost_usd", (("model", model), ("site", site)))] += cost
+        return cost
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            snap = {k: sorted(v) for k, v in self._samples.items()}
+        out: Dict[str, Dict[str, float]] = {}
+        for name, xs in snap.items():
+            if not xs:
+                continue
+            pick = lambda q: xs[min(len(xs) - 1, int(q * len(xs)))]
+            out[name] = {
+                "count": len(xs),
+                "mean_ms": round(sum(xs) / len(xs) * 1000, 3),
+                "p50_ms": round(pick(0.50) * 1000, 3),
+                "p95_ms": round(pick(0.95) * 1000, 3),
+                "max_ms": round(xs[-1] * 1000, 3),
+            }
+        return out
+
+    def prometheus(self, prefix: str = "counsel") -> str:
+        """누적 히스토그램·카운터를 Prometheus 텍스트 형식(0.0.4)으로"""
+        with self._lock:
+            hist = {k: list(v) for k, v in self._hist.items()}
+            counters = dict(self._counters)
+        lines = [f"# HELP {prefix}_stage_seconds 단계별 지연", f"# TYPE {prefix}_stage_seconds histogram"]
+        bounds = [repr(b) for b in self.buckets] + ["+Inf"]
+        for name, h in sorted(hist.items()):
+            stage = _prom_label(name)
+            acc = 0
+            for le, n in zip(bounds, h[:-1]):
+                acc += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {acc}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {h[-1]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {acc}')
+        typed: set = set()
+        for (name, labels), value in sorted(counters.items()):
+            metric = f"{prefix}_{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            label_text = ",".join(f'{k}="{_prom_label(str(v))}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value:g}" if label_text else f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def open_trace(self, path: str) -> None:
+        """이후 기록을 path 에 JSONL 로 덧붙인다 (파일 버퍼에 모았다가 1초마다 flush)."""
+        self.close_trace()
+        self._trace = open(path, "a", encoding="utf-8")
+
+    def _write_trace(self, name: str, seconds: float, attrs: Dict[str, Any]) -> None:
+        now = time.time()
+        span = self._trace_names.get(name)
+        if span is None:
+            span = self._trace_names[name] = self._trace_encode(name)
+        # 속성 없는 기록(대부분)은 인코더를 거치지 않고 바로 만든다
+        if attrs:
+            line = '{"ts": %.3f, "span": %s, "ms": %.3f, %s\n' % (now, span, seconds * 1000, self._trace_encode(attrs)[1:])
+        else:
+            line = '{"ts": %.3f, "span": %s, "ms": %.3f}\n' % (now, span, seconds * 1000)
+        with self._trace_lock:
+            if self._trace is None:
+                return
+            self._trace.write(line)
+            if now - self._trace_flushed >= 1.0:
+                self._trace.flush()
+                self._trace_flushed = now
+
+    def close_trace(self) -> None:
+        with self._trace_lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._hist.clear()
+            self._counters.clear()
+
+def _prom_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# 모델별 100만 토큰당 USD (입력, 출력). 모르는 모델은 LLM_PRICE="입력,출력" 으로 지정 (없거나 틀리면 0)
+LLM_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+_model_prices: Dict[str, Tuple[float, float]] = {}
+_price_override: Optional[Tuple[float, float]] = None
+
+def parse_llm_price(value: Optional[str]) -> Tuple[float, float]:
+    """LLM_PRICE="입력,출력" 해석. 비었거나 형식이 틀리면 경고 후 (0, 0)."""
+    if not value:
+        return (0.0, 0.0)
+    try:
+        parts = [float(x) for x in value.split(",")]
+        if len(parts) != 2 or not all(math.isfinite(x) and x >= 0 for x in parts):
+            raise ValueError("입력,출력 두 개의 0 이상 숫자가 필요합니다")
+    except ValueError as e:
+        print(f"[warn] LLM_PRICE={value!r}: 무시하고 비용을 0 으로 계산합니다 ({e})", file=sys.stderr)
+        return (0.0, 0.0)
+    return (parts[0], parts[1])
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    global _price_override
+    price = _model_prices.get(model)
+    if price is None:
+        for name in sorted(LLM_PRICES, key=len, reverse=True):     # 날짜 붙은 스냅샷 이름도 접두어로 맞춘다
+            if model.startswith(name):
+                price = LLM_PRICES[name]
+                break
+        else:
+            if _price_override is None:      # 한 번만 읽고 경고한다
+                _price_override = parse_llm_price(os.getenv("LLM_PRICE"))
+            price = _price_override
+        _model_prices[model] = price
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6
+
+LATENCY = LatencyRecorder()
+
+_STREAM_END = object()
+
+class ThreadedStream:
+    """동기 토큰 이터레이터를 작업 스레드에서 돌려 async 이터레이터로 노출한다.
+
+    만드는 즉시(실행 중인 이벤트 루프 안에서) 생산을 시작하므로, 소비를 나중에
+    시작해도 그 사이 도착한 토큰은 큐에 쌓여 있다. cancel() 은 생산을 멈추고
+    원본 이터레이터를 닫는다.
+    """
+    def __init__(self, make_iter: Callable[[], Iterator[str]], executor: Optional[Executor] = None):
+        import asyncio
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stop = threading.Event()
+        self.done = self._loop.run_in_executor(executor, self._pump, make_iter)
+
+    def _pump(self, make_iter: Callable[[], Iterator[str]]) -> None:
+        put = lambda item: self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        it = None
+        try:
+            it = make_iter()
+            for token in it:
+                if self._stop.is_set():
+                    break
+                put(token)
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+            put(_STREAM_END)
+
+    def cancel(self) -> None:
+        self._stop.set()
+
+    def __aiter__(self) -> "ThreadedStream":
+        return self
+
+    async def __anext__(self) -> str:
+        item = await self._queue.get()
+        if item is _STREAM_END:
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+# ───────────────────────────────
+# LLM 백엔드 (풀링 · 데드라인 · 재시도 · 동시성 제한 · 서킷 브레이커)
+# ───────────────────────────────
+class LLMUnavailable(RuntimeError):
+    """서킷이 열려 있거나 데드라인 안에 응답을 받지 못함"""
+
+_usage = threading.local()
+
+def _report_usage(usage: Any) -> None:
+    """백엔드가 받은 토큰 사용량을 같은 스레드의 chat_completion/chat_stream 에 넘긴다"""
+    if usage is not None:
+        _usage.value = (usage.prompt_tokens, usage.completion_tokens)
+
+def _take_usage() -> Optional[Tuple[int, int]]:
+    value = getattr(_usage, "value", None)
+    _usage.value = None
+    return value
+
+class LLMBackend(ABC):
+    """chat completion 한 번을 수행해 응답 텍스트를 돌려주는 백엔드 (timeout=None 이면 백엔드 기본값)"""
+    @abstractmethod
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None) -> str:
+        ...
+
+    def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None) -> Iterator[str]:
+        """응답 토큰을 도착하는 대로 내보낸다. 기본 구현은 complete 결과를 한 번에 내보낸다."""
+        yield self.complete(model, messages, temperature, timeout=timeout)
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI SDK 백엔드. 하나의 httpx 커넥션 풀을 모든 호출이 공유한다 (SDK 자체 재시도는 끔)."""
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 max_connections: int = 20, max_keepalive: int = 10, timeout: float = 60.0):
+        key = api_key or os.getenv("OPENAI_API_KEY")
+        if not key:
+            raise RuntimeError("OPENAI_API_KEY 가 설정되어 있지 않습니다.")
+        import httpx
+        from openai import OpenAI, DefaultHttpxClient
+        http_client = DefaultHttpxClient(limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive))
+        self.client = OpenAI(api_key=key, base_url=base_url, http_client=http_client, max_retries=0)
+        self.timeout = timeout
+
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None) -> str:
+        response = self.client.chat.completions.create(model=model, messages=messages, temperature=temperature,
+                                                       timeout=self.timeout if timeout is None else timeout)
+        _report_usage(response.usage)
+        return response.choices[0].message.content
+
+    def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None) -> Iterator[str]:
+        chunks = self.client.chat.completions.create(model=model, messages=messages, temperature=temperature, stream=True,
+                                                     stream_options={"include_usage": True},
+                                                     timeout=self.timeout if timeout is None else timeout)
+        try:
+            for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                elif getattr(chunk, "usage", None) is not None:     # 마지막 청크
+                    _report_usage(chunk.usage)
+        finally:
+            chunks.close()
+
+class CircuitBreaker:
+    """연속 실패가 threshold 에 이르면 cooldown 동안 호출을 막고, 이후 한 번 시험 호출을 허용한다."""
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+    def abandon(self) -> None:
+        """호출이 결과 없이 중단됨 (예: 첫 토큰 전에 스트림을 닫음) — 시험 호출 자격만 반납"""
+        with self._lock:
+            self._trial = False
+
+class FairLimiter:
+    """FIFO 순서로 슬롯을 넘겨주는 동시성 제한기.
+
+    threading.Semaphore 는 방금 슬롯을 반납한 스레드가 곧바로 다시 가져갈 수
+    있어서, 부하가 걸리면 오래 기다린 호출이 데드라인까지 굶는다.
+    """
+    def __init__(self, slots: int):
+        self._free = slots
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return True
+            ev = threading.Event()
+            self._waiters.append(ev)
+        if ev.wait(timeout):
+            return True
+        with self._lock:
+            if ev.is_set():     # 타임아웃 직후 슬롯을 넘겨받은 경우
+                return True
+            self._waiters.remove(ev)
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()   # 대기자에게 슬롯을 바로 넘긴다
+            else:
+                self._free += 1
+
+class RateLimiter:
+    """토큰 버킷 요청률 제한. 초당 rate 회, 최대 burst 회까지 몰아서 허용한다 (기본 1: 고른 간격).
+
+    토큰을 미리 예약하므로 기다리는 호출들은 도착 순서대로 간격을 두고 풀린다.
+    """
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """토큰 하나를 얻을 때까지 기다린다. deadline(monotonic) 안에 못 얻으면 False."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            wait = (1.0 - self._tokens) / self.rate if self._tokens < 1.0 else 0.0
+            if deadline is not None and now + wait > deadline:
+                return False
+            self._tokens -= 1.0
+        if wait:
+            time.sleep(wait)
+        return True
+
+class ResilientBackend(LLMBackend):
+    """다른 백엔드를 감싸 호출별 데드라인, 지터 재시도, 동시성 제한, 서킷 브레이커를 적용한다.
+
+    timeout 은 재시도와 대기를 모두 포함한 호출 전체의 데드라인이다. 서킷이
+    열리면 곧바로 LLMUnavailable 을 던지고, 호출 지점은 기존 기본값(중립 감정,
+    빈 요약)으로 대체한다.
+    """
+    def __init__(self, inner: LLMBackend, timeout: float = 20.0, retries: int = 2,
+                 backoff: float = 0.5, max_backoff: float = 4.0, max_concurrency: int = 8,
+                 breaker: Optional[CircuitBreaker] = None, rate_limit: Optional[float] = None):
+        self.inner = inner
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.max_concurrency = max_concurrency
+        self._slots = FairLimiter(max_concurrency)
+        self._rate = RateLimiter(rate_limit) if rate_limit else None   # 초당 요청 수 (재시도 포함)
+        self._stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def with_concurrency(self, max_concurrency: int) -> "ResilientBackend":
+        """동시성 한도만 바꾼 사본. 서킷·속도 제한·통계는 원본과 공유한다."""
+        clone = copy.copy(self)
+        clone.max_concurrency = max_concurrency
+        clone._slots = FairLimiter(max_concurrency)
+        return clone
+
+    def _count(self, what: str) -> None:
+        with self._stats_lock:
+            self._stats[what] += 1
+
+    def _enter(self, deadline: float, last: Optional[BaseException]) -> None:
+        """동시성 슬롯과 서킷 통과를 얻는다. 실패하면 LLMUnavailable."""
+        if self._rate is not None and not self._rate.acquire(deadline):
+            self._count("deadline_exceeded")
+            raise LLMUnavailable("LLM deadline exceeded (rate limit)") from last
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+            self._count("deadline_exceeded")
+            raise LLMUnavailable("LLM deadline exceeded") from last
+        # 슬롯을 잡은 뒤에 묻는다: half-open 시험 호출은 반드시 성공/실패로 끝나야 한다
+        if not self.breaker.allow():
+            self._slots.release()
+            self._count("short_circuits")
+            raise LLMUnavailable("LLM circuit open") from last
+
+    def _backoff(self, attempt: int, deadline: float) -> bool:
+        """full jitter 지수 백오프. 데드라인을 넘기게 되면 False."""
+        pause = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        if time.monotonic() + pause >= deadline:
+            return False
+        self._count("retries")
+        time.sleep(pause)
+        return True
+
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None) -> str:
+        deadline = time.monotonic() + (timeout or self.timeout)
+        last: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            self._enter(deadline, last)
+            try:
+                self._count("attempts")
+                text = self.inner.complete(model, messages, temperature, timeout=max(0.001, deadline - time.monotonic()))
+            except Exception as e:
+                last = e
+                self.breaker.failure()
+                self._count("failures")
+            else:
+                self.breaker.success()
+                return text
+            finally:
+                self._slots.release()
+            if attempt < self.retries and not self._backoff(attempt, deadline):
+                break
+        self._count("exhausted")
+        raise LLMUnavailable(f"LLM call failed: {last!r}") from last
+
+    def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None) -> Iterator[str]:
+        """complete 와 같은 보호 장치. 재시도는 첫 토큰이 나오기 전까지만 한다."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        last: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            self._enter(deadline, last)
+            started = False
+            try:
+                self._count("attempts")
+                for token in self.inner.stream(model, messages, temperature, timeout=max(0.001, deadline - time.monotonic())):
+                    started = True
+                    yield token
+            except GeneratorExit:
+                # 소비자가 스트림을 닫음 (예: 투기적 응답 폐기)
+                if started:
+                    self.breaker.success()
+                else:
+                    self.breaker.abandon()
+                raise
+            except Exception as e:
+                last = e
+                self.breaker.failure()
+                self._count("failures")
+                if started:
+                    raise LLMUnavailable(f"LLM stream interrupted: {e!r}") from e
+            else:
+                self.breaker.success()
+                return
+            finally:
+                self._slots.release()
+            if attempt < self.retries and not self._backoff(attempt, deadline):
+                break
+        self._count("exhausted")
+        raise LLMUnavailable(f"LLM call failed: {last!r}") from last
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out["breaker"] = self.breaker.state
+        return out
+
+class FakeBackend(LLMBackend):
+    """오프라인 부하 테스트용 결정적 가짜 백엔드.
+
+    응답은 입력 메시지의 해시로 정해지고, 지연(latency ± jitter)과 실패율도
+    (seed, 메시지, 같은 메시지의 호출 순번) 으로 정해지므로 동시 실행 순서와
+    관계없이 재현된다. 지연이 timeout 을 넘으면 timeout 만큼 기다린 뒤 TimeoutError.
+    """
+    EMOTIONS = ("기쁨", "슬픔", "분노", "불안", "무기력", "중립")
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0,
+                 responder: Optional[Callable[[List[Dict[str, str]]], str]] = None, token_delay: float = 0.0,
+                 per_char: float = 0.0):
+        self.latency = latency      # 첫 토큰까지의 지연
+        self.per_char = per_char    # 프롬프트 길이에 비례하는 추가 지연 (문자당 초)
+        self.token_delay = token_delay  # stream 에서 토큰 사이 지연
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.responder = responder
+        self.calls = 0
+        self._seen: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def complete(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None) -> str:
+        key = cache_key(model, messages, temperature)
+        with self._lock:
+            self.calls += 1
+            nth = self._seen[key]
+            self._seen[key] += 1
+        rng = random.Random(f"{self.seed}:{key}:{nth}")
+        delay = max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+        if self.per_char:
+            delay += self.per_char * sum(len(m["content"]) for m in messages)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("fake backend timeout")
+        if delay:
+            time.sleep(delay)
+        if rng.random() < self.failure_rate:
+            raise ConnectionError("fake backend failure")
+        if self.responder is not None:
+            return self.responder(messages)
+        return self._canned(messages, int(key[:8], 16))
+
+    def stream(self, model: str, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float] = None) -> Iterator[str]:
+        text = self.complete(model, messages, temperature, timeout=timeout)
+        for i, token in enumerate(re.findall(r"\S+\s*|\s+", text)):
+            if i and self.token_delay:
+                time.sleep(self.token_delay)
+            yield token
+
+    def _canned(self, messages: List[Dict[str, str]], h: int) -> str:
+        system = messages[0]["content"]
+        if "감정 분석" in system:
+            return json.dumps({"emotion_class": self.EMOTIONS[h % len(self.EMOTIONS)],
+                               "emotion_score": round((h % 100) / 100, 2), "extreme": False}, ensure_ascii=False)
+        if "보고서" in system:
+            return json.dumps({"topic_summary": "가짜 요약", "emotional_flow": "변화 없음", "intervention_points": [],
+                               "repeated_patterns": "", "session_end_reason": "사용자 종료"}, ensure_ascii=False)
+        if "역할극" in system:
+            return "\n".join(["상황: 연습 상황입니다.", "상담자: 어떤 점이 가장 걱정되나요?", "나: 잘 해낼 수 있을지 모르겠어요.",
+                              "상담자: 천천히 한 문장씩 말해볼까요?", "나: 네, 해볼게요.", "상담자: 좋아요. 첫 문장을 말해보세요.", "나:"])
+        return f"그렇게 느끼셨군요. 그때 어떤 생각이 가장 먼저 들었나요? ({h % 1000})"
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+def default_backend() -> LLMBackend:
+    """환경 변수로 구성한 기본 백엔드. LLM_BACKEND=fake 이면 API 키 없이 동작한다."""
+    load_env()
+    if os.getenv("LLM_BACKEND", "openai") == "fake":
+        inner: LLMBackend = FakeBackend(latency=float(os.getenv("FAKE_LLM_LATENCY", "0")),
+                                        failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")))
+    else:
+        inner = OpenAIBackend(max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")))
+    return ResilientBackend(
+        inner,
+        timeout=float(os.getenv("LLM_TIMEOUT", "20")),
+        retries=int(os.getenv("LLM_RETRIES", "2")),
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        rate_limit=float(os.getenv("LLM_RATE_LIMIT", "0")) or None,
+    )
+
+def get_backend() -> LLMBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = default_backend()
+        return _backend
+
+def set_backend(backend: Optional[LLMBackend]) -> None:
+    """백엔드 교체 (None 이면 다음 호출 때 기본 백엔드를 다시 만든다)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+# ───────────────────────────────
+# LLM 응답 캐시 (메모리 LRU + SQLite)
+# ───────────────────────────────
+def cache_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    """(model, messages, temperature) 의 내용 주소 키"""
+    raw = json.dumps({"model": model, "messages": messages, "temperature": temperature},
+                     ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """LLM 응답 텍스트 캐시.
+
+    1단계는 프로세스 내 LRU(max_entries), 2단계는 선택적인 SQLite 파일(path)이다.
+    SQLite 항목은 ttl 초가 지나면 만료되고, max_rows 를 넘으면 가장 오래 안 쓴
+    항목부터 지운다. 통계는 호출 지점(site)별로 모은다.
+    """
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None,
+                 ttl: float = 7 * 24 * 3600, max_rows: int = 100_000):
+        self.max_entries = max_entries
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._mem: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._puts = 0
+        self._stats: Dict[str, Counter] = {}
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.path and self._db is None:
+            import sqlite3
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS llm_cache_used ON llm_cache(used)")
+            self._db = db
+        return self._db
+
+    def _count(self, site: str, what: str) -> None:
+        self._stats.setdefault(site, Counter())[what] += 1
+
+    def get(self, key: str, site: str = "default") -> Optional[str]:
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self._count(site, "memory_hits")
+                return value
+            db = self._conn()
+            if db is not None:
+                now = time.time()
+                row = db.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    db.execute("UPDATE llm_cache SET used = ? WHERE key = ?", (now, key))
+                    db.commit()
+                    self._remember(key, row[0])
+                    self._count(site, "disk_hits")
+                    return row[0]
+                if row is not None:
+                    db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    db.commit()
+            self._count(site, "misses")
+            return None
+
+    def _remember(self, key: str, value: str) -> None:
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def put(self, key: str, value: str, site: str = "default") -> None:
+        with self._lock:
+            self._remember(key, value)
+            self._count(site, "stores")
+            db = self._conn()
+            if db is None:
+                return
+            now = time.time()
+            db.execute("INSERT OR REPLACE INTO llm_cache (key, value, created, used) VALUES (?, ?, ?, ?)", (key, value, now, now))
+            self._puts += 1
+            if self._puts % 64 == 0:
+                self._evict(db, now)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,))
+        (rows,) = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        if rows > self.max_rows:
+            db.execute("DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY used LIMIT ?)", (rows - self.max_rows,))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """site 별 memory_hits / disk_hits / misses / stores 와 적중률"""
+        with self._lock:
+            out: Dict[str, Dict[str, Any]] = {}
+            for site, c in self._stats.items():
+                lookups = c["memory_hits"] + c["disk_hits"] + c["misses"]
+                out[site] = {k: c[k] for k in ("memory_hits", "disk_hits", "misses", "stores")}
+                out[site]["hit_rate"] = round((lookups - c["misses"]) / lookups, 4) if lookups else 0.0
+            return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._stats.clear()
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+
+# 저온도 분류·보고서는 기본 캐시, 창의적 응답(assistant/roleplay)은 opt-in
+CACHE_POLICY: Dict[str, bool] = {"emotion": True, "report": True, "summary": True, "assistant": False, "roleplay": False}
+_llm_cache: Optional[ResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+def llm_cache() -> ResponseCache:
+    """환경 변수로 구성한 공용 캐시 (처음 쓸 때 생성)"""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            load_env()
+            _llm_cache = ResponseCache(
+                max_entries=int(os.getenv("LLM_CACHE_ENTRIES", "1024")),
+                path=os.getenv("LLM_CACHE_PATH") or None,   # 설정 시 SQLite 영속 캐시
+                ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            )
+        return _llm_cache
+
+def _estimate_tokens(text: str) -> int:
+    # 한국어 기준 대략 2자당 1토큰 (예산 판단용 근사치)
+    return len(text) // 2 + 1
+
+def _record_usage(site: str, model: str, messages: List[Dict[str, str]], text: str, span: Dict[str, Any]) -> None:
+    """토큰 수(백엔드가 알려 준 값, 없으면 추정)와 추정 비용을 LATENCY 와 트레이스 span 에 남긴다.
+
+    집계는 부가 기능이므로 여기서 난 오류는 경고만 남기고 LLM 응답은 그대로 돌려준다.
+    """
+    try:
+        usage = _take_usage()
+        if usage is None:
+            usage = (sum(_estimate_tokens(m["content"]) for m in messages), _estimate_tokens(text))
+            span["tokens_estimated"] = True
+        span["prompt_tokens"], span["completion_tokens"] = usage
+        span["cost_usd"] = round(LATENCY.llm_usage(site, model, *usage), 8)
+    except Exception as e:
+        LATENCY.count("usage_errors", site=site, error=type(e).__name__)
+        print(f"[warn] {site}: 토큰·비용 집계 실패 ({e!r})", file=sys.stderr)
+
+def chat_completion(site: str, messages: List[Dict[str, str]], temperature: float,
+                    model: Optional[str] = None, cache: Optional[bool] = None,
+                    validate: Optional[Callable[[str], Any]] = None, timeout: Optional[float] = None) -> str:
+    """모든 LLM 호출 지점이 거치는 공통 진입점.
+
+    cache=None 이면 CACHE_POLICY[site] 를 따른다. validate 가 주어지면 응답이
+    검증을 통과한 경우에만 캐시에 저장한다 (예외는 그대로 전파).
+    timeout 은 백엔드 기본 데드라인을 이 호출에 한해 덮어쓴다.
+    지연(llm.<site>.total), 토큰·비용, 캐시 적중(llm_calls{site, result})을 LATENCY 에 기록한다.
+    """
+    model = model or llm_model()
+    use_cache = CACHE_POLICY.get(site, False) if cache is None else cache
+    key = cache_key(model, messages, temperature) if use_cache else None
+    if key is not None:
+        hit = llm_cache().get(key, site)
+        if hit is not None:
+            LATENCY.count("llm_calls", site=site, result="cache_hit")
+            return hit
+    LATENCY.count("llm_calls", site=site, result="backend")
+    _take_usage()
+    with LATENCY.time(f"llm.{site}.total", model=model) as span:
+        text = get_backend().complete(model, messages, temperature, timeout=timeout)
+        _record_usage(site, model, messages, text, span)
+    if validate is not None:
+        validate(text)
+    if key is not None:
+        llm_cache().put(key, text, site)
+    return text
+
+def chat_stream(site: str, messages: List[Dict[str, str]], temperature: float,
+                model: Optional[str] = None, cache: Optional[bool] = None, timeout: Optional[float] = None) -> Iterator[str]:
+    """chat_completion 의 스트리밍 버전. 토큰을 도착하는 대로 내보낸다.
+
+    캐시 적중 시 전체 텍스트를 한 번에 내보내고, 끝까지 받은 응답만 캐시에 저장한다.
+    첫 토큰까지(llm.<site>.ttft)와 전체(llm.<site>.total) 지연을 LATENCY 에 기록한다.
+    """
+    model = model or llm_model()
+    use_cache = CACHE_POLICY.get(site, False) if cache is None else cache
+    key = cache_key(model, messages, temperature) if use_cache else None
+    if key is not None:
+        hit = llm_cache().get(key, site)
+        if hit is not None:
+            LATENCY.count("llm_calls", site=site, result="cache_hit")
+            yield hit
+            return
+    LATENCY.count("llm_calls", site=site, result="backend")
+    _take_usage()
+    parts: List[str] = []
+    with LATENCY.time(f"llm.{site}.total", model=model, stream=True) as span:
+        t0 = time.perf_counter()
+        try:
+            for token in get_backend().stream(model, messages, temperature, timeout=timeout):
+                if not parts:
+                    LATENCY.record(f"llm.{site}.ttft", time.perf_counter() - t0)
+                parts.append(token)
+                yield token
+        except GeneratorExit:
+            span["closed_early"] = True     # 소비자가 중간에 닫음 (예: 투기적 응답 폐기)
+            raise
+        _record_usage(site, model, messages, "".join(parts), span)
+    if key is not None:
+        llm_cache().put(key, "".join(parts), site)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def metrics_text() -> str:
+    """LATENCY 누적 값 + 응답 캐시·백엔드 통계를 Prometheus 텍스트로 (GET /metrics)"""
+    lines = [LATENCY.prometheus().rstrip("\n")]
+    if _llm_cache is not None:
+        lines.append("# TYPE counsel_llm_cache_total counter")
+        for site, s in sorted(_llm_cache.stats().items()):
+            lines += [f'counsel_llm_cache_total{{site="{_prom_label(site)}",result="{what}"}} {s[what]}'
+                      for what in ("memory_hits", "disk_hits", "misses", "stores")]
+    backend = _backend
+    if isinstance(backend, ResilientBackend):
+        stats = backend.stats()
+        breaker = stats.pop("breaker")
+        lines.append("# TYPE counsel_llm_backend_total counter")
+        lines += [f'counsel_llm_backend_total{{event="{k}"}} {v}' for k, v in sorted(stats.items())]
+        lines.append("# TYPE counsel_llm_breaker_open gauge")
+        lines.append(f"counsel_llm_breaker_open {int(breaker != 'closed')}")
+    return "\n".join(lines) + "\n"
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> Any:
+    """GET /metrics 만 응답하는 HTTP 서버를 데몬 스레드로 띄운다 (콘솔 실행용, server.py 는 자체 엔드포인트)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="metrics", daemon=True).start()
+    return httpd
+
 # ───────────────────────────────
 # 극단성 탐지 (정규식)
 # ───────────────────────────────
@@ -98,31 +996,426 @@ def load_extra_patterns(path: str = "extreme_patterns.json") -> List[re.Pattern]
             pass
     return pats
 
-EXTREME_PATTERNS: List[re.Pattern] = [re.compile(p) for p in SEED_PATTERNS]
-EXTREME_PATTERNS += [re.compile(p) for p in (CURATED_DIRECT + CURATED_INDIRECT + CURATED_SELF_DENIGRATE + CURATED_SUICIDE)]
-EXTREME_PATTERNS += load_extra_patterns()
+def _compile_extreme_patterns() -> List[re.Pattern]:
+    pats: List[re.Pattern] = [re.compile(p) for p in SEED_PATTERNS]
+    pats += [re.compile(p) for p in (CURATED_DIRECT + CURATED_INDIRECT + CURATED_SELF_DENIGRATE + CURATED_SUICIDE)]
+    pats += load_extra_patterns()
+    return pats
+
+def __getattr__(name: str) -> Any:
+    # EXTREME_PATTERNS 는 처음 접근할 때 컴파일 (import 비용 절감)
+    if name == "EXTREME_PATTERNS":
+        globals()[name] = value = _compile_extreme_patterns()
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def detect_extreme_categories(text: str) -> Dict[str, List[str]]:
-    out: Dict[str, List[str]] = {"suicide": [], "self_denigrate": [], "other_denigrate": [], "direct": [], "indirect": [], "seed": []}
-    def collect(patterns: List[str], key: str) -> None:
-        for p in patterns:
-            rx = re.compile(p, re.IGNORECASE)
-            for m in rx.finditer(text):
+# 카테고리 → 패턴 목록 (스캔 순서 = 기존 collect 호출 순서)
+DETECT_CATEGORIES: Tuple[Tuple[str, List[str]], ...] = (
+    ("seed", SEED_PATTERNS),
+    ("direct", CURATED_DIRECT),
+    ("indirect", CURATED_INDIRECT),
+    ("suicide", CURATED_SUICIDE),
+    ("self_denigrate", CURATED_SELF_DENIGRATE),
+    ("other_denigrate", OTHER_DENIGRATE_PATTERNS),
+)
+# 결과 dict 의 키 순서 (기존 출력과 동일하게 유지)
+CATEGORY_ORDER: Tuple[str, ...] = ("suicide", "self_denigrate", "other_denigrate", "direct", "indirect", "seed")
+
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+
+def _scoped(rx: re.Pattern) -> str:
+    """개별 패턴의 플래그를 (?i:...) 형태로 감싸 결합 정규식에서도 유지한다."""
+    letters = "".join(ch for flag, ch in _SCOPED_FLAGS if rx.flags & flag)
+    return f"(?{letters}:{rx.pattern})" if letters else f"(?:{rx.pattern})"
+
+# ───────────────────────────────
+# 리터럴 앵커 프리필터 (Aho-Corasick)
+# ───────────────────────────────
+_REPEATS = tuple(getattr(_sre_parse, n) for n in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") if hasattr(_sre_parse, n))
+
+def _best_anchor_set(cands: List[set]) -> set | None:
+    # 가장 짧은 앵커가 가장 긴 집합 → 오탐 후보가 가장 적다
+    if not cands:
+        return None
+    return max(cands, key=lambda s: (min(len(a) for a in s), -len(s)))
+
+def _required_literals(items: Any, flags: int) -> set | None:
+    """매치가 반드시 포함하는 리터럴 중 하나 이상을 담은 집합. 보장할 수 없으면 None.
+
+    IGNORECASE 패턴에서는 대소문자가 없는 문자(한글·숫자·공백 등)만 앵커로 쓴다.
+    그래야 원문을 소문자로 바꾸지 않고도 누락이 생기지 않는다.
+    """
+    cands: List[set] = []
+    run = ""
+    for op, av in items:
+        if op is _sre_parse.LITERAL:
+            ch = chr(av)
+            if not (flags & re.IGNORECASE) or ch.lower() == ch.upper():
+                run += ch
+                continue
+        if run:
+            cands.append({run})
+            run = ""
+        sub: set | None = None
+        if op is _sre_parse.SUBPATTERN:
+            add, dele, p = av[-3], av[-2], av[-1]
+            sub = _required_literals(p, (flags | add) & ~dele)
+        elif op is _sre_parse.BRANCH:
+            sub = set()
+            for branch in av[1]:
+                got = _required_literals(branch, flags)
+                if not got:
+                    sub = None
+                    break
+                sub |= got
+        elif op in _REPEATS and av[0] >= 1:
+            sub = _required_literals(av[2], flags)
+        elif op is getattr(_sre_parse, "ATOMIC_GROUP", None):
+            sub = _required_literals(av, flags)
+        if sub:
+            cands.append(sub)
+    if run:
+        cands.append({run})
+    return _best_anchor_set(cands)
+
+def pattern_anchors(rx: re.Pattern) -> set | None:
+    """패턴이 매치되려면 원문에 들어 있어야 하는 앵커 리터럴 집합 (없으면 None)."""
+    try:
+        parsed = _sre_parse.parse(rx.pattern, rx.flags)
+    except Exception:
+        return None
+    state = getattr(parsed, "state", None) or getattr(parsed, "pattern", None)
+    return _required_literals(parsed, getattr(state, "flags", rx.flags))
+
+class LiteralPrefilter:
+    """앵커 리터럴들로 만든 Aho-Corasick 자동자.
+
+    한 번의 선형 스캔으로 원문에 등장한 앵커를 모두 찾고, 그 앵커가 속한
+    규칙 번호만 돌려준다. 앵커를 뽑을 수 없는 규칙은 항상 후보에 포함한다.
+    """
+    def __init__(self, anchors: Dict[str, set], always: set):
+        self.always = frozenset(always)
+        self.anchor_rules = {a: frozenset(r) for a, r in anchors.items()}
+        # goto 트리
+        goto: List[Dict[str, int]] = [{}]
+        out: List[set] = [set()]
+        for a in anchors:
+            s = 0
+            for ch in a:
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    goto.append({})
+                    out.append(set())
+                    nxt = goto[s][ch] = len(goto) - 1
+                s = nxt
+            out[s].add(a)
+        # 실패 링크를 접어 넣은 DFA 전이표 (없는 전이는 상태 0)
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            delta[s] = dict(delta[fail[s]])
+            delta[s].update(goto[s])
+            out[s] |= out[fail[s]]
+            for ch, nxt in goto[s].items():
+                fail[nxt] = delta[fail[s]].get(ch, 0)
+                queue.append(nxt)
+        self._delta = delta
+        # 상태별 출력은 앵커 대신 규칙 번호 집합으로 미리 합쳐 둔다
+        self._out: List[frozenset | None] = [
+            frozenset().union(*(self.anchor_rules[a] for a in o)) if o else None for o in out
+        ]
+
+    @classmethod
+    def from_rules(cls, rules: List[Tuple[str, re.Pattern]]) -> "LiteralPrefilter":
+        anchors: Dict[str, set] = {}
+        always: set = set()
+        for i, (_, rx) in enumerate(rules):
+            found = pattern_anchors(rx)
+            if not found:
+                always.add(i)
+                continue
+            for a in found:
+                anchors.setdefault(a, set()).add(i)
+        return cls(anchors, always)
+
+    def anchors_in(self, text: str) -> set:
+        """원문에 등장한 앵커 집합 (디버깅·검증용)."""
+        return {a for a in self.anchor_rules if a in text}
+
+    def candidates(self, text: str) -> List[int]:
+        delta, out = self._delta, self._out
+        hits = set(self.always)
+        s = 0
+        for ch in text:
+            s = delta[s].get(ch, 0)
+            if out[s] is not None:
+                hits |= out[s]
+        return sorted(hits)
+
+class ExtremeDetector:
+    """패턴을 한 번만 컴파일해 두고 재사용하는 극단성 탐지기.
+
+    기본 경로는 LiteralPrefilter 로 앵커 리터럴을 먼저 찾고, 앵커가 걸린
+    규칙만 정규식으로 스캔한다. 앵커가 하나도 없는 발화(대부분의 턴)는
+    정규식을 한 번도 돌리지 않는다.
+
+    prefilter=False 이면 모든 규칙을 이름 있는 그룹으로 묶은 결합 정규식으로
+    먼저 한 번 훑고, 걸린 경우 가장 왼쪽 매치 위치부터 규칙별 스캔을 돌린다
+    (서로 겹치는 매치는 결합 정규식 하나로는 구분할 수 없으므로).
+    """
+    def __init__(self, categories: Tuple[Tuple[str, List[Any]], ...] = DETECT_CATEGORIES, flags: int = re.IGNORECASE, prefilter: bool = True):
+        self.rules: List[Tuple[str, re.Pattern]] = []
+        for key, patterns in categories:
+            for p in patterns:
+                rx = p if isinstance(p, re.Pattern) else re.compile(p, flags)
+                self.rules.append((key, rx))
+        # 그룹 이름 → 카테고리
+        self.group_category: Dict[str, str] = {f"r{i}": key for i, (key, _) in enumerate(self.rules)}
+        self._combined: Any = False     # 결합 정규식은 처음 쓸 때 컴파일 (False = 아직 안 함)
+        self.prefilter: LiteralPrefilter | None = LiteralPrefilter.from_rules(self.rules) if prefilter else None
+
+    @property
+    def combined(self) -> re.Pattern | None:
+        if self._combined is False:
+            try:
+                self._combined = re.compile(
+                    "|".join(f"(?P<r{i}>{_scoped(rx)})" for i, (_, rx) in enumerate(self.rules))
+                )
+            except re.error:
+                # 역참조 등으로 결합이 불가능한 패턴이 섞이면 규칙별 스캔만 사용
+                self._combined = None
+        return self._combined
+
+    def first_hit(self, text: str) -> Tuple[int, str] | None:
+        """가장 왼쪽 매치의 (위치, 카테고리). 매치가 없으면 None."""
+        if self.combined is None:
+            return (0, "") if self.rules else None
+        m = self.combined.search(text)
+        if m is None:
+            return None
+        return m.start(), self.group_category[m.lastgroup]
+
+    def detect(self, text: str) -> Dict[str, List[str]]:
+        if self.prefilter is not None:
+            rules = [self.rules[i] for i in self.prefilter.candidates(text)]
+            pos = 0
+        else:
+            hit = self.first_hit(text)
+            rules, pos = (self.rules, hit[0]) if hit is not None else ([], 0)
+        if not rules:
+            return {}
+        found: Dict[str, List[str]] = {}
+        seen: Dict[str, set] = {}
+        for key, rx in rules:
+            bucket = found.setdefault(key, [])
+            dedupe = seen.setdefault(key, set())
+            for m in rx.finditer(text, pos):
                 snippet = _normalize_snippet(m.group(0))
-                if snippet not in out[key]:
-                    out[key].append(snippet)
-    collect(SEED_PATTERNS, "seed")
-    collect(CURATED_DIRECT, "direct")
-    collect(CURATED_INDIRECT, "indirect")
-    collect(CURATED_SUICIDE, "suicide")
-    collect(CURATED_SELF_DENIGRATE, "self_denigrate")
-    collect(OTHER_DENIGRATE_PATTERNS, "other_denigrate")
-    return {k: v for k, v in out.items() if v}
+                if snippet not in dedupe:
+                    dedupe.add(snippet)
+                    bucket.append(snippet)
+        return {k: found[k] for k in CATEGORY_ORDER if found.get(k)}
+
+# extreme_patterns.json 의 추가 패턴은 seed 카테고리로 함께 탐지
+_detector: Optional[ExtremeDetector] = None
+
+def extreme_detector() -> ExtremeDetector:
+    """기본 탐지기 (처음 호출 때 컴파일)"""
+    global _detector
+    if _detector is None:
+        _detector = ExtremeDetector(DETECT_CATEGORIES + (("seed", load_extra_patterns()),))
+    return _detector
+
+def detect_extreme_categories(text: str) -> Dict[str, List[str]]:
+    t0 = time.perf_counter()
+    cats = extreme_detector().detect(text)
+    LATENCY.record("detect.regex", time.perf_counter() - t0)
+    return cats
+
+# ───────────────────────────────
+# 로컬 감정 점수 (어휘 사전 · GPT 앞단)
+# ───────────────────────────────
+# 짧고 분명한 발화는 어휘 사전만으로 감정 클래스와 점수를 정하고 GPT 를 건너뛴다 (확신도가
+# EMOTION_LOCAL_THRESHOLD 이상이고 보정표가 그 근거량 구간을 덮을 때). 그 밖에는 GPT 분류를 그대로 쓴다.
+# 사전 용어는 어간/구 단위이며 Aho-Corasick(LiteralPrefilter) 한 번의 스캔으로 모두 찾는다.
+EMOTION_LEXICON: Dict[str, Dict[str, float]] = {
+    "기쁨": {"기쁘": 1.0, "기뻐": 1.0, "기쁜": 1.0, "행복": 1.0, "신나": 1.0, "신난": 1.0, "신났": 1.0, "즐거": 1.0,
+            "설레": 0.9, "뿌듯": 1.0, "다행": 0.7, "감사": 0.6, "고마": 0.6, "웃었": 0.7, "나아졌": 0.6, "좋았": 0.7,
+            "좋아요": 0.6, "만족": 0.8, "최고": 0.7, "홀가분": 0.9, "합격": 0.8},
+    "슬픔": {"슬프": 1.0, "슬퍼": 1.0, "슬픈": 1.0, "우울": 1.0, "눈물": 1.0, "울었": 1.0, "울고": 0.9, "울컥": 0.9,
+            "외로": 1.0, "그리워": 0.9, "그립": 0.9, "서운": 0.8, "속상": 0.9, "허전": 0.8, "상처": 0.8, "비참": 0.9,
+            "공허": 0.6, "헤어졌": 0.8, "세상을 떠": 0.9, "보고 싶": 0.6, "힘들": 0.3},
+    "분노": {"화가": 1.0, "화나": 1.0, "화났": 1.0, "짜증": 1.0, "열받": 1.0, "열 받": 1.0, "억울": 0.9, "빡치": 1.0,
+            "빡쳐": 1.0, "분노": 1.0, "분하": 0.9, "미워": 0.8, "밉": 0.6, "어이없": 0.8, "답답": 0.5, "싫어": 0.4,
+            "용서": 0.5, "무시당": 0.8},
+    "불안": {"불안": 1.0, "걱정": 1.0, "초조": 1.0, "긴장": 0.9, "무서": 1.0, "무섭": 1.0, "두려": 1.0, "두렵": 1.0,
+            "떨려": 0.8, "떨리": 0.8, "겁나": 0.9, "겁이": 0.9, "조마조마": 1.0, "막막": 0.7, "잠이 안": 0.6,
+            "심장이": 0.5, "답답": 0.4, "어떡하": 0.6, "어떻게 하지": 0.6},
+    "무기력": {"무기력": 1.0, "지쳐": 1.0, "지쳤": 1.0, "지친": 1.0, "피곤": 0.8, "귀찮": 0.8, "의욕": 0.9,
+             "힘이 없": 1.0, "아무것도 하기 싫": 1.0, "아무것도 못": 0.8, "번아웃": 1.0, "무의미": 0.9, "쓸모없": 0.6,
+             "손에 안 잡": 0.9, "그만두고 싶": 0.6, "공허": 0.4, "힘들": 0.4, "누워만": 0.8, "기운이 없": 1.0},
+    "중립": {"그럭저럭": 0.9, "평범": 0.8, "보통": 0.8, "무난": 0.8, "별일 없": 0.9, "별일없": 0.9, "그냥 그래": 0.8,
+            "괜찮": 0.5, "안녕하세요": 1.0, "평소처럼": 0.7},
+}
+EMOTION_INTENSIFIERS: Tuple[str, ...] = ("너무", "정말", "진짜", "완전", "엄청", "매우", "많이", "계속", "자꾸", "미치겠")
+_NEGATION = re.compile(r"(?:^|\s)(?:안|못)\s|지\s*않|지\s*못|아니")
+_HEDGE = re.compile(r"\?|지만|는데|그런데|근데|같기도")
+
+def load_extra_lexicon(path: str = "emotion_lexicon.json",
+                       classes: Optional[Tuple[str, ...]] = None) -> Dict[str, Dict[str, float]]:
+    """{"클래스": {"용어": 가중치}} 형식의 추가 사전 (없거나 읽을 수 없으면 빈 dict).
+
+    classes(기본 EMOTION_CLASSES)에 없는 클래스나 숫자가 아닌 가중치는 경고를 내고 건너뛴다.
+    """
+    classes = classes or EMOTION_CLASSES
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"[warn] {path}: 감정 사전을 읽지 못해 무시합니다 ({e})", file=sys.stderr)
+        return {}
+    extra: Dict[str, Dict[str, float]] = {}
+    for cls, terms in (data.items() if isinstance(data, dict) else ()):
+        if cls not in classes or not isinstance(terms, dict):
+            print(f"[warn] {path}: 알 수 없는 감정 클래스 {cls!r} 를 건너뜁니다", file=sys.stderr)
+            continue
+        for term, weight in terms.items():
+            try:
+                extra.setdefault(cls, {})[term] = float(weight)
+            except (TypeError, ValueError):
+                print(f"[warn] {path}: {cls}/{term} 가중치 {weight!r} 를 건너뜁니다", file=sys.stderr)
+    return extra
+
+# 로컬 점수 보정표: 근거량(evidence) 구간별로 GPT emotion_score 의 평균을 둔다.
+# benchmarks/eval_emotion_local.py --save-calibration 으로 GPT 라벨에서 만든다.
+CALIBRATION_EDGES: Tuple[float, ...] = (0.5, 1.0, 1.5, 2.0, 2.5)
+CALIBRATION_MIN_SAMPLES = 5
+# 보정표 파일이 없을 때 쓰는 기본표. 근거가 많을수록(강조어 포함) 점수를 올리되, 강조어가 겹친
+# 최상위 구간만 마인드풀니스 기준(0.75)을 넘긴다. GPT 라벨로 만든 표가 있으면 그것을 쓴다.
+DEFAULT_EMOTION_CALIBRATION: Dict[str, Any] = {
+    "edges": list(CALIBRATION_EDGES),
+    "emotional": [0.4, 0.5, 0.6, 0.7, 0.75, 0.85],
+    "neutral": [0.1, 0.1, 0.15, 0.15, 0.2, 0.2],
+}
+
+def fit_emotion_calibration(results: List[Dict[str, Any]], scores: List[float],
+                            edges: Tuple[float, ...] = CALIBRATION_EDGES,
+                            min_samples: int = CALIBRATION_MIN_SAMPLES) -> Dict[str, Any]:
+    """LexiconScorer 결과와 같은 발화의 GPT 점수로 구간별 평균 점수표를 만든다.
+
+    중립/그 밖의 감정을 따로 집계하고, 표본이 min_samples 미만인 구간은 None 으로 둔다.
+    """
+    sums = {kind: [[0.0, 0] for _ in range(len(edges) + 1)] for kind in ("neutral", "emotional")}
+    for r, score in zip(results, scores):
+        cell = sums["neutral" if r["emotion_class"] == "중립" else "emotional"][bisect.bisect_right(edges, r["evidence"])]
+        cell[0] += float(score)
+        cell[1] += 1
+    out: Dict[str, Any] = {"edges": list(edges)}
+    for kind, cells in sums.items():
+        out[kind] = [round(total / n, 4) if n >= min_samples else None for total, n in cells]
+        out[f"{kind}_n"] = [n for _, n in cells]
+    return out
+
+def load_emotion_calibration(path: str) -> Optional[Dict[str, Any]]:
+    """보정표 JSON (없거나 형식이 다르면 None)"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        n = len(table["edges"]) + 1
+        if len(table["neutral"]) != n or len(table["emotional"]) != n:
+            raise ValueError("구간 수가 맞지 않습니다")
+        return table
+    except Exception as e:
+        print(f"[warn] {path}: 감정 점수 보정표를 무시합니다 ({e})", file=sys.stderr)
+        return None
+
+class LexiconScorer:
+    """어휘 사전 기반 감정 분류. 클래스와 confidence, 근거량(evidence)을 돌려준다.
+
+    용어 → 클래스 가중치 행을 두고 발화에서 찾은 용어의 행을 합산한다. emotion_score 는
+    GPT 점수로 맞춘 보정표(calibration)가 그 근거량 구간을 덮을 때만 채우고, 아니면 None 이다
+    (이때는 클래스·점수 모두 GPT 가 정한다).
+    """
+    def __init__(self, lexicon: Optional[Dict[str, Dict[str, float]]] = None, classes: Tuple[str, ...] = (),
+                 calibration: Optional[Dict[str, Any]] = None):
+        lexicon = lexicon if lexicon is not None else EMOTION_LEXICON
+        self.classes: Tuple[str, ...] = classes or EMOTION_CLASSES
+        self.calibration = calibration
+        unknown = set(lexicon) - set(self.classes)
+        if unknown:
+            raise ValueError(f"알 수 없는 감정 클래스: {sorted(unknown)}")
+        rows: Dict[str, List[float]] = {}
+        for cls, terms in lexicon.items():
+            col = self.classes.index(cls)
+            for term, weight in terms.items():
+                rows.setdefault(term, [0.0] * len(self.classes))[col] += weight
+        self.terms: List[str] = list(rows)
+        self._rows: List[List[float]] = [rows[t] for t in self.terms]
+        self._matcher = LiteralPrefilter({t: {i} for i, t in enumerate(self.terms)}, set())
+
+    def score_many(self, texts: List[str]) -> List[Dict[str, Any]]:
+        return [self.score(t) for t in texts]
+
+    def score(self, text: str) -> Dict[str, Any]:
+        hits = self._matcher.candidates(text)
+        totals = [sum(self._rows[i][c] for i in hits) for c in range(len(self.classes))]
+        return self._result(text, totals)
+
+    def _result(self, text: str, totals: List[float]) -> Dict[str, Any]:
+        order = sorted(range(len(totals)), key=lambda c: -totals[c])
+        top, second = totals[order[0]], totals[order[1]]
+        if top <= 0:
+            return {"emotion_class": "중립", "emotion_score": None, "extreme": False, "confidence": 0.0, "evidence": 0.0}
+        cls = self.classes[order[0]]
+        # 근거의 양 × 1·2위 차이. 부정·유보 표현과 긴 문장은 확신도를 깎는다.
+        confidence = (1.0 - math.exp(-1.5 * top)) * (top - second) / top
+        if _NEGATION.search(text):
+            confidence *= 0.5
+        if _HEDGE.search(text):
+            confidence *= 0.8
+        confidence *= min(1.0, 30.0 / max(len(text.strip()), 1))
+        boost = min(2, sum(1 for w in EMOTION_INTENSIFIERS if w in text))
+        evidence = min(top, 2.0) + 0.5 * boost
+        return {"emotion_class": cls, "emotion_score": self._calibrated(cls, evidence), "extreme": False,
+                "confidence": round(confidence, 4), "evidence": round(evidence, 4)}
+
+    def _calibrated(self, cls: str, evidence: float) -> Optional[float]:
+        if self.calibration is None:
+            return None
+        table = self.calibration["neutral" if cls == "중립" else "emotional"]
+        return table[bisect.bisect_right(self.calibration["edges"], evidence)]
+
+_lexicon_scorer: Optional[LexiconScorer] = None
+
+def lexicon_scorer() -> LexiconScorer:
+    """기본 사전 + emotion_lexicon.json, 보정표는 EMOTION_CALIBRATION (기본 emotion_calibration.json,
+    없으면 DEFAULT_EMOTION_CALIBRATION)"""
+    global _lexicon_scorer
+    if _lexicon_scorer is None:
+        lexicon = {cls: dict(terms) for cls, terms in EMOTION_LEXICON.items()}
+        for cls, terms in load_extra_lexicon().items():
+            lexicon[cls].update(terms)
+        calibration = load_emotion_calibration(os.getenv("EMOTION_CALIBRATION", "emotion_calibration.json"))
+        _lexicon_scorer = LexiconScorer(lexicon, calibration=calibration or DEFAULT_EMOTION_CALIBRATION)
+    return _lexicon_scorer
+
+def local_emotion_threshold() -> float:
+    """이 확신도 이상이면 GPT 를 건너뛴다 (1 초과면 로컬 단계 끔)."""
+    return float(os.getenv("EMOTION_LOCAL_THRESHOLD", "0.6"))
 
 # ───────────────────────────────
 # 감정 분석 (GPT + 로컬 보완)
 # ───────────────────────────────
-def gpt_emotion_analysis(text: str) -> Dict[str, Any]:
+NEUTRAL_EMOTION: Dict[str, Any] = {"emotion_class": "중립", "emotion_score": 0.0, "extreme": False}
+
+def _request_emotion_llm(text: str) -> Dict[str, Any]:
+    """GPT 감정 분류 1회 호출. 실패 시 중립 기본값."""
     prompt = f"""
     다음 발화에 대해 감정 분석과 위험 신호 감지를 수행하되, 아래 JSON만 반환하세요.
 
@@ -140,21 +1433,41 @@ def gpt_emotion_analysis(text: str) -> Dict[str, Any]:
       "extreme": false
     }}
     """
-    cats = detect_extreme_categories(text)
-
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        content = chat_completion(
+            "emotion",
             messages=[
                 {"role": "system", "content": "당신은 공감 기반 감정 분석 전문가입니다. 반드시 JSON만 반환하세요. 감정 분류는 위험 신호 판단과 독립적이어야 합니다."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3
+            temperature=0.3,
+            validate=_extract_json_block,
         )
-        data = _extract_json_block(response.choices[0].message.content)
-    except Exception:
-        data = {"emotion_class": "중립", "emotion_score": 0.0, "extreme": False}
+        return _extract_json_block(content)
+    except Exception as e:
+        LATENCY.count("fallbacks", site="emotion", error=type(e).__name__)
+        return dict(NEUTRAL_EMOTION)
+
+def _request_emotion(text: str, threshold: Optional[float] = None) -> Dict[str, Any]:
+    """로컬 사전 분류가 충분히 확실하고 점수까지 내면 그 결과를 쓰고 (source="local", GPT 호출 없음),
+    아니면 GPT 분류를 클래스·점수 그대로 쓴다 (source="llm"). 둘을 섞지 않는다.
+    """
+    threshold = local_emotion_threshold() if threshold is None else threshold
+    if threshold <= 1.0:
+        t0 = time.perf_counter()
+        local = lexicon_scorer().score(text)
+        LATENCY.record("emotion.local", time.perf_counter() - t0)
+        if local["confidence"] >= threshold and local["emotion_score"] is not None:
+            LATENCY.count("emotion_source", source="local")
+            return dict(local, source="local")
+    LATENCY.count("emotion_source", source="llm")
+    return dict(_request_emotion_llm(text), source="llm")
 
+def is_crisis(cats: Dict[str, List[str]]) -> bool:
+    """로컬 탐지 결과만으로 결정되는 위험 플래그 (suicide/direct)"""
+    return bool(cats.get("suicide") or cats.get("direct"))
+
+def _build_emotion_result(cats: Dict[str, List[str]], data: Dict[str, Any]) -> Dict[str, Any]:
     try:
         emotion_score = float(data.get("emotion_score", 0.0))
     except Exception:
@@ -162,8 +1475,7 @@ def gpt_emotion_analysis(text: str) -> Dict[str, Any]:
     emotion_score = max(0.0, min(1.0, emotion_score))
     emotion_class = data.get("emotion_class", "중립")
 
-    extreme_from_cats = bool(cats.get("suicide") or cats.get("direct"))
-    extreme_flag = extreme_from_cats or False
+    extreme_flag = is_crisis(cats)
 
     def _pick_extreme_type(c: Dict[str, List[str]]) -> str:
         for key in ("suicide", "direct", "self_denigrate", "other_denigrate", "indirect", "seed"):
@@ -171,13 +1483,20 @@ def gpt_emotion_analysis(text: str) -> Dict[str, Any]:
                 return key
         return "none"
 
-    return {
+    result = {
         "emotion_class": emotion_class,
         "emotion_score": emotion_score,
         "extreme": extreme_flag,
         "extreme_terms": sorted(list(set([t for key, arr in cats.items() for t in (arr if key in ("suicide", "direct") else [])]))),
         "extreme_type": _pick_extreme_type(cats),
     }
+    if "source" in data:
+        result["emotion_source"] = data["source"]
+    return result
+
+def gpt_emotion_analysis(text: str) -> Dict[str, Any]:
+    cats = detect_extreme_categories(text)
+    return _build_emotion_result(cats, _request_emotion(text))
 
 # ───────────────────────────────
 # 트리거 로직 (키워드/플래그는 항상 허용, 휴리스틱은 옵션)
@@ -209,61 +1528,398 @@ def should_trigger_roleplay(user_text: str, emotion: Dict[str, Any], state: Dict
 
     return False, ""
 
+# ───────────────────────────────
+# 감정 그래프 렌더링 (보고서와 분리된 단계)
+# ───────────────────────────────
+def _atomic_write(path: str, write: Callable[[str], None]) -> str:
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+def render_svg(scores: List[float], path: str) -> str:
+    """의존성 없는 SVG 감정 추이 그래프 (기본 렌더러)"""
+    w, h, left, right, top, bottom = 640, 400, 60, 20, 40, 50
+    pw, ph = w - left - right, h - top - bottom
+    n = len(scores)
+    x = lambda i: left + (pw * i / (n - 1) if n > 1 else pw / 2)
+    y = lambda v: top + ph * (1 - max(0.0, min(1.0, v)))
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}" viewBox="0 0 {w} {h}" font-family="sans-serif" font-size="12">',
+        f'<rect width="{w}" height="{h}" fill="white"/>',
+        f'<text x="{w / 2}" y="24" text-anchor="middle" font-size="14">Emotion Intensity Over Time</text>',
+        f'<line x1="{left}" y1="{top + ph}" x2="{left + pw}" y2="{top + ph}" stroke="black"/>',
+        f'<line x1="{left}" y1="{top}" x2="{left}" y2="{top + ph}" stroke="black"/>',
+        f'<text x="{left + pw / 2}" y="{h - 12}" text-anchor="middle">Turn Index</text>',
+        f'<text x="16" y="{top + ph / 2}" text-anchor="middle" transform="rotate(-90 16 {top + ph / 2})">Emotion Score</text>',
+    ]
+    for v in (0.0, 0.5, 1.0):
+        parts.append(f'<text x="{left - 8}" y="{y(v) + 4:.1f}" text-anchor="end">{v:.1f}</text>')
+    for v in (0.7, 0.9):
+        parts.append(f'<line x1="{left}" y1="{y(v):.1f}" x2="{left + pw}" y2="{y(v):.1f}" stroke="gray" stroke-dasharray="6 4"/>')
+    if n:
+        pts = " ".join(f"{x(i):.1f},{y(v):.1f}" for i, v in enumerate(scores))
+        parts.append(f'<polyline points="{pts}" fill="none" stroke="#1f77b4" stroke-width="2"/>')
+        parts.extend(f'<circle cx="{x(i):.1f}" cy="{y(v):.1f}" r="3.5" fill="#1f77b4"/>' for i, v in enumerate(scores))
+        step = max(1, n // 10)
+        parts.extend(f'<text x="{x(i):.1f}" y="{top + ph + 16}" text-anchor="middle">{i}</text>' for i in range(0, n, step))
+    parts.append("</svg>")
+
+    def write(tmp: str) -> None:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(parts))
+    return _atomic_write(path, write)
+
+def render_matplotlib(scores: List[float], path: str) -> str:
+    """기존 matplotlib 그래프 (선택 백엔드). pyplot 대신 Figure 를 써서 스레드에서도 안전하다."""
+    from matplotlib.figure import Figure
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.plot(range(len(scores)), scores, marker='o')
+    ax.axhline(0.7, linestyle='--')
+    ax.axhline(0.9, linestyle='--')
+    ax.set_title("Emotion Intensity Over Time")
+    ax.set_xlabel("Turn Index")
+    ax.set_ylabel("Emotion Score")
+    fig.tight_layout()
+    return _atomic_write(path, lambda tmp: fig.savefig(tmp, format="png"))
+
+GRAPH_BACKENDS: Dict[str, Tuple[Callable[[List[float], str], str], str]] = {
+    "svg": (render_svg, "svg"),
+    "matplotlib": (render_matplotlib, "png"),
+}
+
+class GraphRenderer:
+    """세션별 경로에 감정 그래프를 그린다.
+
+    mode="background": 작업 풀(기본은 공용 스레드 풀, ProcessPoolExecutor 도 가능)에
+    넘기고 곧바로 돌아온다. mode="sync": 그 자리에서 그린다. mode="deferred":
+    작업만 state 에 남겨 두고 render_deferred() 를 부를 때 그린다.
+    어느 경우든 파일이 생긴 뒤에야 report["emotion_summary"]["graph_path"] 가 채워진다.
+    """
+    def __init__(self, backend: str = "svg", out_dir: str = ".", mode: str = "background",
+                 executor: Optional[Executor] = None):
+        if backend not in GRAPH_BACKENDS:
+            raise ValueError(f"unknown graph backend: {backend}")
+        self.backend = backend
+        self.out_dir = out_dir
+        self.mode = mode
+        self.executor = executor
+
+    def path_for(self, state: Dict[str, Any]) -> str:
+        session_id = state.setdefault("session_id", uuid.uuid4().hex[:12])
+        return os.path.join(self.out_dir, f"emotion_graph_{session_id}.{GRAPH_BACKENDS[self.backend][1]}")
+
+    def submit(self, state: Dict[str, Any], scores: List[float]) -> None:
+        fn = GRAPH_BACKENDS[self.backend][0]
+        path = self.path_for(state)
+        scores = list(scores)
+        if self.mode == "deferred":
+            state["graph_job"] = (fn, scores, path)
+        elif self.mode == "sync":
+            with LATENCY.time("report.graph"):
+                _attach_graph(state, fn(scores, path))
+        else:
+            fut = (self.executor or _background_executor()).submit(_timed_render, fn, scores, path)
+
+            def done(f: Future) -> None:
+                if not f.cancelled() and f.exception() is None:
+                    _attach_graph(state, f.result())
+            fut.add_done_callback(done)
+            state["graph_pending"] = fut
+
+def _timed_render(fn: Callable[[List[float], str], str], scores: List[float], path: str) -> str:
+    t0 = time.perf_counter()
+    out = fn(scores, path)
+    LATENCY.record("report.graph", time.perf_counter() - t0)
+    return out
+
+def _attach_graph(state: Dict[str, Any], path: str) -> None:
+    summary = (state.get("report") or {}).get("emotion_summary")
+    if summary is not None:
+        summary["graph_path"] = path
+    state["graph_path"] = path
+
+def render_deferred(state: Dict[str, Any]) -> Optional[str]:
+    """mode="deferred" 로 남겨 둔 그래프를 지금 그린다."""
+    job = state.pop("graph_job", None)
+    if job is None:
+        return state.get("graph_path")
+    fn, scores, path = job
+    with LATENCY.time("report.graph"):
+        _attach_graph(state, fn(scores, path))
+    return path
+
+def wait_graph(state: Dict[str, Any], timeout: Optional[float] = 30.0) -> Optional[str]:
+    """백그라운드 그래프가 끝날 때까지 기다리고 경로를 돌려준다 (실패·미완료면 None)."""
+    fut = state.pop("graph_pending", None)
+    if fut is not None:
+        from concurrent.futures import wait
+        wait([fut], timeout=timeout)
+        if fut.done() and not fut.cancelled() and fut.exception() is None:
+            _attach_graph(state, fut.result())   # 콜백보다 먼저 깨어난 경우
+    return state.get("graph_path")
+
 # ───────────────────────────────
 # Agents
 # ───────────────────────────────
 class AssistantAgent:
-    def reply(self, user_text: str) -> str:
+    def __init__(self, cache: Optional[bool] = None):
+        self.cache = cache  # None 이면 CACHE_POLICY["assistant"]
+
+    def _messages(self, user_text: str) -> List[Dict[str, str]]:
         prompt = f"사용자의 발화: \"{user_text}\"\n공감하며, 소크라틱 질문을 사용해 대화를 이어가세요."
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "당신은 공감과 소크라틱 질문에 능한 전문 상담자입니다."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
+        return [
+            {"role": "system", "content": "당신은 공감과 소크라틱 질문에 능한 전문 상담자입니다."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def reply(self, user_text: str) -> str:
+        with LATENCY.time("agent.assistant.reply"):
+            content = chat_completion("assistant", messages=self._messages(user_text), temperature=0.7, cache=self.cache)
+        return content.strip()
+
+    def reply_stream(self, user_text: str) -> Iterator[str]:
+        """응답 토큰을 도착하는 대로 내보낸다 (이어 붙여 strip 하면 reply 와 같은 텍스트)"""
+        return chat_stream("assistant", messages=self._messages(user_text), temperature=0.7, cache=self.cache)
+
+    def areply_stream(self, user_text: str) -> ThreadedStream:
+        """reply_stream 의 async 이터레이터 버전 (이벤트 루프 안에서 호출)"""
+        return ThreadedStream(lambda: self.reply_stream(user_text))
 
 class MindfulnessAgent:
     def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        script = "지금 이 순간에 집중해보세요. 5초간 들이쉬고 천천히 내쉬어보세요."
-        state["mindfulness_count"] = state.get("mindfulness_count", 0) + 1
-        state["interventions"].append({"type": "mindfulness", "content": script})
-        state["messages"].append({"role": "assistant", "content": script})
+        with LATENCY.time("agent.mindfulness.run"):
+            script = "지금 이 순간에 집중해보세요. 5초간 들이쉬고 천천히 내쉬어보세요."
+            state["mindfulness_count"] = state.get("mindfulness_count", 0) + 1
+            state["interventions"].append({"type": "mindfulness", "content": script})
+            state["messages"].append({"role": "assistant", "content": script})
         return state
 
-class RoleplayAgent:
-    """짧은 역할극 스크립트를 생성하여 사용자의 연습을 돕는다."""
-    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        user_text = state["messages"][-1]["content"]
-        topic = state.get("roleplay_topic")
-        if not topic:
-            if "면접" in user_text:
-                topic = "면접 답변 연습"
-            elif "갈등" in user_text or "싸웠" in user_text or "다퉜" in user_text:
-                topic = "갈등 상황 대화 연습"
-            else:
-                topic = "불안 완화 대화 연습"
+ROLEPLAY_TOPICS: Tuple[str, ...] = ("면접 답변 연습", "갈등 상황 대화 연습", "불안 완화 대화 연습")
+
+def infer_roleplay_topic(user_text: str) -> str:
+    if "면접" in user_text:
+        return "면접 답변 연습"
+    if "갈등" in user_text or "싸웠" in user_text or "다퉜" in user_text:
+        return "갈등 상황 대화 연습"
+    return "불안 완화 대화 연습"
 
-        prompt = f"""
+def roleplay_messages(topic: str, user_text: Optional[str] = None) -> List[Dict[str, str]]:
+    """롤플 스크립트 요청 메시지. user_text 가 없으면 풀에 쌓아 둘 일반 스크립트용."""
+    prompt = f"""
         다음 주제에 대해 사용자가 따라 읽을 수 있는 6~8줄 내외의 역할극 스크립트를 만들어 주세요.
         - 주제: {topic}
         - 말투: 친절하고 구체적, 문장은 짧게.
         - 형식: "상황:", "상담자:", "나:" 라벨을 사용. 마지막 줄은 "나:"로 끝내서 사용자가 말하도록 유도.
-
+"""
+    if user_text is not None:
+        prompt += f"""
         사용자 최근 발화: "{user_text}"
         """
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "너는 CBT 코치이자 역할극 진행자다. 안전하고 구체적인 스크립트를 제공해라."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        script = response.choices[0].message.content.strip()
+    return [
+        {"role": "system", "content": "너는 CBT 코치이자 역할극 진행자다. 안전하고 구체적인 스크립트를 제공해라."},
+        {"role": "user", "content": prompt}
+    ]
+
+class ScriptPool:
+    """주제별로 미리 만들어 둔 롤플 스크립트 풀.
+
+    take() 는 가장 최근에 만든 스크립트를 꺼내 주고(한 번 쓴 스크립트는 다시 주지 않는다),
+    모자란 만큼은 백그라운드 작업자가 size 개까지 다시 채운다 (작업 하나에 스크립트 하나).
+    max_age 초가 지난 스크립트는 버린다. path 를 주면 채울 때마다 저장하고 시작할 때 불러온다.
+    start() 를 부르지 않으면 주제별로 처음 take() 할 때부터 채운다 (롤플까지 가지 않는
+    세션에서는 LLM 을 부르지 않는다). 종료할 때 close() 로 남은 채우기를 취소한다.
+    """
+    def __init__(self, topics: Tuple[str, ...] = ROLEPLAY_TOPICS, size: int = 4, max_age: float = 86400.0,
+                 path: Optional[str] = None, generate: Optional[Callable[[str], str]] = None,
+                 executor: Optional[Executor] = None):
+        self.topics = tuple(topics)
+        self.size = size
+        self.max_age = max_age
+        self.path = path
+        # 풀용 스크립트는 서로 달라야 하므로 응답 캐시를 쓰지 않는다
+        self.generate = generate or (lambda topic: chat_completion(
+            "roleplay_pool", messages=roleplay_messages(topic), temperature=0.7, cache=False))
+        self._scripts: Dict[str, deque] = {t: deque() for t in self.topics}   # (생성 시각, 스크립트), 오래된 것부터
+        self._refilling: Counter = Counter()      # 주제 → 진행 중인 생성 작업 수
+        self._futures: set = set()
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._closed = False
+        self._stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path:
+            self.load()
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "ScriptPool":
+        return cls(size=int(os.getenv("ROLEPLAY_POOL_SIZE", "4")),
+                   max_age=float(os.getenv("ROLEPLAY_POOL_MAX_AGE", "86400")),
+                   path=os.getenv("ROLEPLAY_POOL_PATH") or None, **kwargs)
+
+    def _prune(self, topic: str) -> None:
+        scripts, cutoff = self._scripts[topic], time.time() - self.max_age
+        while scripts and scripts[0][0] < cutoff:
+            scripts.popleft()
+            self._stats["expired"] += 1
+
+    def take(self, topic: str) -> Optional[str]:
+        """풀에서 스크립트 하나를 꺼낸다. 없거나 풀 대상 주제가 아니면 None."""
+        if topic not in self._scripts:
+            return None
+        with self._lock:
+            self._prune(topic)
+            item = self._scripts[topic].pop() if self._scripts[topic] else None
+            self._stats["hits" if item else "misses"] += 1
+        self.refill(topic)
+        return item[1] if item else None
+
+    def refill(self, topic: str) -> List[Future]:
+        """모자란 개수만큼 백그라운드 생성 작업을 넣는다 (이미 진행 중인 작업은 빼고 센다)."""
+        with self._lock:
+            if self._closed:
+                return []
+            self._prune(topic)
+            missing = self.size - len(self._scripts[topic]) - self._refilling[topic]
+            if missing <= 0:
+                return []
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=len(self.topics), thread_name_prefix="roleplay-pool")
+            self._refilling[topic] += missing
+            futures = [self._executor.submit(self._generate_one, topic) for _ in range(missing)]
+            self._futures.update(futures)
+        for f in futures:
+            f.add_done_callback(self._forget)
+        return futures
+
+    def _forget(self, fut: Future) -> None:
+        with self._lock:
+            self._futures.discard(fut)
+
+    def _generate_one(self, topic: str) -> None:
+        try:
+            with LATENCY.time("roleplay.pool_generate"):
+                script = self.generate(topic).strip()
+            if script:
+                with self._lock:
+                    self._scripts[topic].append((time.time(), script))
+                    self._stats["generated"] += 1
+                if self.path:
+                    self.save()
+        except Exception:
+            with self._lock:
+                self._stats["refill_failures"] += 1     # 다음 take() 때 다시 시도
+        finally:
+            with self._lock:
+                self._refilling[topic] -= 1
+                if self._refilling[topic] <= 0:
+                    del self._refilling[topic]
+
+    def start(self) -> List[Future]:
+        """모든 주제를 백그라운드로 미리 채우기 시작한다 (ROLEPLAY_POOL_WARM 등 명시적으로 원할 때)."""
+        return [f for t in self.topics for f in self.refill(t)]
+
+    def close(self) -> None:
+        """아직 시작하지 않은 생성 작업을 취소한다. 진행 중인 작업은 LLM 호출 하나씩만 마저 끝낸다.
+
+        풀이 만든 작업자 스레드는 daemon 이 아니어서, 닫지 않으면 인터프리터 종료가
+        남은 채우기를 모두 기다린다.
+        """
+        with self._lock:
+            self._closed = True
+            pending = list(self._futures)
+            self._refilling.clear()
+        for f in pending:
+            f.cancel()
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def save(self) -> None:
+        # 생성 작업들이 동시에 저장하므로, 늦게 찍은 스냅숏이 먼저 찍은 것에 덮이지 않게 한 줄로 세운다
+        with self._save_lock:
+            with self._lock:
+                snapshot = {t: [list(item) for item in q] for t, q in self._scripts.items()}
+
+            def write(tmp: str) -> None:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+            _atomic_write(self.path, write)
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for topic, items in saved.items():
+                if topic in self._scripts:
+                    # 가장 최근 것 size 개만 남긴다
+                    self._scripts[topic].extend((float(ts), str(script)) for ts, script in sorted(items)[-self.size:])
+                    self._prune(topic)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, sizes={t: len(q) for t, q in self._scripts.items()})
+
+class RoleplayAgent:
+    """짧은 역할극 스크립트를 생성하여 사용자의 연습을 돕는다.
+
+    pool 이 있으면 풀 대상 주제는 미리 만든 스크립트를 바로 쓰고, 풀이 비었거나
+    주제가 풀 밖이거나 개인화(personalize / state["roleplay_personalize"])를 원하면
+    사용자 최근 발화를 넣어 그 자리에서 생성한다.
+    """
+    def __init__(self, cache: Optional[bool] = None, pool: Optional[ScriptPool] = None, personalize: bool = False):
+        self.cache = cache  # None 이면 CACHE_POLICY["roleplay"]
+        self.pool = pool
+        self.personalize = personalize
+
+    def _prepare(self, state: Dict[str, Any]) -> Tuple[str, List[Dict[str, str]]]:
+        user_text = state["messages"][-1]["content"]
+        topic = state.get("roleplay_topic") or infer_roleplay_topic(user_text)
+        return topic, roleplay_messages(topic, user_text)
+
+    def _pooled(self, state: Dict[str, Any], topic: str) -> Optional[str]:
+        if self.pool is None or state.get("roleplay_personalize", self.personalize):
+            return None
+        with LATENCY.time("roleplay.pool_take"):
+            return self.pool.take(topic)
+
+    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        with LATENCY.time("agent.roleplay.run"):
+            topic, messages = self._prepare(state)
+            script = self._pooled(state, topic)
+            if script is None:
+                with LATENCY.time("roleplay.on_demand"):
+                    script = chat_completion("roleplay", messages=messages, temperature=0.7, cache=self.cache).strip()
+            return self._finish(state, topic, script)
 
+    def run_stream(self, state: Dict[str, Any]) -> Iterator[str]:
+        """스크립트 토큰을 도착하는 대로 내보내고, 다 받은 뒤 run 과 같이 state 를 갱신한다."""
+        topic, messages = self._prepare(state)
+        script = self._pooled(state, topic)
+        if script is not None:
+            yield script
+            self._finish(state, topic, script)
+            return
+        parts: List[str] = []
+        for token in chat_stream("roleplay", messages=messages, temperature=0.7, cache=self.cache):
+            parts.append(token)
+            yield token
+        self._finish(state, topic, "".join(parts).strip())
+
+    def arun_stream(self, state: Dict[str, Any]) -> ThreadedStream:
+        """run_stream 의 async 이터레이터 버전 (이벤트 루프 안에서 호출)"""
+        return ThreadedStream(lambda: self.run_stream(state))
+
+    def _finish(self, state: Dict[str, Any], topic: str, script: str) -> Dict[str, Any]:
         state["roleplay_count"] = state.get("roleplay_count", 0) + 1
         if not state.get("roleplay_logs"):
             state["roleplay_logs"] = []
@@ -275,46 +1931,39 @@ class RoleplayAgent:
         state["trigger_roleplay"] = False
         return state
 
+SUMMARY_FORMAT = """
+        {
+          "topic_summary": "...",
+          "emotional_flow": "...",
+          "intervention_points": [...],
+          "repeated_patterns": "...",
+          "session_end_reason": "..."
+        }"""
+
+def _transcript(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join([f"{m['role']}: {m['content']}" for m in messages])
+
 class MemoryAgent:
-    """세션 종료 시 요약 보고서 생성"""
-    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        messages = state["messages"]
-        emotion_scores: List[float] = []
-        emotion_tags: List[str] = []
-        high_emotion_moments: List[Dict[str, Any]] = []
-        user_keywords: List[str] = []
+    """세션 종료 시 요약 보고서 생성
 
-        session_datetime = datetime.now().strftime("%Y-%m-%d %H:%M")
-        dialogue_length = len(messages)
+    incremental_every 를 주면 세션 도중 observe() 가 N 턴마다(또는 밀린 대화가
+    token_budget 을 넘으면) 백그라운드에서 누적 요약을 갱신한다. 종료 시에는
+    누적 요약 + 마지막 델타만 합치므로 보고서 생성 시간이 세션 길이와
+    거의 무관해진다. counseling_summary 형식은 그대로다.
+    executor 를 주면 누적 요약을 그 풀에서 돌린다 (없으면 공용 백그라운드 풀).
+    """
+    def __init__(self, cache: Optional[bool] = None, incremental_every: Optional[int] = None, token_budget: int = 1500,
+                 graph: Optional[GraphRenderer] = None, executor: Optional[Executor] = None):
+        self.cache = cache  # None 이면 CACHE_POLICY["report"]
+        self.graph = graph or GraphRenderer()
+        self.incremental_every = incremental_every
+        self.token_budget = token_budget
+        self.executor = executor
 
-        for i, msg in enumerate(messages):
-            if msg["role"] == "user":
-                text = re.sub(r"[^\w\s]", "", msg["content"])
-                user_keywords.extend(text.lower().split())
-                if "emotion" in msg:
-                    score = float(msg["emotion"]["score"])
-                    emotion_scores.append(score)
-                    emotion_tags.append(msg["emotion"]["class"])
-                    if score > 0.7:
-                        high_emotion_moments.append({"turn": i, "score": score, "text": msg["content"]})
-
-        top_keywords = [word for word, _ in Counter(user_keywords).most_common(10)]
-
-        # 감정 추이 그래프 저장
-        plt.figure()
-        plt.plot(range(len(emotion_scores)), emotion_scores, marker='o')
-        plt.axhline(0.7, linestyle='--')
-        plt.axhline(0.9, linestyle='--')
-        plt.title("Emotion Intensity Over Time")
-        plt.xlabel("Turn Index")
-        plt.ylabel("Emotion Score")
-        plt.tight_layout()
-        plt.savefig("emotion_graph.png")
-        plt.close()
-
-        # 대화 요약 (GPT)
-        transcript = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
-        prompt = f"""
+    def _summarize(self, site: str, previous: Optional[Dict[str, Any]], delta: List[Dict[str, Any]]) -> Dict[str, Any]:
+        transcript = _transcript(delta)
+        if previous is None:
+            prompt = f"""
         다음 상담 대화를 요약해주세요:
         1. 대화 주제와 흐름
         2. 감정 변화 패턴
@@ -323,27 +1972,88 @@ class MemoryAgent:
         5. 반복되는 사고나 표현
 
         상담:\n{transcript}
-        형식:
-        {{
-          "topic_summary": "...",
-          "emotional_flow": "...",
-          "intervention_points": [...],
-          "repeated_patterns": "...",
-          "session_end_reason": "..."
-        }}
+        형식:{SUMMARY_FORMAT}
+        """
+        else:
+            prompt = f"""
+        아래는 지금까지의 상담 요약(JSON)과 그 이후에 이어진 대화입니다.
+        이어진 대화를 반영해 같은 형식의 요약으로 갱신해주세요:
+        1. 대화 주제와 흐름
+        2. 감정 변화 패턴
+        3. 마인드풀니스 또는 롤플레잉 개입 시점 (기존 항목 유지 + 추가)
+        4. 상담 종료 이유{" (아직 진행 중이면 빈 문자열)" if site == "summary" else ""}
+        5. 반복되는 사고나 표현
+
+        지금까지의 요약:\n{json.dumps(previous, ensure_ascii=False)}
+        이어진 상담:\n{transcript}
+        형식:{SUMMARY_FORMAT}
         """
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
+            content = chat_completion(
+                site,
                 messages=[
                     {"role": "system", "content": "너는 상담 보고서 전문가야. 반드시 JSON만 반환해."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2
+                temperature=0.2,
+                cache=self.cache,
             )
-            parsed = parse_json_safely(response.choices[0].message.content)
-        except Exception:
-            parsed = {}
+            return parse_json_safely(content)
+        except Exception as e:
+            LATENCY.count("fallbacks", site=site, error=type(e).__name__)
+            return {}
+
+    def _roll(self, state: Dict[str, Any], previous: Optional[Dict[str, Any]], delta: List[Dict[str, Any]], upto: int) -> None:
+        with LATENCY.time("report.rolling_update"):
+            parsed = self._summarize("summary", previous, delta)
+        if parsed:     # 실패하면 이전 요약을 유지하고 다음 번에 더 긴 델타로 다시 시도
+            state["rolling_summary"] = {"summary": parsed, "upto": upto}
+
+    def observe(self, state: Dict[str, Any]) -> None:
+        """매 턴 뒤 호출. 조건이 되면 누적 요약 갱신을 백그라운드로 넘긴다 (동시에 하나만)."""
+        if not self.incremental_every:
+            return
+        inflight: Optional[Future] = state.get("summary_pending")
+        if inflight is not None and not inflight.done():
+            return
+        rolling = state.get("rolling_summary") or {}
+        start = rolling.get("upto", 0)
+        delta = [{"role": m["role"], "content": m["content"]} for m in state["messages"][start:]]
+        user_turns = sum(1 for m in delta if m["role"] == "user")
+        if user_turns < self.incremental_every and _estimate_tokens(_transcript(delta)) < self.token_budget:
+            return
+        state["summary_pending"] = (self.executor or _background_executor()).submit(
+            self._roll, state, rolling.get("summary"), delta, start + len(delta))
+
+    def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        with LATENCY.time("agent.memory.run"):
+            return self._report(state)
+
+    def _report(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        wait_pending_analyses(state)
+        messages = state["messages"]
+        stats = session_stats(state)
+
+        session_datetime = datetime.now().strftime("%Y-%m-%d %H:%M")
+        dialogue_length = len(messages)
+
+        emotion_scores: List[float] = stats.scores.tolist()
+        emotion_tags = stats.tag_set()
+        high_emotion_moments: List[Dict[str, Any]] = [
+            {"turn": stats.turn_index[slot], "score": stats.scores[slot], "text": messages[stats.turn_index[slot]]["content"]}
+            for slot in stats.high
+        ]
+        top_keywords = stats.top_keywords(10)
+
+        # 대화 요약 (GPT) — 누적 요약이 있으면 마지막 델타만 합친다
+        inflight = state.pop("summary_pending", None)
+        if inflight is not None:
+            inflight.result()
+        rolling = state.get("rolling_summary") or {}
+        with LATENCY.time("report.summary"):
+            parsed = self._summarize("report", rolling.get("summary"), messages[rolling.get("upto", 0):])
+        if not parsed and rolling:
+            parsed = rolling["summary"]
 
         report = {
             "session_overview": {
@@ -354,33 +2064,218 @@ class MemoryAgent:
                 "roleplay_used": state.get("roleplay_count", 0)
             },
             "emotion_summary": {
-                "tags": list(set(emotion_tags)),
+                "tags": emotion_tags,
                 "score_trend": emotion_scores,
                 "high_emotion_moments": high_emotion_moments,
-                "graph_path": "emotion_graph.png"
+                "graph_path": None     # 그래프 파일이 생기면 채워진다
             },
             "counseling_summary": parsed
         }
 
         # 실제로 롤플이 있었을 때만 포함
         if state.get("roleplay_count", 0) > 0 and state.get("roleplay_logs"):
-            report["roleplay_details"] = state["roleplay_logs"]
+            report["roleplay_details"] = list(state["roleplay_logs"])
 
         state["report"] = report
+        # 감정 추이 그래프는 별도 단계 (기본: 백그라운드 SVG)
+        self.graph.submit(state, emotion_scores)
+        journal_checkpoint(state)
         return state
 
+    def run_from_journal(self, path: str, window: Optional[int] = None) -> Dict[str, Any]:
+        """비정상 종료된 세션의 저널로 state 를 복구해 보고서를 만들고 저널을 닫는다."""
+        state = resume_session(path, window=window)
+        state["session_end"] = True
+        state = self.run(state)
+        wait_graph(state)
+        close_journal(state)
+        return state
+
+# ───────────────────────────────
+# 세션 통계 (증분 집계)
+# ───────────────────────────────
+EMOTION_CLASSES: Tuple[str, ...] = ("기쁨", "슬픔", "분노", "불안", "무기력", "중립")
+HIGH_EMOTION_THRESHOLD = 0.7
+_PUNCT = re.compile(r"[^\w\s]")
+
+class SessionStats:
+    """턴마다 갱신되는 세션 집계. 보고서·중간 조회 때 메시지를 다시 훑지 않는다.
+
+    감정 점수·태그는 배열(array)로, 고감정 턴은 점수 슬롯 번호의 정렬된 배열로
+    들고 있다. 빠른 경로로 나중에 채워지는 감정은 update() 로 슬롯을 고친다.
+    """
+    __slots__ = ("keywords", "scores", "tags", "turn_index", "high", "tag_counts", "class_names", "_lock")
+
+    def __init__(self):
+        self.keywords: Counter = Counter()
+        self.scores = array("d")        # 슬롯별 감정 점수
+        self.tags = array("B")          # 슬롯별 감정 클래스 번호 (class_names 인덱스)
+        self.turn_index = array("I")    # 슬롯 → messages 인덱스
+        self.high = array("I")          # 점수 > 0.7 인 슬롯 (오름차순)
+        self.tag_counts = array("I")
+        self.class_names: List[str] = list(EMOTION_CLASSES)
+        self.tag_counts.extend([0] * len(self.class_names))
+        self._lock = threading.Lock()
+
+    def _class_id(self, name: str) -> int:
+        try:
+            return self.class_names.index(name)
+        except ValueError:
+            self.class_names.append(name)
+            self.tag_counts.append(0)
+            return len(self.class_names) - 1
+
+    def add_keywords(self, text: str) -> None:
+        words = _PUNCT.sub("", text).lower().split()
+        with self._lock:
+            self.keywords.update(words)
+
+    def add_emotion(self, msg_index: int, emotion_class: str, score: float) -> int:
+        """감정이 붙은 사용자 턴을 추가하고 슬롯 번호를 돌려준다."""
+        with self._lock:
+            slot = len(self.scores)
+            cid = self._class_id(emotion_class)
+            self.scores.append(score)
+            self.tags.append(cid)
+            self.turn_index.append(msg_index)
+            self.tag_counts[cid] += 1
+            if score > HIGH_EMOTION_THRESHOLD:
+                self.high.append(slot)
+            return slot
+
+    def update(self, slot: int, emotion_class: str, score: float) -> None:
+        """이미 추가된 슬롯의 감정을 교체 (백그라운드 분류 완료 시)"""
+        with self._lock:
+            cid = self._class_id(emotion_class)
+            self.tag_counts[self.tags[slot]] -= 1
+            self.tag_counts[cid] += 1
+            self.tags[slot] = cid
+            was_high = self.scores[slot] > HIGH_EMOTION_THRESHOLD
+            self.scores[slot] = score
+            if was_high and score <= HIGH_EMOTION_THRESHOLD:
+                self.high.remove(slot)
+            elif not was_high and score > HIGH_EMOTION_THRESHOLD:
+                bisect.insort(self.high, slot)
+
+    @classmethod
+    def from_messages(cls, messages: List[Dict[str, Any]]) -> "SessionStats":
+        """집계 없이 만들어진 state(직접 구성·복원 등)용 일괄 재구성"""
+        stats = cls()
+        for i, msg in enumerate(messages):
+            if msg["role"] == "user":
+                stats.add_keywords(msg["content"])
+                if "emotion" in msg:
+                    stats.add_emotion(i, msg["emotion"]["class"], float(msg["emotion"]["score"]))
+        return stats
+
+    def top_keywords(self, n: int = 10) -> List[str]:
+        with self._lock:
+            return [word for word, _ in self.keywords.most_common(n)]
+
+    def tag_set(self) -> List[str]:
+        with self._lock:
+            return [name for name, c in zip(self.class_names, self.tag_counts) if c]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """현재 통계 (대시보드용). 점수 전체 목록은 포함하지 않는다."""
+        with self._lock:
+            n = len(self.scores)
+            return {
+                "emotion_turns": n,
+                "last_score": self.scores[-1] if n else None,
+                "mean_score": round(sum(self.scores) / n, 4) if n else None,
+                "tag_counts": {name: c for name, c in zip(self.class_names, self.tag_counts) if c},
+                "high_emotion_turns": len(self.high),
+                "distinct_keywords": len(self.keywords),
+            }
+
+def session_stats(state: Dict[str, Any]) -> SessionStats:
+    stats = state.get("stats")
+    if stats is None:
+        stats = state["stats"] = SessionStats.from_messages(state["messages"])
+    return stats
+
+def current_stats(state: Dict[str, Any], top_n: int = 10) -> Dict[str, Any]:
+    """세션 도중 조회용 통계 (메시지를 다시 훑지 않는다)"""
+    stats = session_stats(state)
+    return dict(stats.snapshot(), top_keywords=stats.top_keywords(top_n))
+
 # ───────────────────────────────
 # 상태 업데이트 & 분기
 # ───────────────────────────────
-def analyze_and_update_state(state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+_background_pool: Optional[ThreadPoolExecutor] = None
+_background_lock = threading.Lock()
+
+def _background_executor() -> ThreadPoolExecutor:
+    global _background_pool
+    with _background_lock:
+        if _background_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _background_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="emotion-bg")
+        return _background_pool
+
+def _finish_emotion_in_background(emotion: Dict[str, Any], text: str, cats: Dict[str, List[str]],
+                                  stats: SessionStats, slot: int) -> Dict[str, Any]:
+    """빠른 경로로 라우팅된 턴의 GPT 감정 분류를 마저 수행해 메시지와 집계에 붙인다."""
+    with LATENCY.time("analysis.background_llm"):
+        full = _build_emotion_result(cats, _request_emotion(text))
+    emotion["class"] = full["emotion_class"]
+    emotion["score"] = full["emotion_score"]
+    emotion.pop("pending", None)
+    stats.update(slot, full["emotion_class"], full["emotion_score"])
+    return full
+
+def wait_pending_analyses(state: Dict[str, Any], timeout: Optional[float] = 30.0) -> None:
+    """백그라운드 감정 분류가 모두 메시지에 붙을 때까지 기다린다 (보고서 생성 전)."""
+    pending: List[Future] = state.pop("pending_analyses", None) or []
+    if pending:
+        from concurrent.futures import wait
+        wait(pending, timeout=timeout)
+
+def analyze_and_update_state(state: Dict[str, Any], fast_path: bool = True,
+                             executor: Optional[Executor] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """최신 사용자 메시지를 분석하고 다음 노드를 정한다.
+
+    fast_path: 로컬 탐지기가 위험(suicide/direct)을 잡으면 GPT 응답을 기다리지
+    않고 바로 마인드풀니스로 보낸다. 위험 판단과 라우팅은 로컬 결과만으로
+    결정되므로 결과가 달라지지 않는다. 감정 분류는 백그라운드에서 끝난 뒤
+    메시지의 emotion 에 채워지고, 그 전까지 결과에는 emotion_pending=True 와
+    중립 기본값이 들어간다. 백그라운드 분류는 executor 에서 돈다 (없으면 공용 풀).
+    """
+    t0 = time.perf_counter()
+    stats = state.get("stats")
+    if stats is None:
+        # 최신 턴은 아래에서 더하므로 그 앞 메시지까지만 일괄 재구성한다
+        stats = state["stats"] = SessionStats.from_messages(state["messages"][:-1])
+    msg_index = len(state["messages"]) - 1
     latest_msg = state["messages"][-1]
-    result = gpt_emotion_analysis(latest_msg["content"])
+    text = latest_msg["content"]
+    cats = detect_extreme_categories(text)
+    stats.add_keywords(text)
 
-    latest_msg["emotion"] = {
-        "class": result["emotion_class"],
-        "score": result["emotion_score"],
-        "extreme": result["extreme"]
-    }
+    if fast_path and is_crisis(cats):
+        result = _build_emotion_result(cats, NEUTRAL_EMOTION)
+        result["emotion_pending"] = True
+        latest_msg["emotion"] = {
+            "class": result["emotion_class"],
+            "score": result["emotion_score"],
+            "extreme": result["extreme"],
+            "pending": True,
+        }
+        slot = stats.add_emotion(msg_index, result["emotion_class"], result["emotion_score"])
+        fut = (executor or _background_executor()).submit(_finish_emotion_in_background, latest_msg["emotion"], text, cats, stats, slot)
+        state.setdefault("pending_analyses", []).append(fut)
+        path = "analysis.fast_path"
+    else:
+        result = _build_emotion_result(cats, _request_emotion(text))
+        latest_msg["emotion"] = {
+            "class": result["emotion_class"],
+            "score": result["emotion_score"],
+            "extreme": result["extreme"]
+        }
+        stats.add_emotion(msg_index, result["emotion_class"], result["emotion_score"])
+        path = "analysis.crisis_llm_path" if result["extreme"] else "analysis.llm_path"
+    LATENCY.record(path, time.perf_counter() - t0)
     state["messages"][-1] = latest_msg
     state["emotion_score"] = result["emotion_score"]
     state["extreme_keywords"] = result.get("extreme_terms", [])
@@ -392,6 +2287,7 @@ def analyze_and_update_state(state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dic
             "content": "안정화 안내가 필요합니다."
         })
         state["next_node"] = "mindfulness"
+        LATENCY.count("routes", node="mindfulness")
         return state, result
 
     # 2) 롤플레잉 조건 검사
@@ -400,83 +2296,733 @@ def analyze_and_update_state(state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dic
         if reason:
             state["interventions"].append({"type": "roleplay_trigger", "content": reason})
         state["next_node"] = "roleplay"
+        LATENCY.count("routes", node="roleplay")
         return state, result
 
     # 3) 일반 대화
     state["next_node"] = "assistant"
+    LATENCY.count("routes", node="assistant")
     return state, result
 
 def emotion_branch(state: Dict[str, Any]) -> str:
     route = state.get("next_node", "assistant")
     return route if route in ("assistant", "mindfulness", "roleplay") else "assistant"
 
+# ───────────────────────────────
+# 세션 상태 (슬롯 레코드 · 메모리 창 · 세션 로그)
+# ───────────────────────────────
+# 메시지와 감정은 __slots__ 레코드로 들고, messages·interventions·roleplay_logs 는
+# 최근 window 개만 메모리에 둔다. 창 밖으로 밀려난 레코드는 세션 로그(JSONL)에
+# 덧붙였다가 필요할 때 다시 읽는다. 모두 dict 처럼 접근할 수 있으므로 기존
+# state["..."] / msg["..."] 코드는 그대로 동작한다. 감정 점수 집계는 SessionStats 배열이 맡는다.
+class _Record:
+    """키 → 슬롯 이름 매핑으로 dict 스타일 접근을 제공하는 레코드 (None 은 '키 없음')"""
+    __slots__ = ()
+    _keys: Dict[str, str] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        value = getattr(self, self._keys[key]) if key in self._keys else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._keys:
+            raise KeyError(key)
+        setattr(self, self._keys[key], value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys and getattr(self, self._keys[key]) is not None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self:
+            value = self[key]
+            setattr(self, self._keys[key], None)
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for key, attr in self._keys.items():
+            value = getattr(self, attr)
+            if value is not None:
+                out[key] = value.to_dict() if isinstance(value, _Record) else value
+        return out
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class Emotion(_Record):
+    __slots__ = ("cls", "score", "extreme", "pending")
+    _keys = {"class": "cls", "score": "score", "extreme": "extreme", "pending": "pending"}
+
+    def __init__(self, cls: Optional[str] = None, score: Optional[float] = None,
+                 extreme: Optional[bool] = None, pending: Optional[bool] = None):
+        self.cls = cls
+        self.score = score
+        self.extreme = extreme
+        self.pending = pending
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Emotion":
+        return cls(d.get("class"), d.get("score"), d.get("extreme"), d.get("pending"))
+
+class Message(_Record):
+    __slots__ = ("role", "content", "emotion")
+    _keys = {"role": "role", "content": "content", "emotion": "emotion"}
+
+    def __init__(self, role: str, content: str, emotion: Optional[Emotion] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.emotion = emotion
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "emotion" and isinstance(value, dict):
+            value = Emotion.from_dict(value)
+        super().__setitem__(key, value)
+
+    @classmethod
+    def coerce(cls, m: Any) -> "Message":
+        if isinstance(m, Message):
+            return m
+        emotion = m.get("emotion")
+        return cls(m["role"], m["content"], Emotion.from_dict(emotion) if isinstance(emotion, dict) else emotion)
+
+class SessionLog:
+    """창 밖으로 밀려난 레코드를 종류별로 덧붙이는 세션 로그 (JSONL, 첫 기록 때 파일 생성)"""
+    def __init__(self, path: str):
+        self.path = path
+        self._offsets: Dict[str, array] = {}   # 종류 → 레코드별 바이트 오프셋
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def append(self, kind: str, record: Dict[str, Any]) -> None:
+        self.extend(kind, (record,))
+
+    def extend(self, kind: str, records: Any) -> None:
+        lines = [json.dumps({"kind": kind, "record": r}, ensure_ascii=False).encode("utf-8") + b"\n" for r in records]
+        with self._lock:
+            with open(self.path, "ab" if self._size else "wb") as f:
+                f.write(b"".join(lines))
+            offsets = self._offsets.setdefault(kind, array("Q"))
+            for line in lines:
+                offsets.append(self._size)
+                self._size += len(line)
+
+    def read(self, kind: str, start: int, stop: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            offsets = self._offsets.get(kind, array("Q"))[start:stop]
+            if not offsets:
+                return []
+            with open(self.path, "rb") as f:
+                out = []
+                for offset in offsets:
+                    f.seek(offset)
+                    out.append(json.loads(f.readline())["record"])
+                return out
+
+    def discard(self) -> None:
+        with self._lock:
+            if self._size:
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+            self._offsets.clear()
+            self._size = 0
+
+class WindowedList:
+    """최근 window 개만 메모리에 두는 리스트. 넘친 앞쪽 레코드는 세션 로그로 옮긴다.
+
+    인덱스·len 은 로그로 옮겨진 것까지 포함한 전체 기준이다. 로그 쪽 레코드는
+    읽을 때마다 새로 만든 사본이므로 수정할 수 없다 (창 안의 레코드만 수정 가능).
+    hold(레코드) 가 참인 레코드(예: 백그라운드 감정 분류가 아직 안 끝난 메시지)는
+    창을 넘어도 바로 옮기지 않고 기다린다. 다만 창보다 max(window, 32) 개 넘게
+    쌓이면 (분류가 끝나지 않는 경우) 메모리를 지키기 위해 그대로 옮긴다.
+    """
+    __slots__ = ("kind", "log", "window", "coerce", "hold", "_items", "_spilled")
+
+    def __init__(self, kind: str, log: Optional[SessionLog], window: Optional[int] = None, items: Any = (),
+                 coerce: Optional[Callable[[Any], Any]] = None, hold: Optional[Callable[[Any], bool]] = None):
+        if window is not None and log is None:
+            raise ValueError("window 를 쓰려면 세션 로그가 필요합니다")
+        self.kind = kind
+        self.log = log
+        self.window = window
+        self.coerce = coerce
+        self.hold = hold
+        self._items: deque = deque()
+        self._spilled = 0
+        items = [coerce(x) for x in items] if coerce else list(items)
+        if window is not None and len(items) > window:
+            # 처음부터 창을 넘는 목록(복구 등)은 앞부분을 한 번에 로그로 옮긴다.
+            # 대기 중인 레코드부터는 append 가 붙잡아 두도록 남긴다 (append 와 같은 상한까지)
+            cut = len(items) - window
+            if hold is not None:
+                held = next((i for i in range(cut) if hold(items[i])), cut)
+                cut = max(len(items) - self._limit(), held)
+            head, items = items[:cut], items[cut:]
+            log.extend(kind, [x.to_dict() if isinstance(x, _Record) else x for x in head])
+            self._spilled = len(head)
+        for item in items:
+            self.append(item)
+
+    def _limit(self) -> int:
+        return self.window + max(self.window, 32)
+
+    def in_memory(self, i: int) -> bool:
+        """i 번째 레코드가 창 안에 있어 수정할 수 있는지"""
+        return self._index(i) >= self._spilled
+
+    def append(self, item: Any) -> None:
+        self._items.append(self.coerce(item) if self.coerce else item)
+        if self.window is None:
+            return
+        spill = []
+        limit = self._limit()
+        while len(self._items) > self.window:
+            # 로그는 위치 순서로만 쌓이므로 맨 앞이 대기 중이면 뒤의 레코드도 함께 기다린다
+            if self.hold is not None and len(self._items) <= limit and self.hold(self._items[0]):
+                break
+            old = self._items.popleft()
+            spill.append(old.to_dict() if isinstance(old, _Record) else old)
+        if spill:
+            self.log.extend(self.kind, spill)
+            self._spilled += len(spill)
+
+    def _load(self, start: int, stop: int) -> List[Any]:
+        records = self.log.read(self.kind, start, stop) if start < stop else []
+        return [self.coerce(r) for r in records] if self.coerce else records
+
+    def _index(self, i: int) -> int:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("index out of range")
+        return i
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._items)
+
+    def __getitem__(self, i: Any) -> Any:
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            out = self._load(start, min(stop, self._spilled))
+            out.extend(islice(self._items, max(start - self._spilled, 0), max(stop - self._spilled, 0)))
+            return out
+        i = self._index(i)
+        if i >= self._spilled:
+            return self._items[i - self._spilled]
+        return self._load(i, i + 1)[0]
+
+    def __setitem__(self, i: int, item: Any) -> None:
+        i = self._index(i)
+        if i < self._spilled:
+            raise IndexError("세션 로그로 옮겨진 레코드는 수정할 수 없습니다")
+        self._items[i - self._spilled] = self.coerce(item) if self.coerce else item
+
+    def __iter__(self) -> Iterator[Any]:
+        yield from self._load(0, self._spilled)
+        yield from list(self._items)
+
+    def __repr__(self) -> str:
+        return f"WindowedList({self.kind!r}, len={len(self)}, in_memory={len(self._items)})"
+
+_STATE_FIELDS: Tuple[str, ...] = (
+    "user_id", "session_id", "messages", "emotion_score", "extreme_keywords", "trigger_roleplay", "roleplay_topic",
+    "auto_roleplay", "session_end", "interventions", "report", "mindfulness_count", "roleplay_count",
+    "roleplay_logs", "next_node", "stats",
+)
+_STATE_SLOTS = frozenset(_STATE_FIELDS)
+_WINDOWED_FIELDS = {"messages": Message.coerce, "interventions": None, "roleplay_logs": None}
+
+def _emotion_pending(msg: Message) -> bool:
+    """백그라운드 분류가 끝나기 전에 로그로 옮기면 결과가 창 안의 사본에만 붙는다"""
+    return msg.emotion is not None and bool(msg.emotion.get("pending"))
+
+class SessionState(MutableMapping):
+    """세션 state. 고정 키는 슬롯에, 그 밖의 키(pending_analyses 등)는 extras 에 둔다.
+
+    dict 와 같은 방식으로 읽고 쓴다. messages·interventions·roleplay_logs 에 list 를
+    대입하면 같은 세션 로그·window 를 쓰는 WindowedList 로 바뀐다.
+    """
+    __slots__ = _STATE_FIELDS + ("extras", "log", "window")
+
+    def __init__(self, log: Optional[SessionLog] = None, window: Optional[int] = None, **values: Any):
+        self.extras: Dict[str, Any] = {}
+        self.log = log
+        self.window = window
+        for key, value in values.items():
+            self[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _STATE_SLOTS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return self.extras[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _WINDOWED_FIELDS and isinstance(value, list):
+            value = WindowedList(key, self.log, self.window, value, _WINDOWED_FIELDS[key],
+                                 _emotion_pending if key == "messages" else None)
+        if key in _STATE_SLOTS:
+            setattr(self, key, value)
+        else:
+            self.extras[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in _STATE_SLOTS:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        else:
+            del self.extras[key]
+
+    def __contains__(self, key: object) -> bool:
+        return hasattr(self, key) if key in _STATE_SLOTS else key in self.extras
+
+    def __iter__(self) -> Iterator[str]:
+        for key in _STATE_FIELDS:
+            if hasattr(self, key):
+                yield key
+        yield from list(self.extras)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def close(self, discard: bool = False) -> None:
+        """세션 종료 시 호출. discard=True 면 세션 로그 파일을 지운다."""
+        if discard and self.log is not None:
+            self.log.discard()
+
+def new_session_state(user_id: str = "demo-user", session_id: Optional[str] = None,
+                      window: Optional[int] = None, log_dir: Optional[str] = None,
+                      journal_dir: Optional[str] = None, executor: Optional[Executor] = None) -> SessionState:
+    """새 세션의 초기 state
+
+    window: 메모리에 둘 최근 레코드 수 (기본 SESSION_WINDOW 환경변수, 200; 0 이면 무제한).
+    log_dir: 넘친 레코드를 적을 디렉터리 (기본 SESSION_LOG_DIR, 없으면 임시 디렉터리).
+    journal_dir: 세션 저널 디렉터리 (기본 SESSION_JOURNAL_DIR, 빈 문자열이면 저널 없음).
+    executor: 저널 fsync 를 돌릴 백그라운드 풀 (없으면 공용 풀).
+    """
+    session_id = session_id or uuid.uuid4().hex[:12]
+    if window is None:
+        window = int(os.getenv("SESSION_WINDOW", "200"))
+    if log_dir is None:
+        import tempfile
+        log_dir = os.getenv("SESSION_LOG_DIR") or tempfile.gettempdir()
+    state = SessionState(
+        SessionLog(os.path.join(log_dir, f"session_{session_id}_{uuid.uuid4().hex[:8]}.jsonl")),   # 임시 파일: 인스턴스마다 따로
+        window if window > 0 else None,
+        user_id=user_id,
+        session_id=session_id,
+        messages=[],
+        emotion_score=0.0,
+        extreme_keywords=[],
+        trigger_roleplay=False,     # 외부에서 True 지정 시 즉시 1회 실행
+        roleplay_topic="",          # 있으면 해당 주제로 롤플
+        auto_roleplay=False,        # 휴리스틱 자동 롤플 (기본 OFF 권장)
+        session_end=False,
+        interventions=[],
+        report={},
+        mindfulness_count=0,
+        roleplay_count=0,
+        roleplay_logs=None,         # 실제 실행 전까지 None
+        next_node="assistant",
+        stats=SessionStats(),
+    )
+    journal_dir = os.getenv("SESSION_JOURNAL_DIR", "") if journal_dir is None else journal_dir
+    if journal_dir:
+        state["journal"] = SessionJournal(journal_path(journal_dir, session_id), executor=executor)
+        state["journal"].checkpoint(state)
+    return state
+
+# ───────────────────────────────
+# 세션 저널 (append-only · 배치 fsync · 복구)
+# ───────────────────────────────
+# 턴마다 바뀐 내용(메시지·감정·라우팅·개입·롤플·스칼라 필드)만 JSONL 로 덧붙인다.
+# 프로세스가 죽어도 OS 버퍼까지는 매번 내려가 있고, 전원 장애 대비 fsync 는
+# fsync_every 개 레코드 또는 fsync_interval 초마다 백그라운드에서 묶어서 한다.
+_JOURNAL_SKIP = frozenset({"messages", "interventions", "roleplay_logs", "stats", "pending_analyses",
+                           "summary_pending", "graph_pending", "graph_job", "journal"})
+_JOURNAL_LISTS = (("interventions", "intervention"), ("roleplay_logs", "roleplay"))
+
+def journal_path(journal_dir: str, session_id: str) -> str:
+    return os.path.join(journal_dir, f"journal_{session_id}.jsonl")
+
+class SessionJournal:
+    """세션 하나의 append-only 저널. checkpoint() 는 지난번 이후의 변경분만 기록한다."""
+    def __init__(self, path: str, fsync_every: int = 64, fsync_interval: float = 1.0,
+                 executor: Optional[Executor] = None):
+        self.path = path
+        self.executor = executor                # 묶음 fsync 를 돌릴 풀 (없으면 공용 백그라운드 풀)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.closed = False
+        self._counts = {"messages": 0, "interventions": 0, "roleplay_logs": 0}
+        self._pending: set = set()              # 감정이 아직 확정되지 않은 사용자 메시지 인덱스
+        self._values: Dict[str, Any] = {}       # 키 → 마지막으로 기록한 값 (JSON 왕복 사본)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._sync_future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def _message_event(self, i: int, m: Any) -> str:
+        record = m.to_dict() if isinstance(m, _Record) else m
+        emotion = record.get("emotion")
+        if record.get("role") == "user" and (emotion is None or emotion.get("pending")):
+            self._pending.add(i)
+        return json.dumps({"t": "msg", "i": i, "ts": round(time.time(), 3), "m": record}, ensure_ascii=False)
+
+    def checkpoint(self, state: Dict[str, Any]) -> int:
+        """지난 checkpoint 이후 바뀐 내용을 덧붙이고 기록한 이벤트 수를 돌려준다."""
+        with self._lock:
+            if self.closed:
+                return 0
+            lines: List[str] = []
+            messages = state["messages"]
+            for i in sorted(self._pending):
+                emotion = messages[i].get("emotion") if i < len(messages) else None
+                if emotion is not None and not emotion.get("pending"):
+                    self._pending.discard(i)
+                    emotion = emotion.to_dict() if isinstance(emotion, _Record) else emotion
+                    lines.append(json.dumps({"t": "emotion", "i": i, "e": emotion}, ensure_ascii=False))
+            done = self._counts["messages"]
+            if len(messages) > done:
+                lines.extend(self._message_event(i, m) for i, m in enumerate(messages[done:], start=done))
+                self._counts["messages"] = len(messages)
+            for key, kind in _JOURNAL_LISTS:
+                items = state.get(key) or []
+                done = self._counts[key]
+                if len(items) > done:
+                    lines.extend(json.dumps({"t": kind, "v": v}, ensure_ascii=False) for v in items[done:])
+                    self._counts[key] = len(items)
+            for key, value in state.items():
+                if key in _JOURNAL_SKIP or (key in self._values and self._values[key] == value):
+                    continue
+                try:
+                    encoded = json.dumps(value, ensure_ascii=False)
+                except (TypeError, ValueError):
+                    continue      # JSON 으로 못 쓰는 런타임 객체는 저널 대상이 아니다
+                self._values[key] = json.loads(encoded)
+                lines.append(f'{{"t": "set", "k": {json.dumps(key, ensure_ascii=False)}, "v": {encoded}}}')
+            self._write(lines)
+            return len(lines)
+
+    def _write(self, lines: List[str], sync: bool = False) -> None:
+        sync = sync or self.fsync_every <= 1     # fsync_every=1: 매 checkpoint 동기 fsync
+        if lines:
+            with open(self.path, "ab") as f:
+                f.write(("\n".join(lines) + "\n").encode("utf-8"))
+                if sync:
+                    os.fsync(f.fileno())
+            self._unsynced += len(lines)
+        if sync:
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+        elif self._unsynced and (self._unsynced >= self.fsync_every
+                                 or time.monotonic() - self._last_sync >= self.fsync_interval):
+            if self._sync_future is None or self._sync_future.done():
+                self._unsynced = 0
+                self._last_sync = time.monotonic()
+                self._sync_future = (self.executor or _background_executor()).submit(self._fsync)
+
+    def _fsync(self) -> None:
+        with LATENCY.time("journal.fsync"), open(self.path, "ab") as f:
+            os.fsync(f.fileno())
+
+    def close(self, state: Optional[Dict[str, Any]] = None) -> None:
+        """마지막 변경분과 end 이벤트를 쓰고 fsync 한다. 이후 checkpoint 는 무시된다."""
+        if state is not None:
+            self.checkpoint(state)
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self._write(['{"t": "end"}'], sync=True)
+
+def journal_checkpoint(state: Dict[str, Any]) -> None:
+    journal: Optional[SessionJournal] = state.get("journal")
+    if journal is not None:
+        journal.checkpoint(state)
+
+def _analyze_and_checkpoint(state: Dict[str, Any], background: Optional[Executor]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """분석 직후의 저널 기록까지 작업 스레드에서 (파일 쓰기·JSON 직렬화가 이벤트 루프를 막지 않게)"""
+    state, result = analyze_and_update_state(state, True, background)
+    journal_checkpoint(state)
+    return state, result
+
+def close_journal(state: Dict[str, Any]) -> None:
+    journal: Optional[SessionJournal] = state.get("journal")
+    if journal is not None:
+        journal.close(state)
+
+def read_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """저널 이벤트를 순서대로 읽는다. 비정상 종료로 잘린 마지막 줄은 버린다."""
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+def journal_ended(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 64))
+        return f.read().rstrip().endswith(b'{"t": "end"}')
+
+def unfinished_sessions(journal_dir: str) -> List[str]:
+    """end 이벤트 없이 끝난 (비정상 종료된) 세션 저널 경로"""
+    if not os.path.isdir(journal_dir):
+        return []
+    paths = [os.path.join(journal_dir, name) for name in sorted(os.listdir(journal_dir))
+             if name.startswith("journal_") and name.endswith(".jsonl")]
+    return [p for p in paths if not journal_ended(p)]
+
+def resume_session(path: str, window: Optional[int] = None, log_dir: Optional[str] = None,
+                   executor: Optional[Executor] = None) -> SessionState:
+    """저널을 한 번 훑어 state 를 다시 만든다 (집계·누적 요약 포함). 저널은 이어서 기록된다.
+
+    감정이 확정되기 전에 끊긴 턴은 executor 에서 다시 분류한다 (pending_analyses 로 추적).
+    """
+    messages: List[Dict[str, Any]] = []
+    lists: Dict[str, List[Any]] = {"intervention": [], "roleplay": []}
+    values: Dict[str, Any] = {}
+    for event in read_journal(path):
+        t = event["t"]
+        if t == "msg":
+            messages.append(event["m"])
+        elif t == "emotion":
+            messages[event["i"]]["emotion"] = event["e"]
+        elif t == "set":
+            values[event["k"]] = event["v"]
+        elif t in lists:
+            lists[t].append(event["v"])
+
+    # 감정이 확정되기 전에 끊긴 사용자 턴 (빠른 경로 분류 대기 중이었거나 분석 전)
+    unresolved = [i for i, m in enumerate(messages)
+                  if m["role"] == "user" and m.get("emotion", {"pending": True}).get("pending")]
+    for i in unresolved:
+        emotion = messages[i].get("emotion") or {"class": NEUTRAL_EMOTION["emotion_class"],
+                                                "score": NEUTRAL_EMOTION["emotion_score"], "extreme": False}
+        messages[i]["emotion"] = dict(emotion, pending=True)
+
+    session_id = values.get("session_id") or os.path.basename(path)[len("journal_"):-len(".jsonl")]
+    state = new_session_state(values.get("user_id", "demo-user"), session_id, window, log_dir, journal_dir="")
+    for key, value in values.items():
+        state[key] = value
+    stats = state["stats"] = SessionStats.from_messages(messages)
+    state["messages"] = messages
+    state["interventions"] = lists["intervention"]
+    if lists["roleplay"]:
+        state["roleplay_logs"] = lists["roleplay"]
+
+    journal = SessionJournal(path, executor=executor)
+    journal._counts = {"messages": len(messages), "interventions": len(lists["intervention"]),
+                       "roleplay_logs": len(lists["roleplay"])}
+    journal._values = json.loads(json.dumps(values, ensure_ascii=False))
+    state["journal"] = journal
+
+    # 다시 분류 대기열에 넣는다. 다음 checkpoint 가 확정된 감정을 저널에 남긴다.
+    # 창 밖으로 이미 옮겨진 레코드는 고칠 수 없으므로 중립 기본값으로 확정한다.
+    slots = {turn: slot for slot, turn in enumerate(stats.turn_index)}
+    resolved: List[str] = []
+    for i in unresolved:
+        if not state["messages"].in_memory(i):
+            resolved.append(json.dumps({"t": "emotion", "i": i, "e": {k: v for k, v in messages[i]["emotion"].items()
+                                                                       if k != "pending"}}, ensure_ascii=False))
+            continue
+        journal._pending.add(i)
+        msg = state["messages"][i]
+        fut = (executor or _background_executor()).submit(_finish_emotion_in_background, msg["emotion"], msg["content"],
+                                                          detect_extreme_categories(msg["content"]), stats, slots[i])
+        state.setdefault("pending_analyses", []).append(fut)
+    journal._write(resolved)
+    return state
+
+# ───────────────────────────────
+# 턴 엔진 (감정 분석 ∥ assistant 응답)
+# ───────────────────────────────
+def console_emit(kind: str, content: Any) -> None:
+    """기존 콘솔 출력 형식 그대로 출력"""
+    if kind == "C":
+        print(f"[C] {content}")
+    elif kind == "mindfulness":
+        print("\n[Mindfulness]")
+        print(content)
+    elif kind == "roleplay":
+        print("\n[Roleplay]")
+        print(content)
+    elif kind == "A":
+        print("\n[A]", content)
+    # 스트리밍 모드: *_start → token... → *_end
+    elif kind == "roleplay_start":
+        print("\n[Roleplay]")
+    elif kind == "A_start":
+        print("\n[A] ", end="", flush=True)
+    elif kind == "token":
+        print(content, end="", flush=True)
+    elif kind in ("roleplay_end", "A_end"):
+        print()
+    elif kind == "warn":
+        print("[warn] assistant reply failed:", content)
+
+class TurnEngine:
+    """한 턴을 처리한다.
+
+    AssistantAgent.reply 는 감정 분석 결과에 의존하지 않으므로, 분석 요청과
+    동시에 투기적으로 시작해 두고 [C] 출력과 개입(마인드풀니스/롤플) 출력이
+    끝난 뒤에 [A] 를 출력한다. 턴 지연은 두 호출의 합이 아니라 더 느린 쪽에
+    가까워진다. 극단 신호가 잡힌 턴은 (discard_on_extreme) 위기 상황을 모른 채
+    만들어진 응답이므로 취소하거나 버린다.
+
+    stream=True 이면 assistant 응답과 롤플 스크립트를 토큰 단위로 emit 한다.
+    분석이 끝나기 전에 도착한 응답 토큰은 버퍼에 쌓였다가 [C] 뒤에 흘러나온다.
+
+    background 는 빠른 경로 감정 분류처럼 턴이 기다리지 않는 작업을 돌릴 풀이다
+    (없으면 공용 백그라운드 풀). 서버는 세션 수에 맞춘 전용 풀을 넘긴다.
+    """
+    def __init__(self, assistant: "AssistantAgent", mindfulness: "MindfulnessAgent", roleplay: "RoleplayAgent",
+                 executor: Optional[Executor] = None, emit: Callable[[str, Any], None] = console_emit,
+                 discard_on_extreme: bool = True, stream: bool = False, memory: Optional["MemoryAgent"] = None,
+                 background: Optional[Executor] = None):
+        self.assistant = assistant
+        self.mindfulness = mindfulness
+        self.roleplay = roleplay
+        self.executor = executor    # None 이면 이벤트 루프 기본 스레드 풀
+        self.emit = emit
+        self.discard_on_extreme = discard_on_extreme
+        self.stream = stream
+        self.memory = memory        # 있으면 턴마다 observe() 로 누적 요약 갱신
+        self.background = background
+
+    async def _relay(self, kind: str, tokens: ThreadedStream) -> str:
+        self.emit(f"{kind}_start", None)
+        parts: List[str] = []
+        async for token in tokens:
+            parts.append(token)
+            self.emit("token", token)
+        text = "".join(parts).strip()
+        self.emit(f"{kind}_end", text)
+        return text
+
+    async def run_turn(self, state: Dict[str, Any], text: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        with LATENCY.time("turn.total", session=state.get("session_id")):
+            return await self._run_turn(state, text)
+
+    async def _run_turn(self, state: Dict[str, Any], text: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        state["messages"].append({"role": "user", "content": text})
+
+        # 투기적 assistant 응답 + 감정 분석을 동시에 시작
+        if self.stream:
+            reply_src: Any = ThreadedStream(lambda: self.assistant.reply_stream(text), self.executor)
+        else:
+            reply_src = loop.run_in_executor(self.executor, self.assistant.reply, text)
+        try:
+            state, result = await loop.run_in_executor(self.executor, _analyze_and_checkpoint, state, self.background)
+        except BaseException:
+            reply_src.cancel()
+            raise
+        self.emit("C", result)
+
+        route = emotion_branch(state)
+        if route == "mindfulness":
+            state = self.mindfulness.run(state)
+            self.emit("mindfulness", state["messages"][-1]["content"])
+        elif route == "roleplay" and self.stream:
+            await self._relay("roleplay", ThreadedStream(lambda: self.roleplay.run_stream(state), self.executor))
+        elif route == "roleplay":
+            state = await loop.run_in_executor(self.executor, self.roleplay.run, state)
+            self.emit("roleplay", state["messages"][-1]["content"])
+
+        if self.discard_on_extreme and result.get("extreme"):
+            # 아직 시작 전이면 취소되고, 이미 실행 중이면 결과만 버려진다
+            reply_src.cancel()
+        else:
+            try:
+                if self.stream:
+                    reply = await self._relay("A", reply_src)
+                    state["messages"].append({"role": "assistant", "content": reply})
+                else:
+                    reply = await reply_src
+                    state["messages"].append({"role": "assistant", "content": reply})
+                    self.emit("A", reply)
+            except Exception as e:
+                LATENCY.count("errors", stage="turn.assistant_reply", error=type(e).__name__)
+                self.emit("warn", e)
+
+        if self.memory is not None:
+            self.memory.observe(state)
+        if state.get("journal") is not None:
+            # 턴의 state 변경은 여기서 끝나므로 작업 스레드에서 기록해도 경합이 없다
+            await loop.run_in_executor(self.executor, journal_checkpoint, state)
+        return state, result
+
 # ───────────────────────────────
 # 실행부
 # ───────────────────────────────
 if __name__ == "__main__":
+    import asyncio
+    load_env()
     print("한국어 문장 입력. 종료: **빈 엔터(아무 입력 없이 Enter)**\n")
 
-    state: Dict[str, Any] = {
-        "user_id": "demo-user",
-        "messages": [],
-        "emotion_score": 0.0,
-        "extreme_keywords": [],
-        "trigger_roleplay": False,  # 외부에서 True 지정 시 즉시 1회 실행
-        "roleplay_topic": "",       # 있으면 해당 주제로 롤플
-        "auto_roleplay": False,     # 휴리스틱 자동 롤플 (기본 OFF 권장)
-        "session_end": False,
-        "interventions": [],
-        "report": {},
-        "mindfulness_count": 0,
-        "roleplay_count": 0,
-        "roleplay_logs": None,      # 실제 실행 전까지 None
-        "next_node": "assistant",
-    }
+    if os.getenv("METRICS_TRACE_PATH"):
+        LATENCY.open_trace(os.environ["METRICS_TRACE_PATH"])
+    if os.getenv("METRICS_PORT"):
+        serve_metrics(int(os.environ["METRICS_PORT"]))
+
+    state = new_session_state()
 
     assistant = AssistantAgent()
     mindfulness = MindfulnessAgent()
-    roleplay = RoleplayAgent()
-    memory = MemoryAgent()
+    pool = ScriptPool.from_env()     # ROLEPLAY_POOL_SIZE=0 이면 매번 즉석 생성
+    if pool.size > 0 and os.getenv("ROLEPLAY_POOL_WARM", "0") == "1":
+        pool.start()                 # 기본은 주제별 첫 롤플 때부터 채운다
+    roleplay = RoleplayAgent(pool=pool if pool.size > 0 else None, personalize=os.getenv("ROLEPLAY_PERSONALIZE", "0") == "1")
+    memory = MemoryAgent(incremental_every=int(os.getenv("SUMMARY_EVERY", "6")) or None,
+                         graph=GraphRenderer(backend=os.getenv("GRAPH_BACKEND", "svg"), out_dir=os.getenv("GRAPH_DIR", ".")))
+    engine = TurnEngine(assistant, mindfulness, roleplay, stream=os.getenv("LLM_STREAM", "1") != "0", memory=memory)
 
-    while True:
-        try:
-            text = input("\n입력 > ")
-        except EOFError:
-            break
-
-        # ✅ 빈 엔터로 종료
-        if text is None or text.strip() == "":
-            state["session_end"] = True
-            state = memory.run(state)
-            print("\n=== 세션 요약 보고서(JSON) ===")
-            print(json.dumps(state["report"], ensure_ascii=False, indent=2))
-            print("\n그래프 파일 저장: emotion_graph.png")
-            break
-
-        text = text.strip()
-
-        # 사용자 메시지 누적
-        state["messages"].append({"role": "user", "content": text})
+    async def _session(state: Dict[str, Any]) -> Dict[str, Any]:
+        while True:
+            try:
+                text = await asyncio.to_thread(input, "\n입력 > ")
+            except EOFError:
+                break
 
-        # 감정 분석 (+ 즉시 출력)
-        state, result = analyze_and_update_state(state)
-        print(f"[C] {result}")
+            # ✅ 빈 엔터로 종료
+            if text is None or text.strip() == "":
+                state["session_end"] = True
+                state = memory.run(state)
+                graph_path = wait_graph(state)
+                close_journal(state)
+                print("\n=== 세션 요약 보고서(JSON) ===")
+                print(json.dumps(state["report"], ensure_ascii=False, indent=2))
+                print("\n그래프 파일 저장:", graph_path)
+                if llm_cache().stats():
+                    print("LLM 캐시:", json.dumps(llm_cache().stats(), ensure_ascii=False))
+                break
 
-        # 분기 실행 + 실행 내용도 즉시 출력
-        route = emotion_branch(state)
-        if route == "mindfulness":
-            state = mindfulness.run(state)
-            print("\n[Mindfulness]")
-            print(state["messages"][-1]["content"])
-        elif route == "roleplay":
-            state = roleplay.run(state)
-            print("\n[Roleplay]")
-            print(state["messages"][-1]["content"])
+            # 감정 분석 ∥ assistant 응답, 출력 순서는 [C] → 개입 → [A]
+            state, _ = await engine.run_turn(state, text.strip())
+        return state
 
-        # assistant 응답 생성 (+ 즉시 출력)
-        try:
-            reply = assistant.reply(text)
-            state["messages"].append({"role": "assistant", "content": reply})
-            print("\n[A]", reply)
-        except Exception as e:
-            print("[warn] assistant reply failed:", e)
+    try:
+        state = asyncio.run(_session(state))
+    finally:
+        state.close(discard=True)     # 창 밖으로 밀려난 메시지를 담던 임시 세션 로그 삭제
+        pool.close()                  # 남은 풀 채우기 때문에 종료가 늦어지지 않게
+        LATENCY.close_trace()
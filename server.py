@@ -0,0 +1,325 @@
+"""다중 세션 비동기 상담 서버.
+
+한 프로세스가 여러 상담 세션을 동시에 호스팅한다. 세션마다 state 를 따로 두고,
+같은 세션의 턴은 순서대로, 다른 세션의 턴은 동시에 처리한다. LLM 동시 호출 수는
+ResilientBackend 의 동시성 제한으로 프로세스 전체에서 묶이고, 오래 입력이 없는
+세션은 주기적으로 정리된다. --journal-dir 를 주면 세션을 저널에 기록하고, 재시작할 때
+끝나지 않은 세션을 되살려 같은 session_id 로 이어서 받는다.
+
+    python server.py [--port 8080] [--llm-concurrency 32] [--idle-timeout 900] [--fake-latency 0.2] [--journal-dir DIR]
+
+HTTP(JSON) 엔드포인트
+    POST /sessions                 {"user_id": "..."}  → {"session_id": "..."}
+    POST /sessions/<id>/turns      {"text": "..."}     → {"analysis": {...}, "events": [...]}
+    GET  /sessions/<id>/stats                          → 진행 중 통계 (current_stats)
+    POST /sessions/<id>/end                            → 세션 보고서 (세션 종료)
+    GET  /healthz                                      → 세션 수 등 상태
+    GET  /metrics                                      → 단계별 지연·토큰·비용·카운터 (Prometheus 텍스트)
+
+본문이 --max-body 를 넘으면 413, 경로에 맞지 않는 메서드는 405, 없는 세션은 404,
+처리 중 예기치 못한 오류는 내부 정보 없이 500 으로 답한다.
+--trace FILE 을 주면 단계별 기록을 JSONL 로 남긴다.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import main
+
+_ROUTE = re.compile(r"^/sessions/([\w-]+)/(turns|stats|end)$")
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+MAX_BODY = 1 << 20     # 요청 본문 상한 (바이트). 넘으면 읽지 않고 413
+
+
+class Session:
+    __slots__ = ("id", "state", "lock", "last_active")
+
+    def __init__(self, session_id: str, state: Dict[str, Any]):
+        self.id = session_id
+        self.state = state
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+
+
+class SessionManager:
+    """세션 생성·턴 처리·종료·유휴 세션 정리"""
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = 900.0, llm_concurrency: int = 32,
+                 graph_dir: str = ".", summary_every: Optional[int] = 6, journal_dir: Optional[str] = None,
+                 roleplay_pool: Optional[main.ScriptPool] = None, background_workers: Optional[int] = None):
+        self.sessions: Dict[str, Session] = {}
+        self.journal_dir = journal_dir     # None 이면 SESSION_JOURNAL_DIR 환경변수
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        # LLM 동시 호출 수를 프로세스 백엔드에 건다 (configure_backend 가 같은 한도로 이미 감쌌으면 그대로)
+        backend = main.get_backend()
+        if not isinstance(backend, main.ResilientBackend):
+            main.set_backend(main.ResilientBackend(backend, max_concurrency=llm_concurrency))
+        elif backend.max_concurrency != llm_concurrency:
+            main.set_backend(backend.with_concurrency(llm_concurrency))
+        # 블로킹 LLM 호출이 도는 스레드. LLM 슬롯이 모두 차도 로컬 단계가 굶지 않게 여유를 둔다.
+        self.executor = ThreadPoolExecutor(max_workers=llm_concurrency * 2 + 4, thread_name_prefix="session")
+        # 턴이 기다리지 않는 작업(빠른 경로 감정 분류·누적 요약·저널 fsync) 전용. 대부분 LLM 슬롯을
+        # 기다리므로 기본 크기는 LLM 동시 호출 수에 맞추고, 공용 4-스레드 풀에 밀려 쌓이지 않게 한다.
+        self.background = ThreadPoolExecutor(max_workers=background_workers or llm_concurrency + 4,
+                                             thread_name_prefix="session-bg")
+        self.assistant = main.AssistantAgent()
+        self.mindfulness = main.MindfulnessAgent()
+        self.roleplay = main.RoleplayAgent(pool=roleplay_pool)   # 풀 채우기는 풀 자체 스레드에서
+        self.memory = main.MemoryAgent(incremental_every=summary_every, executor=self.background,
+                                       graph=main.GraphRenderer(out_dir=graph_dir, executor=self.executor))
+        self.evicted = 0
+        self.completed = 0
+
+    def create(self, user_id: str = "anonymous") -> Session:
+        if len(self.sessions) >= self.max_sessions:
+            self.evict_idle()
+            if len(self.sessions) >= self.max_sessions:
+                raise OverflowError("too many sessions")
+        session_id = uuid.uuid4().hex
+        session = Session(session_id, main.new_session_state(user_id, session_id=session_id, journal_dir=self.journal_dir,
+                                                           executor=self.background))
+        self.sessions[session.id] = session
+        return session
+
+    def restore(self) -> int:
+        """저널 디렉터리에서 끝나지 않은 세션을 되살려 이어서 받을 수 있게 한다."""
+        journal_dir = self.journal_dir if self.journal_dir is not None else os.getenv("SESSION_JOURNAL_DIR", "")
+        restored = 0
+        for path in main.unfinished_sessions(journal_dir) if journal_dir else []:
+            state = main.resume_session(path, executor=self.background)
+            if state["session_id"] not in self.sessions:
+                self.sessions[state["session_id"]] = Session(state["session_id"], state)
+                restored += 1
+        return restored
+
+    def get(self, session_id: str) -> Session:
+        session = self.sessions[session_id]
+        session.last_active = time.monotonic()
+        return session
+
+    async def turn(self, session_id: str, text: str) -> Dict[str, Any]:
+        session = self.get(session_id)
+        events: List[Dict[str, Any]] = []
+        engine = main.TurnEngine(self.assistant, self.mindfulness, self.roleplay, executor=self.executor,
+                                 emit=lambda kind, content: events.append(_event(kind, content)), memory=self.memory,
+                                 background=self.background)
+        async with session.lock:
+            t0 = time.perf_counter()
+            _, result = await engine.run_turn(session.state, text)
+            main.LATENCY.record("server.turn", time.perf_counter() - t0)
+            session.last_active = time.monotonic()
+        return {"analysis": result, "events": events}
+
+    async def end(self, session_id: str) -> Dict[str, Any]:
+        """보고서를 만들고 세션을 닫는다. 이미 끝났거나 정리된 세션이면 KeyError."""
+        session = self.get(session_id)
+        loop = asyncio.get_running_loop()
+        async with session.lock:
+            if self.sessions.get(session_id) is not session:
+                raise KeyError(session_id)     # 락을 기다리는 동안 다른 /end 나 정리가 먼저 닫았다
+            session.state["session_end"] = True
+            await loop.run_in_executor(self.executor, self.memory.run, session.state)
+            await loop.run_in_executor(self.executor, main.wait_graph, session.state)
+            await loop.run_in_executor(self.executor, main.close_journal, session.state)
+            self.sessions.pop(session_id, None)
+            session.state.close(discard=True)
+            self.completed += 1
+        return session.state["report"]
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """idle_timeout 동안 입력이 없고 처리 중이 아닌 세션을 버린다 (저널은 열린 채로 남아 복구할 수 있다)."""
+        now = time.monotonic() if now is None else now
+        stale = [sid for sid, s in self.sessions.items()
+                 if now - s.last_active > self.idle_timeout and not s.lock.locked()]
+        for sid in stale:
+            self.sessions.pop(sid).state.close(discard=True)
+        self.evicted += len(stale)
+        return len(stale)
+
+    async def run_evictor(self, interval: float = 30.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    def health(self) -> Dict[str, Any]:
+        health = {"sessions": len(self.sessions), "completed": self.completed, "evicted": self.evicted}
+        if self.roleplay.pool is not None:
+            health["roleplay_pool"] = self.roleplay.pool.stats()
+        return health
+
+
+def _event(kind: str, content: Any) -> Dict[str, Any]:
+    if isinstance(content, BaseException):
+        content = str(content)
+    return {"kind": kind, "content": content}
+
+
+class HttpApp:
+    """asyncio.start_server 용 최소 HTTP/1.1 (keep-alive, JSON 본문) 처리기"""
+
+    def __init__(self, manager: SessionManager, max_body: int = MAX_BODY):
+        self.manager = manager
+        self.max_body = max_body
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return 400, {"error": "invalid json"}
+        if path == "/healthz" and method == "GET":
+            return 200, self.manager.health()
+        if path == "/metrics" and method == "GET":
+            return 200, main.metrics_text()
+        if path == "/sessions" and method == "POST":
+            try:
+                return 200, {"session_id": self.manager.create(str(payload.get("user_id", "anonymous"))).id}
+            except OverflowError as e:
+                return 503, {"error": str(e)}
+        m = _ROUTE.match(path)
+        if m is None:
+            return 404, {"error": "not found"}
+        session_id, action = m.groups()
+        if method != ("GET" if action == "stats" else "POST"):
+            return 405, {"error": "method not allowed"}
+        if session_id not in self.manager.sessions:
+            return 404, {"error": "unknown session"}
+        if action == "stats":
+            return 200, main.current_stats(self.manager.get(session_id).state)
+        if action == "end":
+            try:
+                return 200, await self.manager.end(session_id)
+            except KeyError:
+                return 404, {"error": "unknown session"}
+        text = str(payload.get("text", "")).strip()
+        if not text:
+            return 400, {"error": "text is required"}
+        return 200, await self.manager.turn(session_id, text)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # 본문 경계를 알 수 없으므로 응답 후 커넥션을 닫는다
+                    await self._respond(writer, 400, {"error": "invalid content-length"})
+                    break
+                if length > self.max_body:
+                    await self._respond(writer, 413, {"error": "request body too large"})
+                    break
+                body = await reader.readexactly(length)
+                try:
+                    status, payload = await self.dispatch(method.upper(), target.split("?", 1)[0], body)
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+                    status, payload = 500, {"error": "internal error"}
+                await self._respond(writer, status, payload)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Any) -> None:
+        if isinstance(payload, str):
+            data, content_type = payload.encode("utf-8"), main.PROMETHEUS_CONTENT_TYPE
+        else:
+            data, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1")
+            + data
+        )
+        await writer.drain()
+
+
+async def serve(host: str, port: int, manager: SessionManager, evict_interval: float = 30.0,
+                max_body: int = MAX_BODY) -> None:
+    app = HttpApp(manager, max_body=max_body)
+    server = await asyncio.start_server(app.handle, host, port)
+    evictor = asyncio.create_task(manager.run_evictor(evict_interval))
+    print(f"listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        evictor.cancel()
+
+
+def configure_backend(llm_concurrency: int, fake_latency: Optional[float] = None) -> None:
+    """LLM 동시 호출 수를 프로세스 전체에서 llm_concurrency 로 묶는다."""
+    main.load_env()
+    if fake_latency is not None:
+        inner: main.LLMBackend = main.FakeBackend(latency=fake_latency, jitter=fake_latency / 4)
+    else:
+        inner = main.OpenAIBackend(max_connections=llm_concurrency)
+    main.set_backend(main.ResilientBackend(inner, max_concurrency=llm_concurrency))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--llm-concurrency", type=int, default=32)
+    ap.add_argument("--background-workers", type=int, default=None,
+                    help="빠른 경로 감정 분류·누적 요약·저널 fsync 스레드 수 (기본 llm-concurrency + 4)")
+    ap.add_argument("--max-sessions", type=int, default=10000)
+    ap.add_argument("--idle-timeout", type=float, default=900.0)
+    ap.add_argument("--graph-dir", default=".")
+    ap.add_argument("--journal-dir", default=None, help="세션 저널 디렉터리 (기본 SESSION_JOURNAL_DIR)")
+    ap.add_argument("--roleplay-pool", type=int, default=None,
+                    help="주제별 미리 만들 롤플 스크립트 수 (기본 ROLEPLAY_POOL_SIZE, 0 이면 끔)")
+    ap.add_argument("--roleplay-pool-warm", action="store_true",
+                    help="시작할 때 모든 주제의 롤플 풀을 미리 채운다 (기본: 주제별 첫 롤플 때부터)")
+    ap.add_argument("--max-body", type=int, default=MAX_BODY, help="요청 본문 상한 (바이트, 넘으면 413)")
+    ap.add_argument("--trace", default=None, help="단계별 기록 JSONL 경로")
+    ap.add_argument("--fake-latency", type=float, default=None, help="설정 시 FakeBackend 사용 (오프라인)")
+    args = ap.parse_args()
+
+    configure_backend(args.llm_concurrency, args.fake_latency)
+    if args.trace:
+        main.LATENCY.open_trace(args.trace)
+    pool = main.ScriptPool.from_env()
+    if args.roleplay_pool is not None:
+        pool.size = args.roleplay_pool
+    if pool.size > 0 and (args.roleplay_pool_warm or os.getenv("ROLEPLAY_POOL_WARM", "0") == "1"):
+        pool.start()
+    manager = SessionManager(max_sessions=args.max_sessions, idle_timeout=args.idle_timeout,
+                             llm_concurrency=args.llm_concurrency, graph_dir=args.graph_dir, journal_dir=args.journal_dir,
+                             roleplay_pool=pool if pool.size > 0 else None, background_workers=args.background_workers)
+    restored = manager.restore()
+    if restored:
+        print(f"restored {restored} unfinished sessions from journal")
+    try:
+        asyncio.run(serve(args.host, args.port, manager, max_body=args.max_body))
+    finally:
+        pool.close()
+        main.LATENCY.close_trace()
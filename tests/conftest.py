@@ -0,0 +1,22 @@
+"""테스트 공통 설정: 저장소 루트를 import 경로에 넣고, LLM 은 결정적 FakeBackend 로 바꾼다."""
+from __future__ import annotations
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fake_llm(monkeypatch, tmp_path):
+    """테스트마다 새 FakeBackend·빈 캐시·임시 세션 로그 디렉터리"""
+    backend = main.FakeBackend()
+    main.set_backend(backend)
+    monkeypatch.setattr(main, "_llm_cache", main.ResponseCache())
+    monkeypatch.setenv("SESSION_LOG_DIR", str(tmp_path))
+    monkeypatch.setenv("SESSION_JOURNAL_DIR", "")
+    yield backend
+    main.set_backend(None)
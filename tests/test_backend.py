@@ -0,0 +1,153 @@
+from __future__ import annotations
+from typing import Dict, List, Optional
+
+import pytest
+
+import main
+
+
+def test_backend_without_complete_fails_at_construction():
+    class Incomplete(main.LLMBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_backend_default_stream_yields_complete():
+    class Echo(main.LLMBackend):
+        def complete(self, model: str, messages: List[Dict[str, str]], temperature: float,
+                     timeout: Optional[float] = None) -> str:
+            return messages[-1]["content"]
+
+    assert list(Echo().stream("m", [{"role": "user", "content": "안녕"}], 0.0)) == ["안녕"]
+
+
+class Flaky(main.LLMBackend):
+    """앞의 fail 번은 실패하고 이후에는 성공하는 백엔드"""
+    def __init__(self, fail: int = 0, break_midway: bool = False):
+        self.fail = fail
+        self.break_midway = break_midway    # stream 이 첫 토큰 뒤에 끊긴다
+        self.calls = 0
+
+    def complete(self, model, messages, temperature, timeout=None):
+        self.calls += 1
+        if self.calls <= self.fail:
+            raise ConnectionError("down")
+        return "ok"
+
+    def stream(self, model, messages, temperature, timeout=None):
+        text = self.complete(model, messages, temperature, timeout)
+        yield text[:1]
+        if self.break_midway:
+            raise ConnectionError("cut")
+        yield text[1:]
+
+
+MSGS = [{"role": "user", "content": "안녕"}]
+
+
+def test_circuit_breaker_opens_and_half_opens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    breaker = main.CircuitBreaker(threshold=2, cooldown=10.0)
+    breaker.failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+    now[0] += 10.0
+    assert breaker.state == "half_open"
+    assert breaker.allow()              # 시험 호출 하나만
+    assert not breaker.allow()
+    breaker.failure()                   # 시험 실패 → 다시 열림
+    assert breaker.state == "open"
+    now[0] += 10.0
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_circuit_breaker_abandon_returns_trial(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    breaker = main.CircuitBreaker(threshold=1, cooldown=1.0)
+    breaker.failure()
+    now[0] = 2.0
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+def test_fair_limiter_is_fifo_and_times_out():
+    import threading
+
+    limiter = main.FairLimiter(1)
+    assert limiter.acquire()
+    assert not limiter.acquire(timeout=0.01)
+    order = []
+    started = []
+
+    def waiter(name):
+        started.append(name)
+        limiter.acquire()
+        order.append(name)
+        limiter.release()
+
+    threads = []
+    for name in ("a", "b", "c"):
+        t = threading.Thread(target=waiter, args=(name,))
+        t.start()
+        threads.append(t)
+        while len(limiter._waiters) < len(threads):     # 도착 순서를 고정
+            pass
+    limiter.release()
+    for t in threads:
+        t.join(2)
+    assert order == ["a", "b", "c"]
+    assert limiter._free == 1
+
+
+def test_rate_limiter_respects_deadline():
+    limiter = main.RateLimiter(rate=1.0)
+    assert limiter.acquire()
+    assert not limiter.acquire(deadline=main.time.monotonic() + 0.1)
+
+
+def test_resilient_retries_then_succeeds(monkeypatch):
+    monkeypatch.setattr(main.time, "sleep", lambda s: None)
+    inner = Flaky(fail=2)
+    backend = main.ResilientBackend(inner, retries=2, backoff=0.0)
+    assert backend.complete("m", MSGS, 0.0) == "ok"
+    stats = backend.stats()
+    assert stats["attempts"] == 3 and stats["failures"] == 2 and stats["breaker"] == "closed"
+
+
+def test_resilient_exhausts_and_opens_circuit(monkeypatch):
+    monkeypatch.setattr(main.time, "sleep", lambda s: None)
+    inner = Flaky(fail=100)
+    backend = main.ResilientBackend(inner, retries=1, backoff=0.0, breaker=main.CircuitBreaker(threshold=2, cooldown=60))
+    with pytest.raises(main.LLMUnavailable):
+        backend.complete("m", MSGS, 0.0)
+    calls = inner.calls
+    with pytest.raises(main.LLMUnavailable, match="circuit open"):
+        backend.complete("m", MSGS, 0.0)
+    assert inner.calls == calls                 # 서킷이 열리면 백엔드를 부르지 않는다
+    assert backend.stats()["short_circuits"] == 1
+
+
+def test_resilient_stream_retries_only_before_first_token(monkeypatch):
+    monkeypatch.setattr(main.time, "sleep", lambda s: None)
+    backend = main.ResilientBackend(Flaky(fail=1), retries=2, backoff=0.0)
+    assert "".join(backend.stream("m", MSGS, 0.0)) == "ok"
+
+    inner = Flaky(break_midway=True)
+    backend = main.ResilientBackend(inner, retries=2, backoff=0.0)
+    with pytest.raises(main.LLMUnavailable, match="interrupted"):
+        list(backend.stream("m", MSGS, 0.0))
+    assert inner.calls == 1
+
+
+def test_chat_completion_falls_back_through_validate(fake_llm):
+    fake_llm.responder = lambda messages: "not json"
+    data = main._request_emotion_llm("점심은 김밥 먹었어요")
+    assert data == main.NEUTRAL_EMOTION
@@ -0,0 +1,38 @@
+from __future__ import annotations
+import json
+
+import pytest
+
+import batch
+
+
+def detect(*items) -> list:
+    lines = [item if isinstance(item, bytes) else json.dumps(item, ensure_ascii=False).encode() for item in items]
+    return batch.detect_chunk(1, lines)
+
+
+def test_utterances_and_sessions_are_analyzed():
+    text, session, plain = detect({"id": "a", "text": "죽고 싶다"},
+                                  {"messages": [{"role": "user", "content": "죽고 싶다"},
+                                                {"role": "assistant", "content": "괜찮으세요?"},
+                                                {"role": "user", "content": "그냥 그래요"}]},
+                                  "오늘은 괜찮아요")
+    assert text["id"] == "a" and text["extreme"]
+    assert [t["index"] for t in session["turns"]] == [0, 2] and session["extreme_turns"] == 1
+    assert plain["_text"] == "오늘은 괜찮아요" and not plain["extreme"]
+
+
+@pytest.mark.parametrize("item, error", [
+    (b"{not json", "invalid json"),
+    ({"id": 1}, "expected text or messages"),
+    ({"text": None}, "text must be a string"),
+    ({"text": 3}, "text must be a string"),
+    ({"messages": None}, "messages must be a list"),
+    ({"messages": "hi"}, "messages must be a list"),
+    ({"messages": ["hi"]}, "each message must be an object with string content"),
+    ({"messages": [{"role": "user", "content": None}]}, "each message must be an object with string content"),
+])
+def test_malformed_records_become_error_lines(item, error):
+    bad, good = detect(item, {"text": "그냥 그래요"})
+    assert bad == {"line": 1, "error": error}
+    assert good["line"] == 2 and "extreme" in good     # 나머지 코퍼스는 계속 처리된다
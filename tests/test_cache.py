@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import main
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = main.ResponseCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"        # a 를 최근으로
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    stats = cache.stats()["default"]
+    assert stats["memory_hits"] == 3 and stats["misses"] == 1 and stats["hit_rate"] == 0.75
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    main.ResponseCache(path=path).put("k", "v", site="emotion")
+    again = main.ResponseCache(path=path)
+    assert again.get("k", site="emotion") == "v"
+    assert again.get("k", site="emotion") == "v"
+    assert again.stats()["emotion"]["disk_hits"] == 1 and again.stats()["emotion"]["memory_hits"] == 1
+
+
+def test_sqlite_ttl_expires(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.db")
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "time", lambda: now[0])
+    main.ResponseCache(path=path, ttl=10).put("k", "v")
+    now[0] += 11
+    assert main.ResponseCache(path=path, ttl=10).get("k") is None
+
+
+def test_sqlite_max_rows_evicts_oldest_used(tmp_path):
+    cache = main.ResponseCache(max_entries=1, path=str(tmp_path / "cache.db"), max_rows=10)
+    for i in range(64):                 # 64 번째 put 에서 정리
+        cache.put(f"k{i}", str(i))
+    (rows,) = cache._conn().execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+    assert rows == 10
+    assert cache.get("k63") == "63" and cache.get("k0") is None
+
+
+def test_chat_completion_uses_cache_policy(fake_llm):
+    messages = [{"role": "user", "content": "안녕"}]
+    first = main.chat_completion("emotion", messages, 0.3)
+    assert main.chat_completion("emotion", messages, 0.3) == first
+    assert fake_llm.calls == 1
+    main.chat_completion("assistant", messages, 0.7)
+    main.chat_completion("assistant", messages, 0.7)
+    assert fake_llm.calls == 3          # 창의적 응답은 기본적으로 캐시하지 않는다
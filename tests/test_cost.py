@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def unpriced(monkeypatch):
+    """가격표에 없는 모델. LLM_PRICE 를 처음부터 다시 읽게 한다."""
+    monkeypatch.setattr(main, "_model_prices", {})
+    monkeypatch.setattr(main, "_price_override", None)
+    monkeypatch.setattr(main, "LATENCY", main.LatencyRecorder())
+    return "local-model"
+
+
+@pytest.mark.parametrize("value", ["0.5", "abc", "1,2,3", "-1,2", "nan,1"])
+def test_malformed_price_falls_back_to_zero(unpriced, monkeypatch, capsys, value):
+    monkeypatch.setenv("LLM_PRICE", value)
+    assert main.llm_cost(unpriced, 1000, 1000) == 0.0
+    assert main.llm_cost(unpriced + "-2", 1000, 1000) == 0.0
+    assert capsys.readouterr().err.count("[warn] LLM_PRICE") == 1     # 한 번만 경고
+
+
+def test_price_override_applies_to_unknown_models(unpriced, monkeypatch):
+    monkeypatch.setenv("LLM_PRICE", "1, 2")
+    assert main.llm_cost(unpriced, 1_000_000, 500_000) == pytest.approx(2.0)
+    assert main.llm_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+
+
+def test_bad_price_does_not_break_llm_calls(unpriced, monkeypatch, fake_llm):
+    monkeypatch.setenv("LLM_PRICE", "0.5")
+    monkeypatch.setenv("LLM_MODEL", unpriced)
+    fake_llm.responder = lambda messages: '{"emotion_class": "슬픔", "emotion_score": 0.4, "extreme": false}'
+    data = main._request_emotion_llm("점심은 김밥 먹었어요")
+    assert data["emotion_class"] == "슬픔"
+    assert main.AssistantAgent().reply("안녕하세요")
+    assert not any(name == "fallbacks" for name, _ in main.LATENCY._counters)
+
+
+def test_usage_recording_errors_are_only_logged(monkeypatch, fake_llm, capsys):
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main.LATENCY, "llm_usage", broken)
+    assert main.chat_completion("assistant", [{"role": "user", "content": "안녕하세요"}], 0.7, cache=False)
+    assert "[warn] assistant" in capsys.readouterr().err
+    assert main.LATENCY._counters[("usage_errors", (("error", "RuntimeError"), ("site", "assistant")))] == 1
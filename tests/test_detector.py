@@ -0,0 +1,97 @@
+from __future__ import annotations
+import random
+import re
+from typing import Dict, List
+
+import pytest
+
+import main
+
+CORPUS = [
+    "오늘 점심 뭐 먹을지 고민이에요", "죽고 싶다", "정말 죽고싶어요 아무도 날 이해 못해",
+    "차라리 죽는 게 좋겠다는 생각이 들어요", "사라지고 싶어. 사라졌으면 좋겠어요", "다 끝내고 싶다 진짜",
+    "자살 생각이 자꾸 나요. 자살 충동이 심해요", "자살하고 싶다", "목숨을 끊고 싶다는 생각을 했어요",
+    "옥상에서 뛰어내리면 어떨까 생각했어", "사는 게 의미가 없어", "희망이 없어요. 가망이 없다",
+    "내가 없어지는 게 낫겠어", "살아가기 싫어", "나는 쓸모없어. 난 병신이야", "난 가치 없다",
+    "나 같은 건 없어져야 해", "그 사람은 쓰레기야. 너는 멍청이", "어제 자해했어요. 손목 긋고 피 흘리고",
+    "자살예방센터에 전화해봤어요", "JASAL 자살", "죽어야 편해질 것 같다", "배고파 죽겠어요",
+]
+
+
+def reference_detect(text: str) -> Dict[str, List[str]]:
+    """프리필터 없이 모든 규칙을 그대로 스캔 (도입 전 구현)"""
+    out: Dict[str, List[str]] = {}
+    for key, patterns in main.DETECT_CATEGORIES:
+        for p in patterns:
+            for m in re.compile(p, re.IGNORECASE).finditer(text):
+                snippet = main._normalize_snippet(m.group(0))
+                bucket = out.setdefault(key, [])
+                if snippet not in bucket:
+                    bucket.append(snippet)
+    return {k: out[k] for k in main.CATEGORY_ORDER if out.get(k)}
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_detector_matches_full_scan(text):
+    assert main.ExtremeDetector(prefilter=False).detect(text) == reference_detect(text)
+    assert main.detect_extreme_categories(text) == reference_detect(text)
+
+
+def test_detector_compiles_once():
+    detector = main.extreme_detector()
+    assert main.extreme_detector() is detector
+    assert all(isinstance(rx, re.Pattern) for _, rx in detector.rules)
+    assert detector.first_hit("점심 먹었어요") is None
+    assert detector.first_hit("정말 죽고 싶다")[1] in main.CATEGORY_ORDER
+
+
+def fuzz_texts(seed: int = 3, n: int = 400) -> List[str]:
+    """말뭉치 조각과 패턴 속 글자를 섞은 변형 문장"""
+    rng = random.Random(seed)
+    pieces = [w for text in CORPUS for w in text.split()]
+    alphabet = sorted({ch for _, ps in main.DETECT_CATEGORIES for p in ps for ch in p if "가" <= ch <= "힣"}) + [" "]
+    out = []
+    for _ in range(n):
+        words = rng.sample(pieces, rng.randint(1, 4))
+        text = " ".join(words)
+        if rng.random() < 0.3:
+            text = text.replace(" ", "")
+        if rng.random() < 0.3:
+            text += "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 8)))
+        out.append(text)
+    return out
+
+
+def test_prefilter_sound_on_fuzzed_texts():
+    fast = main.ExtremeDetector()
+    full = main.ExtremeDetector(prefilter=False)
+    for text in fuzz_texts():
+        assert fast.detect(text) == full.detect(text) == reference_detect(text), text
+
+
+def test_every_match_contains_an_anchor():
+    detector = main.ExtremeDetector()
+    for text in CORPUS + fuzz_texts(seed=11):
+        for key, rx in detector.rules:
+            anchors = main.pattern_anchors(rx)
+            if anchors and rx.search(text):
+                assert any(a in text for a in anchors), (key, rx.pattern, text)
+
+
+@pytest.mark.parametrize("pattern, text", [
+    (r"ab|cd", "xxcdxx"),
+    (r"(우울|슬프)(해|다)", "너무 슬프다"),
+    (r"(?:정말\s*)?싫[다어]", "싫어"),
+    (r"[가나]다라", "나다라"),
+    (r"x{0,2}y", "y"),
+])
+def test_prefilter_never_drops_a_matching_rule(pattern, text):
+    rules = [("k", re.compile(pattern))]
+    assert rules[0][1].search(text)
+    assert main.LiteralPrefilter.from_rules(rules).candidates(text) == [0]
+
+
+def test_prefilter_reports_overlapping_anchors():
+    pf = main.LiteralPrefilter({"he": {0}, "she": {1}, "hers": {2}, "x": {3}}, {9})
+    assert pf.candidates("ushers") == [0, 1, 2, 9]
+    assert pf.anchors_in("ushers") == {"he", "she", "hers"}
@@ -0,0 +1,80 @@
+from __future__ import annotations
+import json
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def fresh_scorer(monkeypatch, tmp_path):
+    """작업 디렉터리의 emotion_lexicon.json / 보정표를 새로 읽도록 캐시된 scorer 를 비운다"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "_lexicon_scorer", None)
+    monkeypatch.delenv("EMOTION_CALIBRATION", raising=False)
+    return tmp_path
+
+
+def test_unknown_lexicon_class_is_skipped(fresh_scorer, capsys):
+    (fresh_scorer / "emotion_lexicon.json").write_text(
+        json.dumps({"설렘": {"두근": 1.0}, "기쁨": {"신바람": 1.0, "이상함": "많이"}}, ensure_ascii=False), encoding="utf-8")
+    extra = main.load_extra_lexicon()
+    assert extra == {"기쁨": {"신바람": 1.0}}
+    assert "설렘" in capsys.readouterr().err
+
+    state = main.new_session_state(journal_dir="")
+    state["messages"].append({"role": "user", "content": "신바람 나요"})
+    _, result = main.analyze_and_update_state(state)      # 예전에는 ValueError 로 매 턴 실패
+    assert result["emotion_class"] == "기쁨"
+    state.close(discard=True)
+
+
+def test_unreadable_lexicon_is_ignored(fresh_scorer, capsys):
+    (fresh_scorer / "emotion_lexicon.json").write_text("{not json", encoding="utf-8")
+    assert main.load_extra_lexicon() == {}
+    assert "[warn]" in capsys.readouterr().err
+
+
+def test_uncalibrated_local_tier_keeps_gpt_score(fresh_scorer, fake_llm, monkeypatch):
+    fake_llm.responder = lambda messages: '{"emotion_class": "분노", "emotion_score": 0.3, "extreme": false}'
+    monkeypatch.setattr(main, "_lexicon_scorer", main.LexiconScorer())      # 보정표 없음
+    local = main.lexicon_scorer().score("너무 우울하고 눈물이 나요")
+    assert local["emotion_class"] == "슬픔" and local["emotion_score"] is None
+    data = main._request_emotion("너무 우울하고 눈물이 나요", threshold=0.6)
+    assert data["source"] == "llm"
+    assert data["emotion_class"] == "분노" and data["emotion_score"] == 0.3   # 사전 클래스를 GPT 점수에 붙이지 않는다
+    assert fake_llm.calls == 1
+
+
+def test_default_calibration_skips_gpt_for_confident_turns(fresh_scorer, fake_llm):
+    assert main.lexicon_scorer().calibration is main.DEFAULT_EMOTION_CALIBRATION
+    data = main._request_emotion("너무 우울하고 눈물이 나요", threshold=0.6)
+    assert data["source"] == "local"
+    assert data["emotion_class"] == "슬픔" and data["emotion_score"] == 0.85
+    assert fake_llm.calls == 0
+
+
+def test_calibrated_local_tier_skips_gpt(fresh_scorer, fake_llm, monkeypatch):
+    scorer = main.lexicon_scorer()
+    texts = ["너무 우울하고 눈물이 나요", "정말 화가 나요", "걱정돼요", "그냥 그래요"] * 5
+    results = scorer.score_many(texts)
+    table = main.fit_emotion_calibration(results, [0.1 if r["emotion_class"] == "중립" else 0.8 for r in results])
+    (fresh_scorer / "cal.json").write_text(json.dumps(table), encoding="utf-8")
+    monkeypatch.setenv("EMOTION_CALIBRATION", str(fresh_scorer / "cal.json"))
+    monkeypatch.setattr(main, "_lexicon_scorer", None)
+
+    data = main._request_emotion("너무 우울하고 눈물이 나요", threshold=0.6)
+    assert data["source"] == "local" and data["emotion_score"] == 0.8
+    assert fake_llm.calls == 0
+
+
+def test_fit_calibration_needs_enough_samples():
+    results = [{"emotion_class": "슬픔", "evidence": 1.2}] * 4 + [{"emotion_class": "중립", "evidence": 0.8}] * 5
+    table = main.fit_emotion_calibration(results, [0.4, 0.6, 0.5, 0.5] + [0.1] * 5)
+    assert table["emotional"] == [None] * 6               # 표본 4 < 5
+    assert table["neutral"][1] == 0.1 and table["neutral_n"][1] == 5
+
+
+def test_low_confidence_goes_to_gpt(fresh_scorer, fake_llm):
+    data = main._request_emotion("점심은 김밥 먹었어요", threshold=0.6)
+    assert data["source"] == "llm" and fake_llm.calls == 1
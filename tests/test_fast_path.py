@@ -0,0 +1,48 @@
+from __future__ import annotations
+import time
+from typing import Any, Dict
+
+import main
+
+
+def _state(text: str) -> Dict[str, Any]:
+    state = main.new_session_state(journal_dir="")
+    state["messages"].append({"role": "user", "content": text})
+    return state
+
+
+def test_crisis_routes_without_waiting_for_llm(fake_llm):
+    fake_llm.latency = 0.5
+    state = _state("정말 죽고 싶다")
+    t0 = time.perf_counter()
+    state, result = main.analyze_and_update_state(state)
+    assert time.perf_counter() - t0 < 0.2
+    assert result["extreme"] and result["emotion_pending"]
+    assert state["next_node"] == "mindfulness"
+    assert state["messages"][-1]["emotion"]["pending"] is True
+
+    main.wait_pending_analyses(state)
+    emotion = state["messages"][-1]["emotion"]
+    assert "pending" not in emotion
+    assert state["stats"].scores.tolist() == [emotion["score"]]
+    state.close(discard=True)
+
+
+def test_fast_path_routing_matches_slow_path(fake_llm):
+    for text in ["죽고 싶다", "자살하고 싶다", "희망이 없어요", "점심은 김밥 먹었어요"]:
+        fast, fast_result = main.analyze_and_update_state(_state(text))
+        slow, slow_result = main.analyze_and_update_state(_state(text), fast_path=False)
+        main.wait_pending_analyses(fast)
+        assert fast["next_node"] == slow["next_node"], text
+        assert fast_result["extreme"] == slow_result["extreme"]
+        assert fast["messages"][-1]["emotion"].to_dict() == slow["messages"][-1]["emotion"].to_dict()
+        fast.close(discard=True)
+        slow.close(discard=True)
+
+
+def test_non_crisis_waits_for_classification(fake_llm):
+    fake_llm.responder = lambda messages: '{"emotion_class": "불안", "emotion_score": 0.4, "extreme": false}'
+    state, result = main.analyze_and_update_state(_state("점심은 김밥 먹었어요"))
+    assert "emotion_pending" not in result
+    assert result["emotion_class"] == "불안" and "pending_analyses" not in state
+    state.close(discard=True)
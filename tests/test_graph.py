@@ -0,0 +1,45 @@
+from __future__ import annotations
+import os
+from typing import Any, Dict
+
+import pytest
+
+import main
+
+
+def finished_session(session_id: str) -> Dict[str, Any]:
+    state = main.new_session_state(session_id=session_id, journal_dir="")
+    for text in ("오늘은 좀 우울했어요", "그래도 산책을 했어요"):
+        state["messages"].append({"role": "user", "content": text})
+        main.analyze_and_update_state(state)
+        state["messages"].append({"role": "assistant", "content": "네."})
+    state["session_end"] = True
+    return state
+
+
+@pytest.mark.parametrize("mode", ["sync", "background", "deferred"])
+def test_sessions_get_their_own_graph_file(tmp_path, mode):
+    memory = main.MemoryAgent(cache=False, graph=main.GraphRenderer(out_dir=str(tmp_path), mode=mode))
+    paths = []
+    for session_id in ("alpha", "beta"):
+        state = memory.run(finished_session(session_id))
+        path = main.render_deferred(state) if mode == "deferred" else main.wait_graph(state)
+        assert path == str(tmp_path / f"emotion_graph_{session_id}.svg")
+        assert state["report"]["emotion_summary"]["graph_path"] == path
+        assert os.path.getsize(path) > 0
+        paths.append(path)
+    assert len(set(paths)) == 2
+
+
+def test_graph_path_is_filled_only_after_render(tmp_path):
+    memory = main.MemoryAgent(cache=False, graph=main.GraphRenderer(out_dir=str(tmp_path), mode="deferred"))
+    state = memory.run(finished_session("gamma"))
+    assert state["report"]["emotion_summary"]["graph_path"] is None
+    assert not list(tmp_path.glob("emotion_graph_*"))
+    path = main.render_deferred(state)
+    assert state["report"]["emotion_summary"]["graph_path"] == path
+
+
+def test_unknown_graph_backend_is_rejected():
+    with pytest.raises(ValueError):
+        main.GraphRenderer(backend="gif")
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import asyncio
+import threading
+from concurrent.futures import Executor, Future
+
+import main
+
+
+def _engine(**kwargs) -> main.TurnEngine:
+    return main.TurnEngine(main.AssistantAgent(), main.MindfulnessAgent(), main.RoleplayAgent(),
+                           emit=lambda kind, content: None, **kwargs)
+
+
+def test_turn_checkpoints_off_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+    original = main.SessionJournal.checkpoint
+
+    def checkpoint(self, state):
+        threads.append(threading.current_thread())
+        return original(self, state)
+
+    monkeypatch.setattr(main.SessionJournal, "checkpoint", checkpoint)
+    state = main.new_session_state(session_id="s1", journal_dir=str(tmp_path))
+    threads.clear()
+
+    async def scenario():
+        await _engine().run_turn(state, "오늘 회사에서 좀 지쳤어요")
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(scenario())
+    assert len(threads) == 2
+    assert loop_thread not in threads
+    state.close(discard=True)
+
+
+def test_resume_rebuilds_state(tmp_path):
+    state = main.new_session_state(session_id="s1", window=3, journal_dir=str(tmp_path))
+    engine = _engine(memory=main.MemoryAgent(incremental_every=2, graph=main.GraphRenderer(out_dir=str(tmp_path))))
+
+    async def scenario():
+        for text in ["오늘 회사에서 좀 지쳤어요", "죽고 싶다", "면접 연습 하고 싶어요", "그냥 그래요"]:
+            await engine.run_turn(state, text)
+
+    asyncio.run(scenario())
+    main.wait_pending_analyses(state)
+    main.journal_checkpoint(state)
+    path = str(tmp_path / "journal_s1.jsonl")
+    assert main.unfinished_sessions(str(tmp_path)) == [path]
+
+    resumed = main.resume_session(path, window=3)
+    assert [m.to_dict() for m in resumed["messages"]] == [m.to_dict() for m in state["messages"]]
+    assert list(resumed["interventions"]) == list(state["interventions"])
+    assert resumed["stats"].scores.tolist() == state["stats"].scores.tolist()
+    for key in ("mindfulness_count", "roleplay_count", "emotion_score", "next_node"):
+        assert resumed[key] == state[key]
+
+    main.close_journal(resumed)
+    assert main.journal_ended(path)
+    assert main.unfinished_sessions(str(tmp_path)) == []
+    resumed.close(discard=True)
+    state.close(discard=True)
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    journal = main.SessionJournal(str(tmp_path / "journal_x.jsonl"))
+    state = main.new_session_state(session_id="x", journal_dir="")
+    state["messages"].append({"role": "user", "content": "안녕하세요"})
+    journal.checkpoint(state)
+    with open(journal.path, "ab") as f:
+        f.write(b'{"t": "msg", "i": 1, "m": {"ro')
+    events = list(main.read_journal(journal.path))
+    assert [e["t"] for e in events if e["t"] == "msg"] == ["msg"]
+    resumed = main.resume_session(journal.path)
+    assert [m["content"] for m in resumed["messages"]] == ["안녕하세요"]
+    resumed.close(discard=True)
+    state.close(discard=True)
+
+
+def test_checkpoint_records_only_changes(tmp_path):
+    journal = main.SessionJournal(str(tmp_path / "journal_y.jsonl"))
+    state = main.new_session_state(session_id="y", journal_dir="")
+    assert journal.checkpoint(state) > 0
+    assert journal.checkpoint(state) == 0
+    state["mindfulness_count"] = 1
+    assert journal.checkpoint(state) == 1
+    journal.close(state)
+    assert journal.checkpoint(state) == 0
+    state.close(discard=True)
+
+
+class _Stalled(Executor):
+    """제출된 작업을 돌리지 않는 풀 (백그라운드 분류 도중 프로세스가 죽은 상황)"""
+    def submit(self, fn, *args, **kwargs):
+        return Future()
+
+
+def _crash_with_pending_emotion(tmp_path, texts, window=None):
+    state = main.new_session_state(session_id="p", window=window, journal_dir=str(tmp_path))
+    for text in texts:
+        state["messages"].append({"role": "user", "content": text})
+        main.analyze_and_update_state(state, executor=_Stalled())
+        state["messages"].append({"role": "assistant", "content": "네."})
+    main.journal_checkpoint(state)
+    state.pop("pending_analyses")
+    state.close(discard=True)
+    return str(tmp_path / "journal_p.jsonl")
+
+
+def test_resume_reclassifies_pending_emotions(tmp_path, fake_llm):
+    path = _crash_with_pending_emotion(tmp_path, ["오늘 회사에서 좀 지쳤어요", "죽고 싶다"])
+    fake_llm.responder = lambda messages: '{"emotion_class": "슬픔", "emotion_score": 0.9, "extreme": false}'
+    resumed = main.resume_session(path)
+    assert len(resumed["pending_analyses"]) == 1
+    main.wait_pending_analyses(resumed)
+    emotion = resumed["messages"][2]["emotion"]
+    assert (emotion["class"], emotion["score"], emotion.get("pending")) == ("슬픔", 0.9, None)
+    assert resumed["stats"].scores[1] == 0.9 and list(resumed["stats"].high) == [1]
+
+    main.journal_checkpoint(resumed)
+    assert not resumed["journal"]._pending
+    resumed.close(discard=True)
+    again = main.resume_session(path)
+    assert "pending_analyses" not in again
+    assert again["messages"][2]["emotion"]["score"] == 0.9
+    again.close(discard=True)
+
+
+def test_resume_keeps_pending_messages_in_window(tmp_path, fake_llm):
+    path = _crash_with_pending_emotion(tmp_path, ["죽고 싶다", "그냥 그래요", "오늘은 좀 나아요"], window=2)
+    resumed = main.resume_session(path, window=2)
+    assert resumed["messages"].in_memory(0)     # 분류 결과를 붙일 수 있게 창 밖으로 옮기지 않는다
+    main.wait_pending_analyses(resumed)
+    assert not resumed["messages"][0]["emotion"].get("pending")
+    main.journal_checkpoint(resumed)
+    assert not resumed["journal"]._pending
+    resumed.close(discard=True)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import main
+
+
+def _pool(generated: List[str], **kwargs) -> main.ScriptPool:
+    def generate(topic: str) -> str:
+        generated.append(topic)
+        return f"{topic} 스크립트 {len(generated)}"
+
+    return main.ScriptPool(topics=("면접", "갈등"), size=2, generate=generate, **kwargs)
+
+
+def test_pool_is_lazy_per_topic():
+    generated: List[str] = []
+    executor = ThreadPoolExecutor(1)
+    pool = _pool(generated, executor=executor)
+    assert generated == []                     # 만들기만 해서는 LLM 을 부르지 않는다
+    assert pool.take("면접") is None            # 첫 롤플은 즉석 생성, 그 주제만 채우기 시작
+    executor.shutdown(wait=True)
+    assert generated == ["면접", "면접"]
+    assert pool.stats()["sizes"] == {"면접": 2, "갈등": 0}
+
+
+def test_take_serves_newest_and_refills():
+    generated: List[str] = []
+    executor = ThreadPoolExecutor(1)
+    pool = _pool(generated, executor=executor)
+    for f in pool.start():
+        f.result()
+    assert pool.take("면접") == "면접 스크립트 2"
+    assert pool.take("토론") is None            # 풀 대상이 아닌 주제
+    executor.shutdown(wait=True)
+    stats = pool.stats()
+    assert stats["hits"] == 1 and stats["generated"] == 5
+    assert stats["sizes"]["면접"] == 2
+
+
+def test_refill_failure_is_counted():
+    def generate(topic: str) -> str:
+        raise ConnectionError("down")
+
+    pool = main.ScriptPool(topics=("면접",), size=1, generate=generate)
+    for f in pool.refill("면접"):
+        f.result()
+    assert pool.stats()["refill_failures"] == 1
+    assert not pool._refilling
+
+
+def test_pool_persists_and_expires(tmp_path):
+    path = str(tmp_path / "pool.json")
+    generated: List[str] = []
+    pool = _pool(generated, path=path)
+    for f in pool.start():
+        f.result()
+    reloaded = _pool(generated, path=path)
+    assert reloaded.stats()["sizes"] == {"면접": 2, "갈등": 2}
+    expired = _pool(generated, path=path, max_age=-1)
+    assert expired.take("면접") is None and expired.stats()["expired"] >= 2
+
+
+def test_roleplay_agent_uses_pool_unless_personalized():
+    generated: List[str] = []
+    pool = _pool(generated)
+    for f in pool.start():
+        f.result()
+    state = {"messages": [{"role": "user", "content": "면접 연습 하고 싶어요"}], "roleplay_topic": "면접"}
+    main.RoleplayAgent(pool=pool).run(state)
+    assert state["messages"][-1]["content"].startswith("면접 스크립트")
+    state = {"messages": [{"role": "user", "content": "면접 연습 하고 싶어요"}], "roleplay_topic": "면접"}
+    main.RoleplayAgent(pool=pool, personalize=True).run(state)
+    assert not state["messages"][-1]["content"].startswith("면접 스크립트")
+
+
+def test_concurrent_refills_create_one_executor_and_no_extra_scripts():
+    generated: List[str] = []
+    gate = threading.Event()
+
+    def generate(topic: str) -> str:
+        gate.wait(5)
+        generated.append(topic)
+        return f"{topic} {len(generated)}"
+
+    pool = main.ScriptPool(topics=("면접",), size=3, generate=generate)
+    created = []
+    real = ThreadPoolExecutor
+
+    class Counting(real):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            super().__init__(*args, **kwargs)
+
+    import concurrent.futures
+    concurrent.futures.ThreadPoolExecutor = Counting
+    try:
+        threads = [threading.Thread(target=pool.refill, args=("면접",)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        concurrent.futures.ThreadPoolExecutor = real
+    futures = list(pool._futures)
+    gate.set()
+    for f in futures:
+        f.result()
+    assert len(created) == 1
+    assert len(futures) == 3 and len(generated) == 3     # 작업 하나에 스크립트 하나, 모자란 만큼만
+    pool.close()
+
+
+EXIT_SCRIPT = """
+import sys, time
+sys.path.insert(0, %r)
+import main
+pool = main.ScriptPool(topics=("면접",), size=4, generate=lambda topic: time.sleep(0.5) or "스크립트")
+pool.take("면접")
+time.sleep(0.1)          # 첫 생성이 시작된 뒤
+pool.close()
+print("closed", flush=True)
+"""
+
+
+def test_close_does_not_block_interpreter_exit():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen([sys.executable, "-c", EXIT_SCRIPT % root], stdout=subprocess.PIPE, text=True)
+    assert proc.stdout.readline().strip() == "closed"
+    t0 = time.perf_counter()
+    proc.wait(timeout=10)
+    # 진행 중인 생성 하나(0.5s)만 기다린다. 예전에는 남은 4개를 모두 (≈2s)
+    assert time.perf_counter() - t0 < 1.0
+
+
+def test_closed_pool_does_not_refill():
+    generated: List[str] = []
+    pool = _pool(generated)
+    pool.close()
+    assert pool.take("면접") is None and pool.refill("갈등") == []
+    assert generated == []
@@ -0,0 +1,86 @@
+from __future__ import annotations
+import json
+import re
+from typing import Any, Dict, List
+
+import pytest
+
+import main
+
+TEXTS = [f"{i}번째 이야기를 해볼게요" for i in range(9)]
+
+
+def summarizer(messages: List[Dict[str, str]]) -> str:
+    """요약 = 이전 요약의 주제 + 델타의 사용자 발화. 한 번에 요약하든 나눠서 하든 결과가 같다."""
+    system, prompt = messages[0]["content"], messages[-1]["content"]
+    if "감정 분석" in system:
+        return '{"emotion_class": "중립", "emotion_score": 0.1, "extreme": false}'
+    if "보고서" not in system:
+        return "네."
+    topics: List[str] = []
+    previous = re.search(r"지금까지의 요약:\n(\{.*\})", prompt)
+    if previous:
+        topics = json.loads(previous.group(1))["topic_summary"].split("|")
+    topics += re.findall(r"^user: (.*)$", prompt, re.M)
+    return json.dumps({"topic_summary": "|".join(topics), "emotional_flow": "", "intervention_points": [],
+                       "repeated_patterns": "", "session_end_reason": ""}, ensure_ascii=False)
+
+
+def run_session(memory: main.MemoryAgent) -> Dict[str, Any]:
+    state = main.new_session_state(journal_dir="")
+    for text in TEXTS:
+        state["messages"].append({"role": "user", "content": text})
+        main.analyze_and_update_state(state)
+        state["messages"].append({"role": "assistant", "content": "네."})
+        memory.observe(state)
+    state["session_end"] = True
+    return memory.run(state)
+
+
+def comparable(report: Dict[str, Any]) -> Dict[str, Any]:
+    report = json.loads(json.dumps(report, ensure_ascii=False))
+    report["session_overview"].pop("datetime")
+    return report
+
+
+@pytest.fixture
+def summarizing_llm(fake_llm):
+    fake_llm.responder = summarizer
+    return fake_llm
+
+
+def test_rolling_report_matches_full_report(summarizing_llm, tmp_path):
+    graph = main.GraphRenderer(out_dir=str(tmp_path), mode="deferred")
+    full = run_session(main.MemoryAgent(cache=False, graph=graph))
+    rolling = run_session(main.MemoryAgent(cache=False, graph=graph, incremental_every=2))
+    assert rolling["rolling_summary"]["upto"] > 0          # 실제로 누적 요약을 거쳤다
+    assert comparable(rolling["report"]) == comparable(full["report"])
+    assert full["report"]["counseling_summary"]["topic_summary"] == "|".join(TEXTS)
+
+
+def test_report_waits_for_inflight_rolling_update(summarizing_llm, tmp_path):
+    summarizing_llm.latency = 0.05
+    memory = main.MemoryAgent(cache=False, incremental_every=1,
+                              graph=main.GraphRenderer(out_dir=str(tmp_path), mode="deferred"))
+    state = main.new_session_state(journal_dir="")
+    state["messages"].append({"role": "user", "content": TEXTS[0]})
+    main.analyze_and_update_state(state)
+    memory.observe(state)
+    assert not state["summary_pending"].done()
+    state = memory.run(state)
+    assert "summary_pending" not in state
+    assert state["rolling_summary"]["upto"] == 1
+    assert state["report"]["counseling_summary"]["topic_summary"] == TEXTS[0]
+
+
+def test_failed_rolling_update_keeps_previous_summary(summarizing_llm, tmp_path):
+    memory = main.MemoryAgent(cache=False, incremental_every=1,
+                              graph=main.GraphRenderer(out_dir=str(tmp_path), mode="deferred"))
+    state = main.new_session_state(journal_dir="")
+    state["rolling_summary"] = {"summary": {"topic_summary": "이전"}, "upto": 0}
+    summarizing_llm.responder = lambda messages: "JSON 아님" if "보고서" in messages[0]["content"] else summarizer(messages)
+    state["messages"].append({"role": "user", "content": TEXTS[0]})
+    main.analyze_and_update_state(state)
+    memory.observe(state)
+    state["summary_pending"].result()
+    assert state["rolling_summary"] == {"summary": {"topic_summary": "이전"}, "upto": 0}
@@ -0,0 +1,165 @@
+from __future__ import annotations
+import asyncio
+
+import pytest
+
+import main
+import server
+
+
+@pytest.fixture
+def manager(tmp_path):
+    m = server.SessionManager(llm_concurrency=2, graph_dir=str(tmp_path), summary_every=1,
+                              journal_dir=str(tmp_path / "journal"), background_workers=2)
+    (tmp_path / "journal").mkdir()
+    yield m
+    m.executor.shutdown(wait=False)
+    m.background.shutdown(wait=False)
+
+
+def test_background_work_uses_manager_executor(manager, monkeypatch):
+    def shared_pool():
+        raise AssertionError("공용 백그라운드 풀을 쓰면 안 된다")
+
+    monkeypatch.setattr(main, "_background_executor", shared_pool)
+
+    async def scenario():
+        session = manager.create("u")
+        await manager.turn(session.id, "죽고 싶다")         # 빠른 경로 → 백그라운드 분류
+        await manager.turn(session.id, "오늘은 좀 나아졌어요")  # summary_every=1 → 누적 요약
+        return await manager.end(session.id)
+
+    report = asyncio.run(scenario())
+    assert report["session_overview"]["mindfulness_used"] == 1
+    assert len(report["emotion_summary"]["score_trend"]) == 2
+
+
+def test_concurrent_end_generates_one_report(manager):
+    async def scenario():
+        session = manager.create("u")
+        await manager.turn(session.id, "오늘 회사에서 좀 지쳤어요")
+        return await asyncio.gather(manager.end(session.id), manager.end(session.id), return_exceptions=True)
+
+    first, second = asyncio.run(scenario())
+    assert "emotion_summary" in first
+    assert isinstance(second, KeyError)
+    assert manager.completed == 1
+    assert not manager.sessions
+
+
+def test_evict_idle_keeps_active_sessions(manager):
+    async def scenario():
+        idle = manager.create("idle")
+        busy = manager.create("busy")
+        idle.last_active -= manager.idle_timeout + 1
+        busy.last_active -= manager.idle_timeout + 1
+        async with busy.lock:                  # 처리 중인 세션은 정리하지 않는다
+            evicted = manager.evict_idle()
+        return idle, busy, evicted
+
+    idle, busy, evicted = asyncio.run(scenario())
+    assert evicted == 1 and manager.evicted == 1
+    assert idle.id not in manager.sessions and busy.id in manager.sessions
+
+
+async def _request(port: int, raw: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    data = await asyncio.wait_for(reader.read(), timeout=5)
+    writer.close()
+    return data
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_invalid_content_length_is_400(manager, length):
+    async def scenario():
+        srv = await asyncio.start_server(server.HttpApp(manager).handle, "127.0.0.1", 0)
+        port = srv.sockets[0].getsockname()[1]
+        async with srv:
+            bad = await _request(port, b"POST /sessions HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
+            ok = await _request(port, b"GET /healthz HTTP/1.1\r\nConnection: close\r\n\r\n")
+        return bad, ok
+
+    bad, ok = asyncio.run(scenario())
+    assert bad.startswith(b"HTTP/1.1 400 ")
+    assert b"invalid content-length" in bad
+    assert ok.startswith(b"HTTP/1.1 200 ")
+
+
+def test_create_evicts_idle_before_refusing(tmp_path):
+    m = server.SessionManager(max_sessions=1, idle_timeout=60, llm_concurrency=1, graph_dir=str(tmp_path), journal_dir="")
+    first = m.create("a")
+    with pytest.raises(OverflowError):
+        m.create("b")
+    first.last_active -= 61
+    second = m.create("b")
+    assert list(m.sessions) == [second.id] and m.evicted == 1
+
+
+def test_manager_bounds_llm_concurrency(fake_llm, tmp_path):
+    server.SessionManager(llm_concurrency=3, graph_dir=str(tmp_path), journal_dir="")
+    backend = main.get_backend()
+    assert isinstance(backend, main.ResilientBackend) and backend.inner is fake_llm
+    assert backend.max_concurrency == 3
+    server.SessionManager(llm_concurrency=5, graph_dir=str(tmp_path), journal_dir="")
+    resized = main.get_backend()
+    assert resized.inner is fake_llm and resized.max_concurrency == 5
+    assert resized.breaker is backend.breaker       # 다시 감싸지 않고 한도만 바꾼다
+
+
+def _call(app: server.HttpApp, method: str, path: str, body: bytes = b""):
+    return asyncio.run(app.dispatch(method, path, body))
+
+
+def test_stats_accepts_only_get(manager):
+    app = server.HttpApp(manager)
+    session = manager.create("u")
+    status, _ = _call(app, "POST", f"/sessions/{session.id}/stats", '{"text": "안녕하세요"}'.encode())
+    assert status == 405
+    assert len(session.state["messages"]) == 0
+    assert _call(app, "GET", f"/sessions/{session.id}/turns")[0] == 405
+    assert _call(app, "GET", f"/sessions/{session.id}/stats")[0] == 200
+    assert _call(app, "POST", "/sessions/nope/end")[0] == 404
+
+
+def _serve(manager, raw: bytes, **kwargs) -> bytes:
+    async def scenario():
+        srv = await asyncio.start_server(server.HttpApp(manager, **kwargs).handle, "127.0.0.1", 0)
+        async with srv:
+            return await _request(srv.sockets[0].getsockname()[1], raw)
+    return asyncio.run(scenario())
+
+
+def test_oversized_body_is_413(manager):
+    reply = _serve(manager, b"POST /sessions HTTP/1.1\r\nContent-Length: 1000000000\r\n\r\n{}", max_body=1024)
+    assert reply.startswith(b"HTTP/1.1 413 ")
+    assert not manager.sessions
+
+
+def test_unexpected_error_is_generic_500(manager, monkeypatch):
+    def boom(user_id):
+        raise RuntimeError("secret internal detail")
+
+    monkeypatch.setattr(manager, "create", boom)
+    reply = _serve(manager, b"POST /sessions HTTP/1.1\r\nConnection: close\r\nContent-Length: 2\r\n\r\n{}")
+    assert reply.startswith(b"HTTP/1.1 500 ")
+    assert b"internal error" in reply and b"secret" not in reply
+
+
+def test_restore_resumes_unfinished_sessions(manager):
+    async def scenario():
+        session = manager.create("u")
+        await manager.turn(session.id, "오늘 회사에서 좀 지쳤어요")
+        return session
+
+    session = asyncio.run(scenario())
+    main.wait_pending_analyses(session.state)
+    main.journal_checkpoint(session.state)
+    fresh = server.SessionManager(llm_concurrency=1, journal_dir=manager.journal_dir)
+    assert fresh.restore() == 1
+    restored = fresh.sessions[session.id].state
+    assert [m["content"] for m in restored["messages"]] == [m["content"] for m in session.state["messages"]]
+    assert fresh.restore() == 0
+    fresh.executor.shutdown(wait=False)
+    fresh.background.shutdown(wait=False)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import os
+import threading
+from typing import Dict, List
+
+import main
+
+
+def test_windowed_list_spills_and_replays(tmp_path):
+    log = main.SessionLog(str(tmp_path / "log.jsonl"))
+    items = main.WindowedList("messages", log, window=3, coerce=main.Message.coerce)
+    for i in range(10):
+        items.append({"role": "user", "content": f"m{i}", "emotion": {"class": "중립", "score": i / 10}})
+    assert len(items) == 10
+    assert len(items._items) == 3
+    assert [m["content"] for m in items] == [f"m{i}" for i in range(10)]
+    assert [m["content"] for m in items[2:5]] == ["m2", "m3", "m4"]
+    assert items[0]["emotion"]["score"] == 0.0
+    assert items[-1]["content"] == "m9"
+    items[-1] = {"role": "user", "content": "changed"}
+    assert items[9]["content"] == "changed"
+    try:
+        items[0] = {"role": "user", "content": "x"}
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("로그로 옮겨진 레코드는 수정할 수 없어야 한다")
+
+
+def test_windowed_list_initial_items_over_window(tmp_path):
+    log = main.SessionLog(str(tmp_path / "log.jsonl"))
+    items = main.WindowedList("interventions", log, window=2, items=[{"n": i} for i in range(5)])
+    assert list(items) == [{"n": i} for i in range(5)]
+    assert len(items._items) == 2
+
+
+def test_windowed_list_holds_pending_records(tmp_path):
+    log = main.SessionLog(str(tmp_path / "log.jsonl"))
+    held = {0}
+    items = main.WindowedList("x", log, window=2, hold=lambda r: r["n"] in held)
+    for i in range(4):
+        items.append({"n": i})
+    assert items._spilled == 0 and len(items._items) == 4      # 맨 앞이 대기 중
+    held.clear()
+    items.append({"n": 4})
+    assert items._spilled == 3 and list(items) == [{"n": i} for i in range(5)]
+    held.add(5)
+    for i in range(5, 60):
+        items.append({"n": i})
+    assert len(items._items) <= 2 + 32                         # 끝나지 않는 대기는 한도까지만 붙잡는다
+
+
+def test_session_state_close_discards_log(tmp_path):
+    state = main.new_session_state(window=1, log_dir=str(tmp_path), journal_dir="")
+    for i in range(3):
+        state["messages"].append({"role": "user", "content": f"m{i}"})
+    assert os.listdir(tmp_path)
+    state.close(discard=True)
+    assert not os.listdir(tmp_path)
+
+
+def test_pending_emotion_reaches_spilled_message_and_journal(tmp_path, fake_llm):
+    """window 보다 늦게 끝난 빠른 경로 분류도 메시지·집계·저널에 같은 값으로 남는다"""
+    release = threading.Event()
+
+    def responder(messages: List[Dict[str, str]]) -> str:
+        if "죽고 싶다" in messages[-1]["content"]:
+            release.wait(5)
+            return '{"emotion_class": "슬픔", "emotion_score": 0.62, "extreme": false}'
+        return '{"emotion_class": "중립", "emotion_score": 0.05, "extreme": false}'
+
+    fake_llm.responder = responder
+    journal_dir = tmp_path / "journal"
+    journal_dir.mkdir()
+    state = main.new_session_state(session_id="s1", window=2, log_dir=str(tmp_path), journal_dir=str(journal_dir))
+    for text in ["죽고 싶다", "점심 먹었어요 뭐 그냥", "주말에 본가 다녀왔는데 뭐 그냥"]:
+        state["messages"].append({"role": "user", "content": text})
+        main.analyze_and_update_state(state)
+        state["messages"].append({"role": "assistant", "content": "네."})
+        main.journal_checkpoint(state)
+    release.set()
+    main.wait_pending_analyses(state)
+    main.journal_checkpoint(state)
+
+    live = main.session_stats(state).scores.tolist()
+    assert live[0] == 0.62
+    first = state["messages"][0]["emotion"]
+    assert first["score"] == 0.62 and "pending" not in first
+
+    main.close_journal(state)
+    resumed = main.resume_session(str(journal_dir / "journal_s1.jsonl"), window=2, log_dir=str(tmp_path))
+    assert resumed["stats"].scores.tolist() == live
+    assert "pending" not in resumed["messages"][0]["emotion"]
+    resumed.close(discard=True)
+    state.close(discard=True)
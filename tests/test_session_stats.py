@@ -0,0 +1,80 @@
+from __future__ import annotations
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+import main
+
+
+def rescan(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """집계 도입 전 MemoryAgent 가 보고서 때 하던 전체 재스캔"""
+    scores: List[float] = []
+    high: List[int] = []
+    keywords: List[str] = []
+    for i, msg in enumerate(messages):
+        if msg["role"] == "user":
+            keywords.extend(re.sub(r"[^\w\s]", "", msg["content"]).lower().split())
+            if "emotion" in msg:
+                score = float(msg["emotion"]["score"])
+                scores.append(score)
+                if score > 0.7:
+                    high.append(i)
+    return {"scores": scores, "high": high, "top_keywords": [w for w, _ in Counter(keywords).most_common(10)],
+            "counts": Counter(keywords)}
+
+
+def incremental(stats: main.SessionStats) -> Dict[str, Any]:
+    return {"scores": stats.scores.tolist(), "high": [stats.turn_index[s] for s in stats.high],
+            "top_keywords": stats.top_keywords(10), "counts": stats.keywords}
+
+
+def run_turns(state: Dict[str, Any], texts: List[str]) -> None:
+    for text in texts:
+        state["messages"].append({"role": "user", "content": text})
+        main.analyze_and_update_state(state)
+        state["messages"].append({"role": "assistant", "content": "네."})
+    main.wait_pending_analyses(state)
+
+
+TEXTS = ["사과 사과", "오늘 사과를 먹었는데 기분이 좋았어요", "죽고 싶다", "사과 때문에 화가 나요!", "그냥 그래요"]
+
+
+def test_new_session_counts_first_turn_once():
+    state = main.new_session_state(journal_dir="")
+    run_turns(state, ["사과 사과"])
+    assert state["stats"].keywords["사과"] == 2
+    state.close(discard=True)
+
+
+def test_incremental_stats_match_rescan():
+    state = main.new_session_state(journal_dir="")
+    run_turns(state, TEXTS)
+    assert incremental(main.session_stats(state)) == rescan(list(state["messages"]))
+    state.close(discard=True)
+
+
+def test_hand_built_state_without_stats_matches_rescan():
+    state: Dict[str, Any] = {"messages": [], "interventions": []}
+    run_turns(state, TEXTS)
+    assert incremental(state["stats"]) == rescan(state["messages"])
+
+
+def test_hand_built_state_with_history_matches_rescan():
+    state: Dict[str, Any] = {"interventions": [], "messages": [
+        {"role": "user", "content": "사과 사과", "emotion": {"class": "기쁨", "score": 0.8}},
+        {"role": "assistant", "content": "네."},
+    ]}
+    run_turns(state, TEXTS)
+    assert incremental(state["stats"]) == rescan(state["messages"])
+
+
+def test_snapshot_counts():
+    stats = main.SessionStats()
+    stats.add_emotion(0, "슬픔", 0.9)
+    slot = stats.add_emotion(2, "중립", 0.1)
+    stats.update(slot, "불안", 0.8)
+    snap = stats.snapshot()
+    assert snap["emotion_turns"] == 2
+    assert snap["high_emotion_turns"] == 2
+    assert snap["tag_counts"] == {"슬픔": 1, "불안": 1}
+    assert stats.tag_set() == ["슬픔", "불안"]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, List, Tuple
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def latency(monkeypatch):
+    recorder = main.LatencyRecorder()
+    monkeypatch.setattr(main, "LATENCY", recorder)
+    return recorder
+
+
+def test_reply_stream_joins_to_reply(fake_llm):
+    agent = main.AssistantAgent()
+    tokens = list(agent.reply_stream("점심은 김밥 먹었어요"))
+    assert len(tokens) > 1
+    assert "".join(tokens).strip() == agent.reply("점심은 김밥 먹었어요")
+
+
+def test_stream_records_ttft_before_total(fake_llm, latency):
+    fake_llm.latency = 0.05
+    fake_llm.token_delay = 0.02
+    list(main.chat_stream("assistant", [{"role": "user", "content": "안녕하세요 오늘 기분이 어때요"}], 0.7))
+    summary = latency.summary()
+    ttft, total = summary["llm.assistant.ttft"]["max_ms"], summary["llm.assistant.total"]["max_ms"]
+    assert 40 <= ttft < total
+    assert total - ttft >= 20                  # 토큰 사이 지연이 ttft 에 섞이지 않는다
+
+
+def test_stream_closed_early_is_marked(fake_llm, latency, tmp_path):
+    latency.open_trace(str(tmp_path / "trace.jsonl"))
+    stream = main.chat_stream("assistant", [{"role": "user", "content": "안녕하세요 오늘 기분이 어때요"}], 0.7)
+    next(stream)
+    stream.close()
+    latency.close_trace()
+    assert '"closed_early": true' in (tmp_path / "trace.jsonl").read_text(encoding="utf-8")
+
+
+def test_turn_engine_streams_reply_after_analysis(fake_llm):
+    fake_llm.responder = lambda messages: ('{"emotion_class": "중립", "emotion_score": 0.1, "extreme": false}'
+                                           if "감정 분석" in messages[0]["content"] else "천천히 이야기해 주세요. 무엇이 가장 힘들었나요?")
+    fake_llm.token_delay = 0.01
+    events: List[Tuple[str, Any]] = []
+    engine = main.TurnEngine(main.AssistantAgent(), main.MindfulnessAgent(), main.RoleplayAgent(), stream=True,
+                             emit=lambda kind, content: events.append((kind, content)))
+    state = main.new_session_state(journal_dir="")
+    asyncio.run(engine.run_turn(state, "점심은 김밥 먹었어요"))
+    kinds = [kind for kind, _ in events]
+    assert kinds[:2] == ["C", "A_start"] and kinds[-1] == "A_end"
+    assert set(kinds[2:-1]) == {"token"} and len(kinds) > 4
+    text = "".join(content for kind, content in events if kind == "token").strip()
+    assert text == events[-1][1] == state["messages"][-1]["content"]
+    state.close(discard=True)
+
+
+def test_roleplay_run_stream_updates_state_after_last_token(fake_llm):
+    state = {"messages": [{"role": "user", "content": "면접 연습 하고 싶어요"}], "roleplay_logs": None}
+    tokens = []
+    for token in main.RoleplayAgent().run_stream(state):
+        assert state.get("roleplay_count", 0) == 0
+        tokens.append(token)
+    assert state["roleplay_count"] == 1
+    assert state["messages"][-1]["content"] == "".join(tokens).strip()
+    assert state["roleplay_logs"][0]["script"] == "".join(tokens).strip()
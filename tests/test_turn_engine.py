@@ -0,0 +1,84 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+import main
+
+REPLY = "그렇게 느끼셨군요. 어떤 생각이 먼저 들었나요?"
+
+
+def responder(score: float = 0.1):
+    def respond(messages: List[Dict[str, str]]) -> str:
+        if "감정 분석" in messages[0]["content"]:
+            return f'{{"emotion_class": "슬픔", "emotion_score": {score}, "extreme": false}}'
+        return REPLY
+    return respond
+
+
+def run_turn(text: str, **kwargs: Any) -> Tuple[Dict[str, Any], List[Tuple[str, Any]], float]:
+    events: List[Tuple[str, Any]] = []
+    engine = main.TurnEngine(main.AssistantAgent(), main.MindfulnessAgent(), main.RoleplayAgent(),
+                             emit=lambda kind, content: events.append((kind, content)), **kwargs)
+    state = main.new_session_state(journal_dir="")
+
+    async def scenario():
+        t0 = time.perf_counter()
+        await engine.run_turn(state, text)
+        return time.perf_counter() - t0
+
+    elapsed = asyncio.run(scenario())
+    main.wait_pending_analyses(state)
+    return state, events, elapsed
+
+
+@pytest.fixture
+def slow_llm(fake_llm):
+    fake_llm.latency = 0.2
+    fake_llm.responder = responder()
+    return fake_llm
+
+
+def test_analysis_and_reply_run_concurrently(slow_llm):
+    state, events, elapsed = run_turn("점심은 김밥 먹었어요")
+    assert [kind for kind, _ in events] == ["C", "A"]
+    assert events[1][1] == REPLY
+    assert elapsed < 0.35                      # 두 호출의 합(0.4s)이 아니라 더 느린 쪽에 가깝다
+    assert [m["role"] for m in state["messages"]] == ["user", "assistant"]
+    state.close(discard=True)
+
+
+def test_intervention_is_emitted_before_reply(slow_llm):
+    slow_llm.responder = responder(score=0.9)
+    state, events, _ = run_turn("점심은 김밥 먹었어요")
+    assert [kind for kind, _ in events] == ["C", "mindfulness", "A"]
+    state.close(discard=True)
+
+
+def test_extreme_turn_discards_speculative_reply(slow_llm):
+    state, events, _ = run_turn("죽고 싶다")
+    assert [kind for kind, _ in events] == ["C", "mindfulness"]
+    assert events[0][1]["extreme"] is True
+    assert REPLY not in [m["content"] for m in state["messages"]]
+    state.close(discard=True)
+
+
+def test_extreme_reply_kept_when_discard_disabled(slow_llm):
+    state, events, _ = run_turn("죽고 싶다", discard_on_extreme=False)
+    assert [kind for kind, _ in events] == ["C", "mindfulness", "A"]
+    state.close(discard=True)
+
+
+def test_reply_failure_is_reported_not_raised(slow_llm):
+    def respond(messages):
+        if "감정 분석" in messages[0]["content"]:
+            return '{"emotion_class": "중립", "emotion_score": 0.1, "extreme": false}'
+        raise ConnectionError("down")
+
+    slow_llm.responder = respond
+    main.set_backend(main.ResilientBackend(slow_llm, retries=0))
+    state, events, _ = run_turn("점심은 김밥 먹었어요")
+    assert [kind for kind, _ in events] == ["C", "warn"]
+    state.close(discard=True)